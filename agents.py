@@ -1,34 +1,24 @@
 ## Importing libraries and files
 import os
+import threading
+from typing import Any, Dict, List
 from dotenv import load_dotenv
 load_dotenv()
 
+from tools import get_tool
+from rate_limiter import install_litellm_hooks
 
-from crewai import Agent
+### LLM settings (the ChatOpenAI client itself is created by get_llm on first use)
+AGENT_MODEL = "gpt-4o-mini"        # or "gpt-4o-mini" or "gpt-3.5-turbo"
+AGENT_TEMPERATURE = 0.2
 
-# CrewAI OpenAI LLM wrapper
-from langchain_openai import ChatOpenAI
-
-from tools import search_tool, risk_assessment_tool, read_data_tool, analyze_investment_tool
-
-
-### Loading LLM
-llm = ChatOpenAI(
-    model="gpt-4o-mini",        # or "gpt-4o-mini" or "gpt-3.5-turbo"
-    temperature=0.2,       # deterministic output
-    api_key=os.getenv("OPENAI_API_KEY")  # reads from .env
-)
-
-# prepare normalized tools
-tool_read = read_data_tool
-tool_invest = analyze_investment_tool
-tool_risk = risk_assessment_tool
-tool_search = search_tool
+# Agents are declared as plain data and only turned into crewai Agent objects by
+# get_agent, so importing this module does not import crewai or langchain.
+AGENT_SPECS: Dict[str, Dict[str, Any]] = {}
 
 
 # Creating a Senior Financial Analyst agent
-# Creating a Senior Financial Analyst agent
-financial_analyst = Agent(
+AGENT_SPECS["financial_analyst"] = dict(
     role="Senior Financial Analyst",
     goal=(
         "Analyze financial documents thoroughly, evaluate investment potential, "
@@ -41,11 +31,12 @@ financial_analyst = Agent(
         "When performing your analysis, you must always follow this exact sequence "
         "using the available tools:\n\n"
         
-        "1) **Read Financial Document Tool** — Use this first to extract and clean "
-        "the text from the provided PDF. Do not skip this step.\n\n"
-        "2) **Investment Analysis Tool** — Once you have the extracted text, use this "
-        "tool to perform a structured LLM-driven investment analysis. Include summaries, "
-        "key figures, profitability, growth insights, and clear recommendations from the read financial document tool result.\n\n"
+        "1) **Document handle** — The document has already been extracted once for this request. "
+        "Your task gives you its handle (e.g. doc-3f2b0c9e6d1a4b0f); pass that handle to the tools "
+        "below instead of copying any document text.\n\n"
+        "2) **Investment Analysis Tool** — Call this tool with the document handle to perform a "
+        "structured LLM-driven investment analysis. Include summaries, "
+        "key figures, profitability, growth insights, and clear recommendations.\n\n"
         "3) **Risk Assessment Tool** — After investment analysis, call this tool to "
         "generate a risk profile of the company or financial report, identifying major "
         "threats and opportunities.\n\n"
@@ -59,26 +50,26 @@ financial_analyst = Agent(
         "• **Risk Assessment** insights\n"
         "• **Recent Market Context** from the search tool\n"
         "• And a final **Investment Recommendation** (buy/hold/sell)\n\n"
+        "The **Key Figures Tool** returns exact revenue, net income, balance-sheet figures and ratios "
+        "parsed locally from the PDF at no LLM cost; prefer its numbers over estimates.\n\n"
         "Never skip any step or call fewer than three tools in your analysis process. "
         "If one fails, continue with the remaining steps."
     ),
     tools=[
-        tool_read,
-        tool_invest,
-        tool_risk,
-        tool_search
+        "analyze_investment_tool",
+        "risk_assessment_tool",
+        "search_tool",
+        "key_figures_tool"
     ],
-    llm=llm,
     memory=True,
     verbose=True,
     max_iter=6,  # allow multiple reasoning/tool-use cycles
-    max_rpm=5,
     allow_delegation=False
 )
 
 
 # Creating a Financial Document Verifier agent
-verifier = Agent(
+AGENT_SPECS["verifier"] = dict(
     role="Financial Document Verifier",
     goal=(
         "Verify whether an uploaded document is a financial report or contains "
@@ -88,20 +79,19 @@ verifier = Agent(
         "You are a diligent compliance analyst with experience in reviewing corporate filings, "
         "financial statements, and related documents. Your job is to quickly determine "
         "whether a document is valid for financial analysis. You are detail-oriented, "
-        "focused on accuracy, and strict about rejecting irrelevant files."
+        "focused on accuracy, and strict about rejecting irrelevant files. You read the document "
+        "through its handle and only as much of it as you need to decide."
     ),
-    tools=[tool_read],
-    llm=llm,
+    tools=["read_data_tool"],
     memory=True,
     verbose=True,
     max_iter=2,
-    max_rpm=2,
     allow_delegation=False
 )
 
 
 # Creating an Investment Advisor agent
-investment_advisor = Agent(
+AGENT_SPECS["investment_advisor"] = dict(
     role="Investment Advisor",
     goal=(
         "Provide accurate, data-driven investment advice by combining financial document analysis, "
@@ -113,11 +103,11 @@ investment_advisor = Agent(
         "portfolio optimization, and asset allocation. You rely on quantitative fundamentals, "
         "qualitative assessments, and live market context to guide your investment calls.\n\n"
         "Whenever you handle a query, **you must always use the tools in the following order**:\n\n"
-        "1) **Read Financial Document Tool** — Start here. Load and extract the clean text content "
-        "from the provided PDF or financial file. Do not skip this step.\n\n"
-        "2) **Investment Analysis Tool** — Next, analyze the extracted text to evaluate profitability, "
-        "growth trends, and valuation metrics take the output from read financial document as input for this tool"
-        ". Identify strengths, weaknesses, and key investment factors.\n\n"
+        "1) **Document handle** — Start here. The document has already been extracted once for this "
+        "request; take its handle from the task and pass it to every document tool. Never copy document text "
+        "into tool arguments.\n\n"
+        "2) **Investment Analysis Tool** — Next, call it with the document handle to evaluate profitability, "
+        "growth trends, and valuation metrics. Identify strengths, weaknesses, and key investment factors.\n\n"
         "3) **Risk Assessment Tool** — Then, assess associated risks. Look for financial, operational, "
         "and market-related vulnerabilities that could affect performance.\n\n"
         "4) **Search Tool (Serper)** — Finally, check for relevant real-time data, news, or events "
@@ -129,27 +119,27 @@ investment_advisor = Agent(
         "• Risk Overview\n"
         "• Market Context (from search)\n"
         "• Final Recommendation (Buy / Hold / Sell) with a short rationale.\n\n"
+        "The **Key Figures Tool** returns exact revenue, net income, balance-sheet figures and ratios "
+        "parsed locally from the PDF at no LLM cost; prefer its numbers over estimates.\n\n"
         "You are expected to use *every* tool in that order unless one fails. If a tool produces an error, "
         "continue the process using the remaining tools and mention that the data was incomplete."
     ),
     tools=[
-        tool_read,
-        tool_invest,
-        tool_risk,
-        tool_search
+        "analyze_investment_tool",
+        "risk_assessment_tool",
+        "search_tool",
+        "key_figures_tool"
     ],
-    llm=llm,
     memory=True,
     verbose=True,
     max_iter=6,  # increased so it can call all tools and synthesize results
-    max_rpm=5,
     allow_delegation=False
 )
 
 
 
 # Creating a Risk Assessor agent
-risk_assessor = Agent(
+AGENT_SPECS["risk_assessor"] = dict(
     role="Risk Assessment Specialist",
     goal=(
         "Identify and assess key financial and operational risks from company filings "
@@ -161,17 +151,90 @@ risk_assessor = Agent(
         "corporate governance, and market risk analysis. You specialize in reviewing "
         "company reports to uncover vulnerabilities such as regulatory, liquidity, "
         "operational, and market risks. You communicate risks clearly and recommend "
-        "practical mitigation strategies to decision-makers."
+        "practical mitigation strategies to decision-makers. The document is already extracted: "
+        "pass the document handle from your task to the Risk Assessment Tool."
     ),
     tools=[
-        tool_read,
-        tool_risk,
-        tool_search
+        "risk_assessment_tool",
+        "search_tool"
     ],
-    llm=llm,
     memory=True,
     verbose=True,
     max_iter=3,
-    max_rpm=2,
     allow_delegation=False
-)
\ No newline at end of file
+)
+
+# Creating a Report Writer agent (used by the parallel pipeline's synthesis step)
+AGENT_SPECS["report_writer"] = dict(
+    role="Investment Report Writer",
+    goal=(
+        "Merge the verification, financial analysis, investment analysis and risk assessment "
+        "produced by the other specialists into one cohesive, non-repetitive report."
+    ),
+    backstory=(
+        "You are an editor on an equity research desk. You receive finished sections from "
+        "several analysts and turn them into a single clear report. You never invent new "
+        "figures: you only reconcile, de-duplicate and summarize what the analysts found."
+    ),
+    tools=[],
+    memory=True,
+    verbose=True,
+    max_iter=2,
+    allow_delegation=False
+)
+
+
+##-------------------------- Lazy factories --------------------------##
+
+_llm = None
+_agents: Dict[str, Any] = {}
+_lock = threading.RLock()
+
+
+def get_llm() -> Any:
+    """The LLM shared by every agent, created on first use together with the rate-limiter hooks."""
+    global _llm
+    with _lock:
+        if _llm is None:
+            # All agent LLM calls share the process-wide rate limiter (replaces per-agent max_rpm)
+            install_litellm_hooks()
+            # CrewAI OpenAI LLM wrapper
+            from langchain_openai import ChatOpenAI
+            _llm = ChatOpenAI(
+                model=AGENT_MODEL,
+                temperature=AGENT_TEMPERATURE,
+                api_key=os.getenv("OPENAI_API_KEY")  # reads from .env
+            )
+        return _llm
+
+
+def get_agent(name: str) -> Any:
+    """
+    Return the crewai Agent for `name` (an AGENT_SPECS key), building it on first use.
+
+    Raises:
+        KeyError: for an unknown agent name
+    """
+    spec = AGENT_SPECS[name]
+    with _lock:
+        agent = _agents.get(name)
+        if agent is None:
+            from crewai import Agent
+            agent = _agents[name] = Agent(
+                **{**spec, "tools": [get_tool(t) for t in spec["tools"]]},
+                llm=get_llm(),
+            )
+        return agent
+
+
+def get_agents(names: List[str]) -> List[Any]:
+    return [get_agent(n) for n in names]
+
+
+def __getattr__(name: str) -> Any:
+    # `from agents import financial_analyst` (and `llm`) keep working, built on first access
+    if name in AGENT_SPECS:
+        return get_agent(name)
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,125 @@
+"""
+Micro-benchmark for the shared text normalization engine (text_normalize.py).
+
+Compares the precompiled-regex implementations against the per-character
+loops they replaced and checks that both produce identical output.
+
+Usage:
+    python benchmarks/bench_normalize.py                      # synthetic whitespace-heavy input
+    python benchmarks/bench_normalize.py data/report.pdf ...  # raw text extracted from real PDFs
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_normalize import clean_whitespace, normalize_excerpt
+
+
+##-------------------------- Legacy implementations (reference output) --------------------------##
+
+def legacy_clean_whitespace(text: str) -> str:
+    if text is None:
+        return ""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = re.sub(r"[ \t]{2,}", " ", text)
+    return text.strip()
+
+
+def legacy_normalize_excerpt(processed_data: str) -> str:
+    i = 0
+    while i < len(processed_data):
+        if processed_data[i:i+2] == "  ":
+            processed_data = processed_data[:i] + processed_data[i+1:]
+        else:
+            i += 1
+    return processed_data.replace("\r\n", "\n").strip()
+
+
+##-------------------------- Inputs --------------------------##
+
+def synthetic_report(num_chars: int, seed: int = 7) -> str:
+    """Whitespace-heavy text shaped like a raw table-laden PDF extract."""
+    rng = random.Random(seed)
+    words = ["Revenue", "Net", "income", "Total", "assets", "liabilities", "$", "22,496",
+             "(1,234)", "Q2", "2025", "YoY", "%", "Operating", "margin", "cash", "flow"]
+    seps = [" ", "  ", "    ", "\t", " \t ", "\n", "\r\n", "\n\n\n", "\r\n\r\n\r\n", "        "]
+    parts: List[str] = []
+    size = 0
+    while size < num_chars:
+        piece = rng.choice(words) + rng.choice(seps)
+        parts.append(piece)
+        size += len(piece)
+    return "".join(parts)
+
+
+def extracted_reports(paths: List[str]) -> List[Tuple[str, str]]:
+    """Raw (uncleaned) page text of each PDF joined the way read_data_tool sees it."""
+    import pdfplumber
+
+    out = []
+    for path in paths:
+        with pdfplumber.open(path) as pdf:
+            raw = "\n\n".join((page.extract_text() or "") for page in pdf.pages)
+        out.append((os.path.basename(path), raw))
+    return out
+
+
+##-------------------------- Runner --------------------------##
+
+def _best_of(fn: Callable[[str], str], text: str, repeat: int) -> Tuple[float, str]:
+    best = float("inf")
+    result = ""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def run(samples: List[Tuple[str, str]], repeat: int) -> bool:
+    ok = True
+    pairs = [
+        ("clean_whitespace", legacy_clean_whitespace, clean_whitespace),
+        ("normalize_excerpt", legacy_normalize_excerpt, normalize_excerpt),
+    ]
+    print(f"{'sample':<28} {'function':<18} {'chars':>9} {'legacy ms':>11} {'new ms':>9} {'speedup':>8}  match")
+    for name, text in samples:
+        for fn_name, legacy, new in pairs:
+            t_old, out_old = _best_of(legacy, text, repeat)
+            t_new, out_new = _best_of(new, text, repeat)
+            match = out_old == out_new
+            ok = ok and match
+            speedup = t_old / t_new if t_new > 0 else float("inf")
+            print(f"{name[:28]:<28} {fn_name:<18} {len(text):>9} {t_old * 1e3:>11.2f} "
+                  f"{t_new * 1e3:>9.2f} {speedup:>7.1f}x  {'yes' if match else 'NO'}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDF files to extract raw text from")
+    parser.add_argument("--sizes", default="10000,50000,200000",
+                        help="comma-separated synthetic input sizes (used when no PDFs are given)")
+    parser.add_argument("--repeat", type=int, default=3, help="take the best of N runs")
+    args = parser.parse_args()
+
+    if args.pdfs:
+        samples = extracted_reports(args.pdfs)
+    else:
+        samples = [(f"synthetic-{n}", synthetic_report(n)) for n in map(int, args.sizes.split(","))]
+
+    ok = run(samples, args.repeat)
+    if not ok:
+        print("\nOutput mismatch between legacy and regex implementations.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+"""
+Offline end-to-end benchmark: document reading, the analysis tools and the /analyze flow.
+
+Starts local OpenAI and Serper stubs (benchmarks/stub_servers.py), generates
+synthetic financial PDFs (benchmarks/synthetic_pdf.py) and reports, per
+scenario and document size, throughput, p50/p95/p99 latency and peak memory.
+No real API is called and nothing is billed.
+
+Scenarios:
+    read_cold / read_warm   tools.read_data with an empty / primed parsed-document cache
+    investment / risk       tools.analyze_investment / tools.assess_risk on a document handle
+    analyze                 POST /analyze, then poll /jobs/{id} until the crew finishes
+
+Used as a regression gate: save a baseline with --json, then compare later runs
+against it with --baseline; the exit status is 1 when any scenario got slower
+(p95) or lost throughput by more than --tolerance, or when any operation failed.
+
+Usage:
+    python benchmarks/bench_pipeline.py                               # all scenarios, 5/50/200 pages
+    python benchmarks/bench_pipeline.py --pages 5,500 --scenarios read_cold,investment
+    python benchmarks/bench_pipeline.py --llm-latency 0.8 --concurrency 4 --json bench.json
+    python benchmarks/bench_pipeline.py --baseline bench.json --tolerance 0.15
+"""
+import os
+import sys
+import json
+import math
+import time
+import tempfile
+import argparse
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import StubOpenAIServer, StubSerperServer
+from synthetic_pdf import write_financial_pdf
+
+SCENARIOS = ("read_cold", "read_warm", "investment", "risk", "analyze")
+QUERY = "Analyze this financial document for investment insights"
+
+
+##-------------------------- Measurement --------------------------##
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list (0 for an empty list)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+
+def measure(name: str, op: Callable[[], Any], iterations: int, concurrency: int = 1, warmup: int = 1,
+            llm_stub: Optional[StubOpenAIServer] = None) -> Dict[str, Any]:
+    """
+    Run `op` `iterations` times on `concurrency` threads and summarize the latencies.
+
+    Peak memory is taken from one extra run under tracemalloc, so the timed runs
+    do not pay tracemalloc's overhead. `op` signals a failed operation by raising.
+    """
+    for _ in range(warmup):
+        op()
+
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    def timed_op(_: int) -> None:
+        t0 = time.perf_counter()
+        try:
+            op()
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return
+        latencies.append(time.perf_counter() - t0)
+
+    calls_before = llm_stub.requests if llm_stub else 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        list(pool.map(timed_op, range(iterations)))
+    wall = time.perf_counter() - started
+    llm_calls = (llm_stub.requests - calls_before) if llm_stub else 0
+
+    tracemalloc.start()
+    try:
+        op()
+    except Exception:
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "name": name,
+        "ops": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 4),
+        "throughput_per_s": round(len(latencies) / wall, 3) if wall > 0 else 0.0,
+        "mean_ms": round(1e3 * sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "p50_ms": round(1e3 * percentile(latencies, 0.50), 2),
+        "p95_ms": round(1e3 * percentile(latencies, 0.95), 2),
+        "p99_ms": round(1e3 * percentile(latencies, 0.99), 2),
+        "max_ms": round(1e3 * latencies[-1], 2) if latencies else 0.0,
+        "llm_calls_per_op": round(llm_calls / iterations, 2) if iterations else 0.0,
+        "peak_traced_mb": round(peak / (1024 * 1024), 2),
+        "peak_rss_mb": round(_rss_mb(), 1),
+    }
+
+
+def skipped(name: str, reason: str) -> Dict[str, Any]:
+    return {"name": name, "skipped": reason}
+
+
+##-------------------------- Scenarios --------------------------##
+
+def _check_tool_output(result: Any) -> Any:
+    if isinstance(result, str) and result.startswith("ERROR"):
+        raise RuntimeError(result[:200])
+    return result
+
+
+def bench_read(documents: Dict[int, str], cold: bool, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    label = "read_cold" if cold else "read_warm"
+    try:
+        from tools import read_data
+        from doc_cache import get_document_cache
+    except ImportError as e:
+        return [skipped(label, f"tools.py not importable: {e}")]
+
+    cache = get_document_cache()
+    results = []
+    for pages, path in documents.items():
+        def op(path=path):
+            if cold:
+                cache.clear()
+            return read_data(path)
+        # a cold read clears the shared cache, so it is only meaningful one at a time
+        results.append(measure(f"{label}[{pages}p]", op, args.iterations, 1 if cold else args.concurrency))
+    return results
+
+
+def bench_tool(documents: Dict[int, str], which: str, args: argparse.Namespace,
+               llm_stub: StubOpenAIServer) -> List[Dict[str, Any]]:
+    try:
+        from tools import analyze_investment, assess_risk
+        from doc_context import get_context_store
+    except ImportError as e:
+        return [skipped(which, f"tools.py not importable: {e}")]
+
+    fn = analyze_investment if which == "investment" else assess_risk
+    store = get_context_store()
+    results = []
+    for pages, path in documents.items():
+        with store.scope(path) as handle:
+            results.append(measure(f"{which}[{pages}p]", lambda: _check_tool_output(fn(handle, QUERY)),
+                                   args.iterations, args.concurrency, llm_stub=llm_stub))
+    return results
+
+
+def bench_analyze(documents: Dict[int, str], args: argparse.Namespace,
+                  llm_stub: StubOpenAIServer) -> List[Dict[str, Any]]:
+    try:
+        from fastapi.testclient import TestClient
+        from main import app
+    except ImportError as e:
+        return [skipped("analyze", f"main.py not importable: {e}")]
+
+    results = []
+    with TestClient(app) as client:
+        for pages, path in documents.items():
+            def op(path=path):
+                with open(path, "rb") as f:
+                    resp = client.post("/analyze", files={"file": (os.path.basename(path), f, "application/pdf")},
+                                       data={"query": QUERY})
+                if resp.status_code != 202:
+                    raise RuntimeError(f"/analyze answered {resp.status_code}: {resp.text[:200]}")
+                job_id = resp.json()["job_id"]
+                deadline = time.monotonic() + args.job_timeout
+                while time.monotonic() < deadline:
+                    job = client.get(f"/jobs/{job_id}").json()
+                    if job["status"] == "succeeded":
+                        return job
+                    if job["status"] == "failed":
+                        raise RuntimeError(f"job failed: {job.get('error')}")
+                    time.sleep(args.poll_interval)
+                raise TimeoutError(f"job {job_id} still running after {args.job_timeout:.0f}s")
+
+            results.append(measure(f"analyze[{pages}p]", op, args.iterations, args.concurrency, warmup=0,
+                                   llm_stub=llm_stub))
+    return results
+
+
+##-------------------------- Reporting and regression gate --------------------------##
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'scenario':<22} {'ops':>4} {'err':>4} {'ops/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'llm/op':>7} {'peak MB':>8} {'rss MB':>7}")
+    for r in results:
+        if "skipped" in r:
+            print(f"{r['name']:<22} skipped: {r['skipped']}")
+            continue
+        print(f"{r['name']:<22} {r['ops']:>4} {r['errors']:>4} {r['throughput_per_s']:>8.2f} {r['p50_ms']:>9.1f} "
+              f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['llm_calls_per_op']:>7.1f} "
+              f"{r['peak_traced_mb']:>8.1f} {r['peak_rss_mb']:>7.0f}")
+        if r["first_error"]:
+            print(f"{'':<22} first error: {r['first_error'][:150]}")
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Regressions of `results` against `baseline` beyond `tolerance` (0.2 = 20%)."""
+    previous = {r["name"]: r for r in baseline if "skipped" not in r}
+    regressions = []
+    for r in results:
+        old = previous.get(r["name"])
+        if "skipped" in r or old is None:
+            continue
+        if old["p95_ms"] > 0 and r["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{r['name']}: p95 {old['p95_ms']:.1f} -> {r['p95_ms']:.1f} ms")
+        if old["throughput_per_s"] > 0 and r["throughput_per_s"] < old["throughput_per_s"] * (1 - tolerance):
+            regressions.append(f"{r['name']}: throughput {old['throughput_per_s']:.2f} -> "
+                               f"{r['throughput_per_s']:.2f} ops/s")
+    return regressions
+
+
+def configure_environment(llm_stub: StubOpenAIServer, serper_stub: StubSerperServer, work_dir: str) -> None:
+    """Point the app at the stubs and switch off the caches that would hide the measured work."""
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": llm_stub.base_url,
+        "OPENAI_API_BASE": llm_stub.base_url,  # litellm (CrewAI agents)
+        "SEARCH_BACKEND": "serper",
+        "SERPER_BASE_URL": serper_stub.url,
+        "SERPER_API_KEY": "bench",
+        "LLM_CACHE_PATH": "",
+        "RESULT_STORE_PATH": "",
+        "PARSED_DOC_CACHE_DIR": "",
+        "SEARCH_CACHE_TTL": "0",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+    })
+    # the limiter is part of the measured path, but its production budget must not cap the benchmark
+    os.environ.setdefault("LLM_RATE_LIMIT_RPM", "1000000")
+    os.environ.setdefault("LLM_RATE_LIMIT_TPM", "1000000000")
+    # agents and crews are built before the first timed /analyze instead of inside it
+    os.environ.setdefault("PREWARM_MODE", "blocking")
+    os.chdir(work_dir)  # uploads/ and outputs/ land in the scratch directory
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="5,50,200", help="comma-separated document sizes (5-500 pages)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=5, help="timed operations per scenario and size")
+    parser.add_argument("--concurrency", type=int, default=1, help="operations in flight at once")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub LLM seconds per call")
+    parser.add_argument("--llm-tokens", type=int, default=300, help="stub completion tokens per call")
+    parser.add_argument("--llm-per-token-latency", type=float, default=0.0, help="stub seconds per completion token")
+    parser.add_argument("--search-latency", type=float, default=0.1, help="stub Serper seconds per call")
+    parser.add_argument("--job-timeout", type=float, default=600.0, help="seconds to wait for one /analyze job")
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--json", dest="json_path", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    sizes = [int(n) for n in args.pages.split(",") if n.strip()]
+    chosen = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = sorted(set(chosen) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    # resolved now: the run changes into a scratch directory
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    work_dir = tempfile.mkdtemp(prefix="fda-bench-")
+    documents = {n: write_financial_pdf(os.path.join(work_dir, f"synthetic-{n}p.pdf"), n) for n in sizes}
+
+    llm_stub = StubOpenAIServer(args.llm_latency, args.llm_tokens, args.llm_per_token_latency)
+    serper_stub = StubSerperServer(args.search_latency)
+    results: List[Dict[str, Any]] = []
+    with llm_stub, serper_stub:
+        configure_environment(llm_stub, serper_stub, work_dir)
+        for scenario in chosen:
+            if scenario in ("read_cold", "read_warm"):
+                results += bench_read(documents, scenario == "read_cold", args)
+            elif scenario in ("investment", "risk"):
+                results += bench_tool(documents, scenario, args, llm_stub)
+            else:
+                results += bench_analyze(documents, args, llm_stub)
+
+    print_table(results)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.time(), "args": vars(args), "results": results}, f, indent=2)
+
+    failed = any(r.get("errors") for r in results)
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
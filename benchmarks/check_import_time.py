@@ -0,0 +1,91 @@
+"""
+Import-time budget check for the API server.
+
+Imports `main` in a fresh interpreter, subtracts the bare interpreter start-up
+and fails when what is left exceeds the budget, or when a module that should
+only load on first use (crewai, langchain_openai, litellm, openai, ...) was
+imported eagerly. The slowest imports are listed from `python -X importtime`.
+
+Usage:
+    python benchmarks/check_import_time.py                     # default 1500 ms budget
+    python benchmarks/check_import_time.py --budget-ms 800 --runs 5 --top 20
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# heavy dependencies that agents.py / task.py / tools.py / llm_client.py load lazily
+LAZY_MODULES = ["crewai", "crewai_tools", "langchain_openai", "litellm", "openai"]
+
+_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(m for m in sys.modules if "." not in m)}}))
+"""
+
+
+def _probe(body: str) -> Dict:
+    """Run `body` in a fresh interpreter from the repo root and return its timing and top-level modules."""
+    out = subprocess.run([sys.executable, "-c", _PROBE.format(body=body)], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_ms(module: str, runs: int) -> Tuple[float, List[str]]:
+    """Best-of-`runs` milliseconds to import `module`, minus the same probe importing nothing."""
+    baseline = min(_probe("pass")["seconds"] for _ in range(runs))
+    samples = [_probe(f"import {module}") for _ in range(runs)]
+    best = min(samples, key=lambda s: s["seconds"])
+    return (best["seconds"] - baseline) * 1000, best["modules"]
+
+
+def top_imports(module: str, top: int) -> List[Tuple[int, str]]:
+    """The `top` slowest imports by cumulative microseconds, from `-X importtime`."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                         capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="module to import (default: main)")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="allowed import time in milliseconds")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement (best is kept)")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args()
+
+    elapsed, modules = import_ms(args.module, max(1, args.runs))
+    eager = [m for m in LAZY_MODULES if m in modules]
+
+    print(f"import {args.module}: {elapsed:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"{'cumulative ms':>13}  module")
+    for micros, name in top_imports(args.module, args.top):
+        print(f"{micros / 1000:>13.1f}  {name}")
+
+    failed = False
+    if elapsed > args.budget_ms:
+        print(f"FAIL: import took {elapsed:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if eager:
+        print(f"FAIL: imported eagerly (should load on first use): {', '.join(eager)}")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Local stand-ins for the OpenAI and Serper APIs used by the offline benchmarks.
+
+StubOpenAIServer answers POST /v1/chat/completions (plain and stream=true) with
+a fixed number of completion tokens after a configurable delay, and reports
+`usage` like the real API, so the rate limiter, metrics and cost accounting all
+run unchanged. StubSerperServer answers POST /search with Serper-shaped JSON.
+
+Point the app at them with OPENAI_BASE_URL=<openai.url> and SERPER_BASE_URL=<serper.url>.
+
+Usage:
+    python benchmarks/stub_servers.py --latency 0.4 --tokens 300   # serve until Ctrl+C
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+_FILLER = ("revenue margin growth outlook liquidity guidance risk demand pricing capacity "
+           "cash flow segment deliveries costs").split()
+
+
+##-------------------------- Shared HTTP plumbing --------------------------##
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"{}")
+        except ValueError:
+            return {}
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _StubServer:
+    """Threaded HTTP server on 127.0.0.1 running in a daemon thread; usable as a context manager."""
+
+    handler_class = _StubHandler
+
+    def __init__(self, port: int = 0):
+        handler = type(self.handler_class.__name__, (self.handler_class,), {"stub": self})
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def start(self) -> "_StubServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "_StubServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+##-------------------------- OpenAI-compatible stub --------------------------##
+
+class _OpenAIHandler(_StubHandler):
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": self.stub.model, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self) -> None:
+        body = self._read_json()
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        self.stub.count()
+        stub = self.stub
+        messages = body.get("messages") or []
+        prompt_chars = sum(len(str(m.get("content") or "")) for m in messages if isinstance(m, dict))
+        prompt_tokens = max(1, prompt_chars // 4)
+        completion_tokens = max(1, min(stub.completion_tokens, int(body.get("max_tokens") or stub.completion_tokens)))
+        time.sleep(stub.latency + completion_tokens * stub.per_token_latency)
+
+        words = stub.completion_words(completion_tokens)
+        model = body.get("model") or stub.model
+        created = int(time.time())
+        call_id = "chatcmpl-stub-" + hashlib.sha1(f"{created}{prompt_chars}{random.random()}".encode()).hexdigest()[:12]
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            for k, word in enumerate(words):
+                chunk = {"id": call_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"role": "assistant", "content": word + " "} if k == 0
+                                      else {"content": word + " "}, "finish_reason": None}]}
+                self.wfile.write(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+            final = {"id": call_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+            self.wfile.write(b"data: " + json.dumps(final).encode() + b"\n\ndata: [DONE]\n\n")
+            return
+
+        self._send_json(200, {
+            "id": call_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": " ".join(words)}}],
+            "usage": usage,
+        })
+
+
+class StubOpenAIServer(_StubServer):
+    """
+    OpenAI-compatible chat completions endpoint with deterministic cost.
+
+    Args:
+        latency (float): fixed seconds before each response (network + queueing).
+        completion_tokens (int): tokens returned per call (capped by the request's max_tokens).
+        per_token_latency (float): extra seconds per completion token (generation speed).
+    """
+
+    handler_class = _OpenAIHandler
+
+    def __init__(self, latency: float = 0.0, completion_tokens: int = 200, per_token_latency: float = 0.0,
+                 model: str = "gpt-4o-mini", port: int = 0):
+        super().__init__(port)
+        self.latency = latency
+        self.completion_tokens = completion_tokens
+        self.per_token_latency = per_token_latency
+        self.model = model
+
+    @property
+    def base_url(self) -> str:
+        return self.url + "/v1"
+
+    def completion_words(self, n: int) -> List[str]:
+        # roughly one token per word; the 'Final Answer' marker keeps CrewAI's ReAct parser satisfied
+        words = ["Final", "Answer:"] + [_FILLER[k % len(_FILLER)] for k in range(max(0, n - 2))]
+        return words[:max(n, 2)]
+
+
+##-------------------------- Serper-compatible stub --------------------------##
+
+class _SerperHandler(_StubHandler):
+    def do_POST(self) -> None:
+        body = self._read_json()
+        self.stub.count()
+        time.sleep(self.stub.latency)
+        query = str(body.get("q") or "")
+        seed = hashlib.sha256(query.encode("utf-8")).hexdigest()[:8]
+        self._send_json(200, {
+            "searchParameters": {"q": query, "type": "search", "engine": "google"},
+            "organic": [{"title": f"{query} - market update {k + 1}", "link": f"https://example.com/{seed}/{k + 1}",
+                         "snippet": f"Stub result {k + 1} for '{query}'.", "position": k + 1}
+                        for k in range(self.stub.results)],
+        })
+
+
+class StubSerperServer(_StubServer):
+    """Serper-compatible POST /search endpoint returning `results` organic hits after `latency` seconds."""
+
+    handler_class = _SerperHandler
+
+    def __init__(self, latency: float = 0.0, results: int = 5, port: int = 0):
+        super().__init__(port)
+        self.latency = latency
+        self.results = results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per LLM call")
+    parser.add_argument("--tokens", type=int, default=200, help="completion tokens per LLM call")
+    parser.add_argument("--per-token-latency", type=float, default=0.0)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--openai-port", type=int, default=8701)
+    parser.add_argument("--serper-port", type=int, default=8702)
+    args = parser.parse_args()
+
+    openai_stub = StubOpenAIServer(args.latency, args.tokens, args.per_token_latency, port=args.openai_port)
+    serper_stub = StubSerperServer(args.search_latency, port=args.serper_port)
+    with openai_stub, serper_stub:
+        print(f"OPENAI_BASE_URL={openai_stub.base_url}")
+        print(f"SERPER_BASE_URL={serper_stub.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Synthetic financial PDF generator for the offline benchmarks.
+
+Writes plain PDF 1.4 files by hand (no reportlab needed): every page carries a
+statement-style table (revenue, net income, balance sheet lines with several
+year columns) followed by narrative paragraphs, so text extraction, relevance
+selection and key-figure parsing all see realistic input.
+
+Usage:
+    python benchmarks/synthetic_pdf.py out.pdf --pages 120 [--seed 7]
+"""
+import os
+import random
+import argparse
+from typing import List
+
+_WORDS = ("revenue growth margin operating cash flow guidance outlook segment demand pricing capacity "
+          "deliveries production costs inventory liquidity debt capital expenditure energy storage "
+          "services regulatory credits supply chain competition interest rates quarter year").split()
+
+_TABLE_ROWS = ("Total revenues", "Cost of revenues", "Gross profit", "Operating expenses", "Income from operations",
+               "Net income attributable to common stockholders", "Total assets", "Total liabilities",
+               "Total stockholders' equity", "Cash and cash equivalents", "Capital expenditures",
+               "Free cash flow")
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_lines(page_number: int, rng: random.Random) -> List[str]:
+    lines = [f"Quarterly Update - Section {page_number}", "(in millions, USD)",
+             "                                   2025      2024      2023"]
+    for label in rng.sample(_TABLE_ROWS, k=6):
+        values = [f"{rng.randint(500, 90000):,}" for _ in range(3)]
+        lines.append(f"{label:<40} " + "  ".join(values))
+    lines.append("")
+    for _ in range(rng.randint(18, 26)):
+        lines.append(" ".join(rng.choice(_WORDS) for _ in range(rng.randint(9, 14))).capitalize() + ".")
+    return lines
+
+
+def _content_stream(lines: List[str]) -> bytes:
+    ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+    for line in lines:
+        ops.append(f"({_escape(line)}) Tj T*")
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def write_financial_pdf(path: str, num_pages: int, seed: int = 7) -> str:
+    """Write a `num_pages`-page synthetic financial report to `path` and return the path."""
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog_id = add(b"")  # placeholders, filled once the page ids are known
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for n in range(1, num_pages + 1):
+        stream = _content_stream(_page_lines(n, rng))
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref_at)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    write_financial_pdf(args.path, args.pages, args.seed)
+    print(f"wrote {args.path} ({args.pages} pages)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,31 @@
+"""
+Test client and load generator for the Financial Document Analyzer API.
+
+Usage:
+    python client.py                                   # analyze the sample report once and print the result
+    python client.py load --clients 8 --duration 120   # closed loop: 8 clients, each waits for its job
+    python client.py load --mode open --rate 0.5 --duration 300 --corpus data/ --queries queries.txt
+    python client.py load --clients 4 --json run.json --baseline previous.json
+"""
 import requests
 import os
+import sys
+import glob
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 
 API_URL = "http://localhost:8000/analyze"
+BASE_URL = "http://localhost:8000"
+POLL_INTERVAL = 2  # seconds between /jobs/{id} polls
+
+# upper bounds (seconds) of the latency histogram buckets
+HISTOGRAM_BUCKETS = (1, 2.5, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 300, 600)
 
 def test_analysis():
     # Point to a file already in your data/ folder
@@ -15,14 +39,323 @@ def test_analysis():
         data = {"query": "Summarize the financial performance and risks in this document"}
         response = requests.post(API_URL, files=files, data=data)
 
-    if response.status_code == 200:
+    # 202: queued; 200: replayed from the result store with the result inline
+    if response.status_code not in (200, 202):
+        print(f"❌ Request failed with status {response.status_code}")
+        print(response.text)
+        return
+
+    job = response.json()
+    if job.get("replayed"):
+        print(f"♻️ Replayed earlier analysis: {job['job_id']}")
+        status = job
+    else:
+        print(f"⏳ Job queued: {job['job_id']}")
+
+        # Poll until the worker pool has finished the job
+        while True:
+            status = requests.get(BASE_URL + job["status_url"]).json()
+            if status["status"] in ("succeeded", "failed"):
+                break
+            time.sleep(POLL_INTERVAL)
+
+    if status["status"] == "succeeded":
         print("✅ Request successful!")
         print("Response JSON:\n")
-        print(response.json())
+        print(status["result"])
     else:
-        print(f"❌ Request failed with status {response.status_code}")
-        print(response.text)
+        print("❌ Analysis failed")
+        print(status["error"])
+
+
+##-------------------------- Load generation --------------------------##
+
+def load_corpus(entries: List[str]) -> List[str]:
+    """PDF paths from files, directories (all *.pdf inside) and glob patterns."""
+    paths: List[str] = []
+    for entry in entries:
+        if os.path.isdir(entry):
+            paths += sorted(glob.glob(os.path.join(entry, "*.pdf")))
+        elif any(ch in entry for ch in "*?["):
+            paths += sorted(glob.glob(entry))
+        elif os.path.isfile(entry):
+            paths.append(entry)
+    return paths
+
+
+def load_queries(path: Optional[str], inline: List[str]) -> List[str]:
+    queries = list(inline)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            queries += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return queries or ["Summarize the financial performance and risks in this document"]
+
+
+def run_one(session: requests.Session, base_url: str, pdf_path: str, query: str, poll_interval: float,
+            job_timeout: float, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Submit one document and wait for its job; returns one sample record.
+
+    outcome is one of: succeeded, failed (job failed), rejected (429 queue full),
+    http_error (other non-2xx answer), timeout, error (connection or client error).
+    `replayed` is set when the server answered from its result store.
+    """
+    started = time.time()
+    t0 = time.perf_counter()
+    sample: Dict[str, Any] = {"started_at": started, "document": os.path.basename(pdf_path), "query": query}
+    try:
+        with open(pdf_path, "rb") as f:
+            resp = session.post(base_url + "/analyze", files={"file": (os.path.basename(pdf_path), f)},
+                                data={"query": query, "refresh": str(refresh).lower()}, timeout=120)
+        sample["submit_seconds"] = time.perf_counter() - t0
+        if resp.status_code not in (200, 202):
+            sample["outcome"] = "rejected" if resp.status_code == 429 else "http_error"
+            sample["status_code"] = resp.status_code
+            return sample
+
+        submitted = resp.json()
+        sample["replayed"] = bool(submitted.get("replayed"))
+        status_url = base_url + submitted["status_url"]
+        deadline = time.perf_counter() + job_timeout
+        while True:
+            job = session.get(status_url, timeout=30).json()
+            if job["status"] in ("succeeded", "failed"):
+                sample["outcome"] = job["status"]
+                if job["status"] == "failed":
+                    sample["error"] = str(job.get("error"))[:200]
+                break
+            if time.perf_counter() > deadline:
+                sample["outcome"] = "timeout"
+                break
+            time.sleep(poll_interval)
+    except (requests.RequestException, OSError, ValueError, KeyError) as e:
+        sample["outcome"] = "error"
+        sample["error"] = f"{type(e).__name__}: {e}"[:200]
+    finally:
+        sample["latency_seconds"] = time.perf_counter() - t0
+    return sample
+
+
+class LoadGenerator:
+    """
+    Drives /analyze with a closed or open workload and records one sample per request.
+
+    closed: `clients` workers each submit a document, wait for its job to finish,
+            pause `think_time` seconds and repeat, so load follows server capacity.
+    open:   requests arrive as a Poisson process at `rate` per second regardless of
+            how fast the server answers (at most `clients` in flight), which exposes
+            queueing and 429 behaviour under overload.
+
+    Requests started during the first `warmup` seconds run normally but are left
+    out of the summary.
+    """
+
+    def __init__(self, base_url: str, corpus: List[str], queries: List[str], mode: str = "closed",
+                 clients: int = 4, rate: float = 1.0, duration: float = 60.0, warmup: float = 0.0,
+                 think_time: float = 0.0, poll_interval: float = POLL_INTERVAL, job_timeout: float = 900.0,
+                 refresh: bool = False, seed: Optional[int] = None):
+        self.base_url = base_url.rstrip("/")
+        self.corpus = corpus
+        self.queries = queries
+        self.mode = mode
+        self.clients = max(1, clients)
+        self.rate = rate
+        self.duration = duration
+        self.warmup = warmup
+        self.think_time = think_time
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self.refresh = refresh
+        self.samples: List[Dict[str, Any]] = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        # one keep-alive session per worker thread
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _pick(self):
+        with self._lock:
+            return self._rng.choice(self.corpus), self._rng.choice(self.queries)
+
+    def _request(self) -> None:
+        pdf_path, query = self._pick()
+        sample = run_one(self._session(), self.base_url, pdf_path, query, self.poll_interval, self.job_timeout,
+                         self.refresh)
+        sample["warmup"] = sample["started_at"] < self.measure_from
+        with self._lock:
+            self.samples.append(sample)
+
+    def run(self) -> Dict[str, Any]:
+        self.run_started = time.time()
+        self.measure_from = self.run_started + self.warmup
+        stop_at = self.measure_from + self.duration
+
+        if self.mode == "closed":
+            def client_loop() -> None:
+                while time.time() < stop_at:
+                    self._request()
+                    if self.think_time:
+                        time.sleep(self.think_time)
+
+            workers = [threading.Thread(target=client_loop, daemon=True) for _ in range(self.clients)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+        else:
+            slots = threading.BoundedSemaphore(self.clients)
+            with ThreadPoolExecutor(max_workers=self.clients) as pool:
+                next_at = time.time()
+                while next_at < stop_at:
+                    time.sleep(max(0.0, next_at - time.time()))
+                    if slots.acquire(blocking=False):
+                        future = pool.submit(self._request)
+                        future.add_done_callback(lambda _: slots.release())
+                    else:
+                        # every client busy: the arrival is recorded as an error instead of queueing
+                        with self._lock:
+                            self.samples.append({"started_at": time.time(), "outcome": "client_saturated",
+                                                 "latency_seconds": 0.0,
+                                                 "warmup": time.time() < self.measure_from})
+                    next_at += self._rng.expovariate(self.rate)
+        self.run_finished = time.time()
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        measured = [s for s in self.samples if not s.get("warmup")]
+        outcomes: Dict[str, int] = {}
+        for s in measured:
+            outcomes[s["outcome"]] = outcomes.get(s["outcome"], 0) + 1
+        ok = sorted(s["latency_seconds"] for s in measured if s["outcome"] == "succeeded")
+        submit = sorted(s["submit_seconds"] for s in measured if "submit_seconds" in s)
+        window = max(1e-9, self.run_finished - self.measure_from)
+        errors = len(measured) - len(ok)
+        return {
+            "mode": self.mode,
+            "clients": self.clients,
+            "rate_per_s": self.rate if self.mode == "open" else None,
+            "warmup_seconds": self.warmup,
+            "measured_seconds": round(window, 2),
+            "requests": len(measured),
+            "warmup_requests": len(self.samples) - len(measured),
+            "outcomes": outcomes,
+            "error_rate": round(errors / len(measured), 4) if measured else 0.0,
+            "replayed": sum(1 for s in measured if s.get("replayed")),
+            "throughput_per_s": round(len(ok) / window, 4),
+            "latency_seconds": latency_stats(ok),
+            "submit_latency_seconds": latency_stats(submit),
+            "histogram": histogram(ok),
+        }
+
+
+##-------------------------- Reporting --------------------------##
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list (0 for an empty list)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def latency_stats(sorted_values: List[float]) -> Dict[str, float]:
+    stats = {f"p{int(q * 100)}": round(percentile(sorted_values, q), 3) for q in (0.5, 0.9, 0.95, 0.99)}
+    stats["mean"] = round(sum(sorted_values) / len(sorted_values), 3) if sorted_values else 0.0
+    stats["max"] = round(sorted_values[-1], 3) if sorted_values else 0.0
+    return stats
+
+
+def histogram(values: List[float]) -> List[Dict[str, Any]]:
+    """Per-bucket (non-cumulative) counts; the last bucket ('+Inf') catches everything slower."""
+    counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+    for v in values:
+        counts[next((k for k, bound in enumerate(HISTOGRAM_BUCKETS) if v <= bound), len(HISTOGRAM_BUCKETS))] += 1
+    bounds = [str(b) for b in HISTOGRAM_BUCKETS] + ["+Inf"]
+    return [{"le": b, "count": c} for b, c in zip(bounds, counts)]
+
+
+def print_report(summary: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    lat = summary["latency_seconds"]
+    print(f"mode={summary['mode']} clients={summary['clients']} rate={summary['rate_per_s']} "
+          f"measured={summary['measured_seconds']}s (warm-up requests excluded: {summary['warmup_requests']})")
+    print(f"requests={summary['requests']} outcomes={summary['outcomes']} error_rate={summary['error_rate']:.1%} "
+          f"replayed={summary['replayed']}")
+    print(f"throughput={summary['throughput_per_s']:.3f} analyses/s")
+    print("latency s: " + "  ".join(f"{k}={v:.2f}" for k, v in lat.items()))
+
+    peak = max((b["count"] for b in summary["histogram"]), default=0) or 1
+    print("\nlatency histogram (succeeded requests)")
+    for bucket in summary["histogram"]:
+        bar = "#" * round(40 * bucket["count"] / peak)
+        label = f"<= {bucket['le']}s" if bucket["le"] != "+Inf" else f"> {HISTOGRAM_BUCKETS[-1]}s"
+        print(f"  {label:>9} {bucket['count']:>6}  {bar}")
+
+    if baseline:
+        print("\nvs baseline")
+        for key in ("throughput_per_s", "error_rate"):
+            print(f"  {key:<18} {baseline[key]:>10} -> {summary[key]:<10} ({_delta(baseline[key], summary[key])})")
+        for key in ("p50", "p95", "p99"):
+            old, new = baseline["latency_seconds"][key], lat[key]
+            print(f"  latency {key:<10} {old:>10} -> {new:<10} ({_delta(old, new)})")
+
+
+def _delta(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old:+.1%}"
+
+
+def load_test(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="client.py load", description=LoadGenerator.__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=BASE_URL, help="API base URL")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients (open mode: max in flight)")
+    parser.add_argument("--rate", type=float, default=1.0, help="open mode: mean arrivals per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="measured seconds after warm-up")
+    parser.add_argument("--warmup", type=float, default=0.0, help="seconds of traffic excluded from the report")
+    parser.add_argument("--think-time", type=float, default=0.0, help="closed mode: pause between requests")
+    parser.add_argument("--corpus", nargs="+", default=["data"], help="PDF files, directories or glob patterns")
+    parser.add_argument("--queries", help="text file with one query per line")
+    parser.add_argument("--query", action="append", default=[], help="query to use (repeatable)")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--job-timeout", type=float, default=900.0, help="seconds before a job counts as timed out")
+    parser.add_argument("--refresh", action="store_true",
+                        help="ask the server to re-run every analysis instead of replaying stored results")
+    parser.add_argument("--seed", type=int, help="seed for document/query choice and open-loop arrivals")
+    parser.add_argument("--json", dest="json_path", help="write summary and per-request samples to this file")
+    parser.add_argument("--baseline", help="JSON output of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print(f"ERROR: no PDFs found in {args.corpus}")
+        return 2
+    generator = LoadGenerator(args.url, corpus, load_queries(args.queries, args.query), mode=args.mode,
+                              clients=args.clients, rate=args.rate, duration=args.duration, warmup=args.warmup,
+                              think_time=args.think_time, poll_interval=args.poll_interval,
+                              job_timeout=args.job_timeout, refresh=args.refresh, seed=args.seed)
+    print(f"⏳ {args.mode}-loop load: {len(corpus)} documents, {args.warmup:.0f}s warm-up + {args.duration:.0f}s")
+    summary = generator.run()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["summary"]
+    print_report(summary, baseline)
+
+    if args.json_path:
+        config = {k: v for k, v in vars(args).items() if k not in ("json_path", "baseline")}
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "summary": summary, "samples": generator.samples}, f, indent=2)
+    return 0
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "load":
+        sys.exit(load_test(sys.argv[2:]))
     test_analysis()
@@ -0,0 +1,202 @@
+## Importing libraries and files
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PageRecords = List[Dict[str, Any]]
+
+
+##-------------------------- Content hashing --------------------------##
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Return the SHA-256 hex digest of the file at `path`.
+
+    The file is read in fixed-size chunks so hashing a large filing never
+    loads the whole document into memory.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+##-------------------------- Parsed Document Cache --------------------------##
+
+class ParsedDocumentCache:
+    """
+    Content-addressed cache of per-page PDF records.
+
+    Entries are keyed by the hash of the file's bytes plus the parser
+    signature (backend names/versions), so the same report uploaded twice,
+    or read by several agents in one crew run, is parsed only once.
+
+    Records are kept in an in-memory LRU and, when `cache_dir` is set,
+    persisted as JSON files so other worker processes and later requests
+    can reuse them. Disk files expire after `ttl_seconds` and, once the directory
+    holds more than `max_disk_bytes`, the least recently used files are deleted
+    on write (0 disables the respective bound).
+    """
+
+    def __init__(self, max_entries: int = 32, cache_dir: Optional[str] = None,
+                 max_disk_bytes: int = 512 * 1024 * 1024, ttl_seconds: float = 30 * 24 * 3600):
+        self.max_entries = max(1, int(max_entries))
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max(0, int(max_disk_bytes))
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+        self._entries: "OrderedDict[str, PageRecords]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(digest: str, parser_signature: str) -> str:
+        """Combine a content digest and a parser signature into one cache key."""
+        sig = hashlib.sha256(parser_signature.encode("utf-8")).hexdigest()[:16]
+        return f"{digest}-{sig}"
+
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[PageRecords]:
+        """Return a copy of the cached page records for `key`, or None on a miss."""
+        with self._lock:
+            pages = self._entries.get(key)
+            if pages is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return [dict(p) for p in pages]
+
+        pages = self._load_from_disk(key)
+        with self._lock:
+            if pages is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, pages)
+        return [dict(p) for p in pages]
+
+    def put(self, key: str, pages: PageRecords) -> None:
+        """Store page records in memory and (if enabled) on disk."""
+        stored = [dict(p) for p in pages]
+        with self._lock:
+            self._remember(key, stored)
+        self._write_to_disk(key, stored)
+
+    def clear(self) -> None:
+        """Drop the in-memory entries (disk files are left in place)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _remember(self, key: str, pages: PageRecords) -> None:
+        # caller holds the lock
+        self._entries[key] = pages
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load_from_disk(self, key: str) -> Optional[PageRecords]:
+        path = self._disk_path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            if self.ttl_seconds and time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                pages = json.load(f)
+            if isinstance(pages, list):
+                os.utime(path)  # the modification time doubles as last use for LRU pruning
+                return pages
+        except Exception as e:
+            logger.warning("Ignoring unreadable document cache file %s: %s", path, e)
+        return None
+
+    def _write_to_disk(self, key: str, pages: PageRecords) -> None:
+        path = self._disk_path(key)
+        if not path:
+            return
+        try:
+            # write to a temp file first so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(pages, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning("Could not persist document cache entry %s: %s", key, e)
+            return
+        self._prune_disk(keep=path)
+
+    def _prune_disk(self, keep: str) -> None:
+        """Delete expired files, then the least recently used ones until the directory fits `max_disk_bytes`."""
+        if not self.ttl_seconds and not self.max_disk_bytes:
+            return
+        now = time.time()
+        files = []
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith((".json", ".tmp")):
+                        st = entry.stat()
+                        files.append((st.st_mtime, st.st_size, entry.path))
+        except OSError as e:
+            logger.warning("Could not list document cache directory %s: %s", self.cache_dir, e)
+            return
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            expired = self.ttl_seconds and now - mtime > self.ttl_seconds
+            if not expired and (not self.max_disk_bytes or total <= self.max_disk_bytes):
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass  # removed by another worker process
+
+
+_default_cache: Optional[ParsedDocumentCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_document_cache() -> ParsedDocumentCache:
+    """
+    Return the process-wide parsed-document cache.
+
+    Configured through the environment:
+        PARSED_DOC_CACHE_SIZE (int): max in-memory documents (default 32).
+        PARSED_DOC_CACHE_DIR (str): on-disk cache directory (default '.cache/parsed_docs').
+                                    Set to an empty string to disable disk persistence.
+        PARSED_DOC_CACHE_DISK_MB (float): disk space the directory may use before the
+                                    least recently used files are deleted (default 512, 0 = no limit).
+        PARSED_DOC_CACHE_TTL (float): seconds a disk file stays valid (default 30 days, 0 = forever).
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ParsedDocumentCache(
+                max_entries=int(os.getenv("PARSED_DOC_CACHE_SIZE", "32")),
+                cache_dir=os.getenv("PARSED_DOC_CACHE_DIR", os.path.join(".cache", "parsed_docs")) or None,
+                max_disk_bytes=int(float(os.getenv("PARSED_DOC_CACHE_DISK_MB", "512")) * 1024 * 1024),
+                ttl_seconds=float(os.getenv("PARSED_DOC_CACHE_TTL", str(30 * 24 * 3600))),
+            )
+        return _default_cache
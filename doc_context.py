@@ -0,0 +1,151 @@
+## Importing libraries and files
+import os
+import re
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from metrics import span
+from pdf_reader import PageSelection, SpilledPages, _apply_char_budget, load_pages, parse_page_selection, read_pages
+
+logger = logging.getLogger(__name__)
+
+HANDLE_PREFIX = "doc-"
+_HANDLE_RE = re.compile(r"^doc-[0-9a-f]{16}$")
+
+
+def join_pages(pages: Sequence[Dict[str, Any]]) -> str:
+    """Join page records the way read_data_tool does: '--- PAGE n ---' markers, blank-line separated."""
+    return "\n\n".join(f"--- PAGE {p['page_number']} ---\n{p['text']}" for p in pages)
+
+
+def is_handle(ref: Any) -> bool:
+    return isinstance(ref, str) and bool(_HANDLE_RE.match(ref.strip()))
+
+
+##-------------------------- Request-scoped document context --------------------------##
+
+class DocumentContext:
+    """
+    One extracted document, shared by every agent and tool of a single request.
+
+    `pages` is a list, or a SpilledPages for documents whose text was moved to disk;
+    the joined text of a spilled document is rebuilt on each use instead of kept.
+    """
+
+    def __init__(self, handle: str, path: str, pages: Sequence[Dict[str, Any]]):
+        self.handle = handle
+        self.path = path
+        self.pages = pages
+        self.created_at = time.time()
+        self._text: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        if isinstance(self.pages, SpilledPages):
+            return join_pages(self.pages)
+        # joined once on first use; every tool call after that reuses the same string
+        if self._text is None:
+            self._text = join_pages(self.pages)
+        return self._text
+
+    def select(self, pages: PageSelection = None, max_chars: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Page records for a 1-based `pages` selection, cut to `max_chars` characters of text."""
+        records: Sequence[Dict[str, Any]] = self.pages
+        if pages is not None:
+            keep = set(parse_page_selection(pages, len(records)))
+            records = [p for k, p in enumerate(records) if k in keep]
+        return list(_apply_char_budget(iter(records), max_chars))
+
+
+class DocumentContextStore:
+    """
+    Registry of documents extracted for in-flight requests.
+
+    `open` parses the PDF once (through the parsed-document cache) and returns a
+    short handle such as 'doc-3f2b0c9e6d1a4b0f'. Tasks pass that handle to the
+    tools instead of the document text, so the text never travels through LLM
+    tool-call arguments. `release` drops the document when the request ends.
+    """
+
+    def __init__(self):
+        self._contexts: Dict[str, DocumentContext] = {}
+        self._lock = threading.Lock()
+
+    def open(self, path: str) -> str:
+        """
+        Extract the PDF at `path` and register it.
+
+        Raises:
+            FileNotFoundError: if path does not exist
+            RuntimeError: if parsing produced no pages
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"PDF not found at path: {path}")
+        with span("extract", kind="pdf"):
+            pages = load_pages(path)
+        if not pages:
+            raise RuntimeError("PDF parsing produced no pages.")
+        handle = HANDLE_PREFIX + uuid.uuid4().hex[:16]
+        with self._lock:
+            self._contexts[handle] = DocumentContext(handle, path, pages)
+        logger.info("document context %s opened for %s (%d pages)", handle, path, len(pages))
+        return handle
+
+    def get(self, handle: str) -> Optional[DocumentContext]:
+        with self._lock:
+            return self._contexts.get(handle.strip())
+
+    def release(self, handle: str) -> None:
+        with self._lock:
+            ctx = self._contexts.pop(handle, None)
+        if ctx is not None and isinstance(ctx.pages, SpilledPages):
+            ctx.pages.close()
+
+    @contextmanager
+    def scope(self, path: str) -> Iterator[str]:
+        """Open `path` for the duration of a `with` block and release it afterwards."""
+        handle = self.open(path)
+        try:
+            yield handle
+        finally:
+            self.release(handle)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"documents": len(self._contexts),
+                    "chars": sum(len(c.text) for c in self._contexts.values() if c._text is not None)}
+
+
+_default_store = DocumentContextStore()
+
+
+def get_context_store() -> DocumentContextStore:
+    """Return the process-wide document context store."""
+    return _default_store
+
+
+def resolve_document(ref: str) -> Tuple[str, Optional[str]]:
+    """
+    Turn a tool's document argument into (document text, PDF path or None).
+
+    `ref` may be a document handle, a path to a PDF, or the document text itself
+    (kept for callers that still pass text around).
+
+    Raises:
+        KeyError: if `ref` looks like a handle but is not (or no longer) registered
+        FileNotFoundError, RuntimeError (e.g. MemoryCeilingExceeded) or a parser error:
+            if `ref` names a PDF that cannot be read
+    """
+    if is_handle(ref):
+        ctx = get_context_store().get(ref)
+        if ctx is None:
+            raise KeyError(f"Unknown or expired document handle: {ref.strip()}")
+        return ctx.text, ctx.path
+    candidate = ref.strip()
+    if candidate.lower().endswith(".pdf") and os.path.isfile(candidate):
+        return join_pages(list(read_pages(candidate))), candidate
+    return ref, None
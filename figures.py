@@ -0,0 +1,286 @@
+## Importing libraries and files
+import re
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+try:
+    import pdfplumber
+except Exception:
+    pdfplumber = None
+
+from mapreduce import split_pages
+from pdf_reader import iter_layout_pages
+
+logger = logging.getLogger(__name__)
+
+FIGURE_NAMES = ("revenue", "net_income", "assets", "liabilities", "equity")
+RATIO_NAMES = ("net_income_margin", "debt_ratio", "equity_to_assets")
+
+# Row labels for each figure, most specific first. Matched against the start of a table
+# row label or text line (case-insensitive).
+_LABELS: Dict[str, List[str]] = {
+    "revenue": [r"total revenues?", r"total net sales", r"net revenues?", r"revenues?", r"net sales"],
+    "net_income": [r"net income attributable to [a-z .,'&]+", r"net (?:income|earnings)(?: \(loss\))?",
+                   r"net loss"],
+    "assets": [r"total assets"],
+    "liabilities": [r"total liabilities(?! and)"],
+    "equity": [r"total (?:stockholders|shareholders)['’]? equity", r"total equity"],
+}
+_LABEL_RES = {name: [re.compile(r"^\s*" + p + r"\b", re.IGNORECASE) for p in pats] for name, pats in _LABELS.items()}
+# rows whose label states a loss report it unsigned ("Net loss 1,234")
+_LOSS_RE = re.compile(r"^\s*net loss\b", re.IGNORECASE)
+
+_NUMBER_RE = re.compile(r"(?<![\w.])\(?-?\$?\s?\d[\d,]*(?:\.\d+)?\s?(?:[kmb]n?|million|billion|thousand)?\)?%?", re.IGNORECASE)
+_UNIT_RE = re.compile(r"\bin (thousands|millions|billions)\b|\b(?:usd|\$) ?(thousands|millions|billions)\b", re.IGNORECASE)
+_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+_SCALES = {"thousands": 1e3, "millions": 1e6, "billions": 1e9}
+_SUFFIX_SCALES = {"k": 1e3, "m": 1e6, "mn": 1e6, "million": 1e6, "b": 1e9, "bn": 1e9, "billion": 1e9, "thousand": 1e3}
+_SUFFIX_RE = re.compile(r"\d\s?(?:[kmb]n?|million|billion|thousand)\)?$", re.IGNORECASE)
+
+
+##-------------------------- Number / unit parsing --------------------------##
+
+def parse_number(token: str) -> Optional[float]:
+    """
+    Parse a financial number such as '22,496', '(1,234.5)', '$3.1B' or '-42'.
+
+    Parentheses mean negative. Suffixes k/m/b (and million/billion/thousand) scale
+    the value. Percentages and empty cells return None.
+    """
+    if token is None:
+        return None
+    t = token.strip().replace("−", "-")
+    if not t or t.endswith("%") or t in ("-", "—", "–"):
+        return None
+    negative = t.startswith("(") and t.endswith(")")
+    t = t.strip("()").replace("$", "").replace(",", "").strip()
+    if t.startswith("-"):
+        negative = True
+        t = t[1:]
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)\s?([a-z]*)", t, re.IGNORECASE)
+    if not m:
+        return None
+    suffix = m.group(2).lower()
+    if suffix and suffix not in _SUFFIX_SCALES:
+        return None
+    value = float(m.group(1)) * _SUFFIX_SCALES.get(suffix, 1.0)
+    return -value if negative else value
+
+
+def detect_unit(text: str) -> Tuple[str, float]:
+    """Return (unit label, multiplier) declared in the text, e.g. ('USD millions', 1e6)."""
+    m = _UNIT_RE.search(text or "")
+    if not m:
+        return "", 1.0
+    scale = (m.group(1) or m.group(2)).lower()
+    return f"USD {scale}", _SCALES[scale]
+
+
+def _match_figure(label: str) -> Optional[str]:
+    for name, patterns in _LABEL_RES.items():
+        if any(p.search(label) for p in patterns):
+            return name
+    return None
+
+
+def _latest_column(header_rows: List[List[Any]]) -> Optional[int]:
+    """Index of the column whose header mentions the most recent year, if any."""
+    best: Tuple[int, Optional[int]] = (0, None)
+    for row in header_rows:
+        for col, cell in enumerate(row or []):
+            years = [int(y) for y in _YEAR_RE.findall(str(cell or ""))]
+            if years and max(years) > best[0]:
+                best = (max(years), col)
+    return best[1]
+
+
+##-------------------------- Extraction --------------------------##
+
+def _record(figures: Dict[str, Dict[str, Any]], name: str, label: str, token: str, value: float,
+            page_unit: Tuple[str, float], page: Any, source: str) -> None:
+    """
+    Store `value` (parsed from `token` on a row labelled `label`) as figure `name` in USD.
+
+    A token with its own k/m/b suffix is already in USD (parse_number applied it);
+    otherwise the page's unit declaration ('in millions') scales it. With neither the
+    scale is unknown: the value is kept as printed with scale None, and ratios that
+    need it are not computed.
+    """
+    # first hit wins: statements are matched most-specific label first, in page order
+    if name in figures:
+        return
+    if name == "net_income" and _LOSS_RE.match(label):
+        value = -abs(value)
+    unit, multiplier = page_unit
+    if _SUFFIX_RE.search(token.strip()):
+        scale: Optional[float] = 1.0
+    else:
+        scale = multiplier if unit else None
+    figures[name] = {"value": value * scale if scale is not None else value, "scale": scale,
+                     "unit": "USD" if scale is not None else "", "page": page, "source": source}
+
+
+def extract_from_tables(path: str, page_numbers: Optional[List[int]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Pull key figures from the tables of the PDF at `path` using pdfplumber.
+
+    Only `page_numbers` (1-based) are scanned when given. Pages are parsed one at a
+    time through pdf_reader.iter_layout_pages (memory-mapped, released page by page,
+    charged to the request's memory budget). For each matching row the value in the
+    most recent year's column is used, or the first numeric cell if no header
+    mentions a year.
+    """
+    figures: Dict[str, Dict[str, Any]] = {}
+    if pdfplumber is None:
+        return figures
+    for page_number, page in iter_layout_pages(path, page_numbers):
+        try:
+            unit = detect_unit(page.extract_text() or "")
+            tables = page.extract_tables()
+        except Exception as e:
+            logger.warning("table extraction failed on page %d: %s", page_number, e)
+            continue
+        for table in tables:
+            latest = _latest_column(table[:2])
+            for row in table:
+                if not row or not row[0]:
+                    continue
+                name = _match_figure(str(row[0]))
+                if name is None:
+                    continue
+                cells = list(row[1:])
+                if latest is not None and 0 < latest < len(row):
+                    cells = [row[latest]] + cells
+                for cell in cells:
+                    value = parse_number(str(cell or ""))
+                    if value is not None:
+                        _record(figures, name, str(row[0]), str(cell), value, unit, page_number, "table")
+                        break
+        if len(figures) == len(FIGURE_NAMES):
+            break
+    return figures
+
+
+def extract_from_text(text: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Pull key figures from plain text (e.g. read_data_tool output), line by line.
+
+    A line counts when it starts with a known label and is followed by numbers,
+    e.g. 'Total revenues 22,496 25,500'. When the page has a year header line with as
+    many years as the row has numbers ('2023 2024 2025'), the most recent year's value
+    is used; otherwise the first number on the line.
+    """
+    figures: Dict[str, Dict[str, Any]] = {}
+    for label, page_text in split_pages(text):
+        unit = detect_unit(page_text)
+        years: List[int] = []
+        for line in page_text.splitlines():
+            name = _match_figure(line)
+            if name is None:
+                # a header names two or more years and no amounts (day numbers as in 'Dec 31' are fine)
+                line_years = [int(y) for y in _YEAR_RE.findall(line)]
+                if len(line_years) >= 2 and all(_YEAR_RE.fullmatch(t.strip()) or len(t.strip(" ,")) <= 2
+                                                for t in _NUMBER_RE.findall(line)):
+                    years = line_years
+                continue
+            if name in figures:
+                continue
+            tokens = [t for t in _NUMBER_RE.findall(line) if not _YEAR_RE.fullmatch(t.strip())]
+            values = [(t, parse_number(t)) for t in tokens]
+            values = [(t, v) for t, v in values if v is not None]
+            if not values:
+                continue
+            token, value = values[0]
+            if years and len(values) == len(years):
+                token, value = values[years.index(max(years))]
+            _record(figures, name, line, token, value, unit, label, "text")
+    return figures
+
+
+##-------------------------- Ratios --------------------------##
+
+def compute_ratios_batch(rows: List[Dict[str, Dict[str, Any]]]) -> List[Dict[str, Optional[float]]]:
+    """
+    Compute net_income_margin, debt_ratio and equity_to_assets for many documents at once.
+
+    Figures are laid out as a (documents x 5) array and every ratio is one vectorized
+    division; missing figures, figures of unknown scale (see `_record`) or zero
+    denominators give None, so amounts in different units are never divided.
+    """
+    def val(figs: Dict[str, Dict[str, Any]], name: str) -> float:
+        entry = figs.get(name)
+        return float(entry["value"]) if entry and entry.get("scale") is not None else float("nan")
+
+    if np is None:
+        out = []
+        for figs in rows:
+            def div(a: str, b: str) -> Optional[float]:
+                x, y = val(figs, a), val(figs, b)
+                return None if x != x or y != y or y == 0 else x / y
+            out.append({"net_income_margin": div("net_income", "revenue"),
+                        "debt_ratio": div("liabilities", "assets"),
+                        "equity_to_assets": div("equity", "assets")})
+        return out
+
+    data = np.array([[val(figs, n) for n in FIGURE_NAMES] for figs in rows], dtype=np.float64).reshape(-1, len(FIGURE_NAMES))
+    revenue, net_income, assets, liabilities, equity = data.T
+    numerators = np.stack([net_income, liabilities, equity], axis=1)
+    denominators = np.stack([revenue, assets, assets], axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = np.where(denominators != 0, numerators / denominators, np.nan)
+    return [{name: (None if np.isnan(v) else float(v)) for name, v in zip(RATIO_NAMES, row)} for row in ratios]
+
+
+def compute_ratios(figures: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[float]]:
+    return compute_ratios_batch([figures])[0]
+
+
+def format_key_figures(figures: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Render figures and ratios in the KEY FIGURES / RATIOS section format of the analysis tool.
+
+    Values of known scale are written in USD without commas; the others as printed in
+    the document, marked '(unit not stated)'.
+    """
+    lines = ["KEY FIGURES:"]
+    for name in FIGURE_NAMES:
+        entry = figures.get(name)
+        if entry is None:
+            lines.append(f"{name}: N/A")
+        else:
+            unit = f" {entry['unit']}" if entry["unit"] else " (unit not stated)"
+            lines.append(f"{name}: {entry['value']:.15g}{unit} (page {entry['page']}, {entry['source']})")
+    lines.append("RATIOS:")
+    for name, value in compute_ratios(figures).items():
+        lines.append(f"{name}: {'N/A' if value is None else f'{value * 100:.2f}%'}")
+    return "\n".join(lines)
+
+
+def extract_key_figures(path: Optional[str] = None, text: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Extract key figures from a PDF's tables (when `path` is given) and/or plain text.
+
+    Table values take precedence; text fills whatever the tables did not provide.
+    When both are given, only pages whose text mentions a figure label are scanned
+    for tables (none when no page does).
+    """
+    figures: Dict[str, Dict[str, Any]] = {}
+    if path is not None:
+        candidates = None
+        if text is not None:
+            candidates = sorted({int(label) for label, page in split_pages(text)
+                                 if label.isdigit() and any(_match_figure(line) for line in page.splitlines())})
+        if candidates is None or candidates:
+            try:
+                figures.update(extract_from_tables(path, candidates))
+            except Exception as e:
+                logger.warning("table-based figure extraction failed for %s: %s", path, e)
+    if text is not None:
+        for name, entry in extract_from_text(text).items():
+            figures.setdefault(name, entry)
+    return figures
@@ -0,0 +1,417 @@
+## Importing libraries and files
+import time
+import uuid
+import queue
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# the job each worker thread is currently running (see current_job)
+_current = threading.local()
+
+# how often idle workers and a blocked batch feeder look at the stop flag
+_POLL_SECONDS = 0.5
+
+
+##-------------------------- Analysis Jobs --------------------------##
+
+class JobQueueFull(Exception):
+    """Raised by JobManager.submit / submit_batch when the pending-job queue is at capacity."""
+
+
+class Job:
+    """A single queued analysis and its lifecycle state."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    def __init__(self, params: Dict[str, Any], on_finish: Optional[Callable[["Job"], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.on_finish = on_finish
+        self.status = Job.QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+        self._events: List[Tuple[str, Any]] = []
+        self._subscribers: List[Callable[[str, Any], None]] = []
+        self._events_lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (Job.SUCCEEDED, Job.FAILED)
+
+    def emit(self, event: str, data: Any) -> None:
+        """Record a progress event and push it to every subscriber (called from worker threads)."""
+        with self._events_lock:
+            self._events.append((event, data))
+            subscribers = list(self._subscribers)
+        for fn in subscribers:
+            try:
+                fn(event, data)
+            except Exception:
+                logger.exception("event subscriber for job %s failed", self.id)
+
+    def subscribe(self, fn: Callable[[str, Any], None]) -> List[Tuple[str, Any]]:
+        """
+        Register `fn(event, data)` for future events.
+
+        Returns the events emitted so far; registration and the snapshot happen under
+        one lock, so a subscriber sees every event exactly once.
+        """
+        with self._events_lock:
+            self._subscribers.append(fn)
+            return list(self._events)
+
+    def unsubscribe(self, fn: Callable[[str, Any], None]) -> None:
+        with self._events_lock:
+            if fn in self._subscribers:
+                self._subscribers.remove(fn)
+
+    @classmethod
+    def completed(cls, params: Dict[str, Any], result: Any) -> "Job":
+        """A job that finished without running, e.g. an analysis replayed from the result store."""
+        job = cls(params)
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.started_at = job.finished_at = job.created_at
+        job.emit("done", job.to_dict())
+        job.done.set()
+        return job
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the job (parameters are not exposed)."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class Batch:
+    """
+    A group of jobs submitted together by /analyze/batch.
+
+    Each entry describes one unique document (its file names, content digest, ...);
+    entries with a job are tracked through it, the rest (e.g. rejected by the
+    prefilter) are reported as-is.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], jobs: List[Optional[Job]]):
+        self.id = uuid.uuid4().hex
+        self.entries = entries
+        self.jobs = jobs
+        self.created_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return all(job is None or job.finished for job in self.jobs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Per-document status/results plus aggregate counts and timing."""
+        documents = []
+        counts: Dict[str, int] = {}
+        for entry, job in zip(self.entries, self.jobs):
+            doc = dict(entry)
+            if job is not None:
+                doc.update(job.to_dict())
+            counts[doc.get("status", "unknown")] = counts.get(doc.get("status", "unknown"), 0) + 1
+            documents.append(doc)
+
+        started = [j for j in self.jobs if j is not None and j.started_at is not None]
+        done = [j for j in started if j.finished_at is not None]
+        run_times = [j.finished_at - j.started_at for j in done]
+        waits = [j.started_at - j.created_at for j in started]
+        timing = {
+            "wall_seconds": (max(j.finished_at for j in done) - self.created_at) if done and self.finished else None,
+            "elapsed_seconds": time.time() - self.created_at,
+            "total_run_seconds": sum(run_times),
+            "mean_run_seconds": (sum(run_times) / len(run_times)) if run_times else None,
+            "max_run_seconds": max(run_times) if run_times else None,
+            "mean_queue_wait_seconds": (sum(waits) / len(waits)) if waits else None,
+        }
+        return {
+            "batch_id": self.id,
+            "status": "finished" if self.finished else "running",
+            "created_at": self.created_at,
+            "counts": counts,
+            "timing": timing,
+            "documents": documents,
+        }
+
+
+class JobManager:
+    """
+    Bounded queue of analysis jobs worked through by a fixed pool of threads.
+
+    Crew runs are dominated by network waits on the LLM and search APIs, so worker
+    threads keep the event loop free without the cost of pickling crews across
+    processes. `submit` never blocks: when `max_queue` jobs are already waiting it
+    raises JobQueueFull so the API can answer 429 instead of piling up work.
+
+    Batch jobs that do not fit the queue wait in a backlog of at most `max_backlog`
+    jobs, fed to the queue by a single thread as workers free up.
+    """
+
+    def __init__(self, runner: Callable[..., Any], workers: int = 2, max_queue: int = 16,
+                 history: int = 256, max_backlog: int = 64):
+        self.runner = runner
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.max_backlog = max(0, int(max_backlog))
+        self.history = max(1, int(history))
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=self.max_queue)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._batches: "OrderedDict[str, Batch]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._backlog: "deque[Job]" = deque()
+        self._backlog_ready = threading.Condition(self._lock)
+        self._feeder: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            # drop wake-up sentinels a previous shutdown left behind
+            pending = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    pending.append(item)
+            for item in pending:
+                self._queue.put_nowait(item)
+            for n in range(self.workers):
+                t = threading.Thread(target=self._worker_loop, name=f"crew-worker-{n}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def shutdown(self, wait: bool = False) -> None:
+        """
+        Stop the workers without blocking on the queue.
+
+        Running jobs finish; jobs still queued or in the batch backlog are failed
+        (their on_finish callbacks run, so uploads are removed) instead of being
+        waited for. With `wait` the call returns once every worker has exited.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._stopping = True
+            abandoned = list(self._backlog)
+            self._backlog.clear()
+            self._backlog_ready.notify_all()
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                abandoned.append(job)
+        for job in abandoned:
+            self._abandon(job)
+        # wake idle workers at once; busy ones see the stop flag after their job
+        for _ in threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        if wait:
+            for t in threads:
+                t.join()
+
+    def submit(self, on_finish: Optional[Callable[[Job], None]] = None, **params: Any) -> Job:
+        """
+        Queue a job that will call `runner(**params)`.
+
+        Args:
+            on_finish: optional callback run on the worker after the job finishes
+                       (success or failure), e.g. to delete the uploaded file.
+
+        Raises:
+            JobQueueFull: if `max_queue` jobs are already waiting.
+        """
+        job = Job(params, on_finish=on_finish)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise JobQueueFull(f"Job queue is full ({self.max_queue} pending).")
+        return job
+
+    def submit_batch(self, entries: List[Dict[str, Any]],
+                     on_finish: Optional[Callable[[Job], None]] = None) -> Batch:
+        """
+        Queue one job per entry that has a "params" dict; the batch is accepted whole or not at all.
+
+        Entries carrying a "result" become already finished jobs (replayed analyses).
+
+        Jobs that do not fit in the queue right away wait in the backlog and are fed
+        to the queue as workers free up, so a large batch drains through the same
+        worker pool as single requests.
+
+        Raises:
+            JobQueueFull: if the queue and backlog together lack room for the batch's jobs.
+        """
+        jobs: List[Optional[Job]] = []
+        public: List[Dict[str, Any]] = []
+        for entry in entries:
+            params = entry.get("params")
+            if "result" in entry:
+                jobs.append(Job.completed(params or {}, entry["result"]))
+            else:
+                jobs.append(Job(params, on_finish=on_finish) if params is not None else None)
+            public.append({k: v for k, v in entry.items() if k not in ("params", "result")})
+        batch = Batch(public, jobs)
+
+        pending = [job for job in jobs if job is not None and not job.finished]
+        with self._lock:
+            free = (self.max_queue - self._queue.qsize()) + (self.max_backlog - len(self._backlog))
+            if len(pending) > free:
+                raise JobQueueFull(f"Job queue is full: the batch needs {len(pending)} slots, "
+                                   f"{max(0, free)} are free.")
+            for job in jobs:
+                if job is not None:
+                    self._jobs[job.id] = job
+            self._batches[batch.id] = batch
+            self._evict_finished()
+
+            # jobs of earlier batches still in the backlog go first
+            while pending and not self._backlog:
+                try:
+                    self._queue.put_nowait(pending[0])
+                except queue.Full:
+                    break
+                pending.pop(0)
+            if pending:
+                self._backlog.extend(pending)
+                self._backlog_ready.notify()
+                if self._feeder is None or not self._feeder.is_alive():
+                    self._feeder = threading.Thread(target=self._feed, name="batch-feeder", daemon=True)
+                    self._feeder.start()
+        return batch
+
+    def add_completed(self, result: Any, **params: Any) -> Job:
+        """Register a job that is already finished with `result` so it can be polled and streamed."""
+        job = Job.completed(params, result)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+        return job
+
+    def get_batch(self, batch_id: str) -> Optional[Batch]:
+        with self._lock:
+            return self._batches.get(batch_id)
+
+    def _feed(self) -> None:
+        while True:
+            with self._backlog_ready:
+                while not self._backlog and not self._stopping:
+                    self._backlog_ready.wait()
+                if self._stopping:
+                    return
+                job = self._backlog[0]
+            # waits while the queue is full; the job keeps its backlog slot until then
+            while True:
+                try:
+                    self._queue.put(job, timeout=_POLL_SECONDS)
+                    break
+                except queue.Full:
+                    if self._stopping:
+                        return
+            with self._lock:
+                if self._backlog and self._backlog[0] is job:
+                    self._backlog.popleft()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            running = sum(1 for j in self._jobs.values() if j.status == Job.RUNNING)
+            backlog = len(self._backlog)
+        return {"workers": self.workers, "queued": self._queue.qsize(), "backlog": backlog,
+                "running": running, "max_queue": self.max_queue, "max_backlog": self.max_backlog}
+
+    def _evict_finished(self) -> None:
+        # caller holds the lock; drop the oldest finished jobs and batches beyond the history limit
+        if len(self._jobs) > self.history:
+            for job_id in [j.id for j in self._jobs.values() if j.finished]:
+                if len(self._jobs) <= self.history:
+                    break
+                del self._jobs[job_id]
+        if len(self._batches) > self.history:
+            for batch_id in [b.id for b in self._batches.values() if b.finished]:
+                if len(self._batches) <= self.history:
+                    break
+                del self._batches[batch_id]
+
+    def _abandon(self, job: Job) -> None:
+        """Fail a job that never started because the manager is shutting down."""
+        job.error = "The server shut down before the job started."
+        job.status = Job.FAILED
+        self._finish(job)
+
+    def _finish(self, job: Job) -> None:
+        job.finished_at = time.time()
+        if job.on_finish is not None:
+            try:
+                job.on_finish(job)
+            except Exception:
+                logger.exception("on_finish callback for job %s failed", job.id)
+        job.emit("done", job.to_dict())
+        job.done.set()
+
+    def _worker_loop(self) -> None:
+        while not self._stopping:
+            try:
+                job = self._queue.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if job is None:
+                return
+            if self._stopping:
+                # fed after shutdown drained the queue
+                self._abandon(job)
+                return
+            job.status = Job.RUNNING
+            job.started_at = time.time()
+            _current.job = job
+            job.emit("status", {"status": job.status})
+            try:
+                job.result = self.runner(**job.params)
+                job.status = Job.SUCCEEDED
+            except Exception as e:
+                logger.exception("Job %s failed", job.id)
+                job.error = str(e)
+                job.status = Job.FAILED
+            finally:
+                _current.job = None
+                self._finish(job)
+
+
+def current_job() -> Optional[Job]:
+    """Return the Job being run by the calling worker thread (None outside a worker)."""
+    return getattr(_current, "job", None)
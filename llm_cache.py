@@ -0,0 +1,156 @@
+## Importing libraries and files
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+##-------------------------- LLM Response Cache --------------------------##
+
+class LLMResponseCache:
+    """
+    SQLite-backed cache of deterministic (temperature=0) LLM completions.
+
+    Entries are keyed by (model, max_tokens, SHA-256 of the prompt). Each entry
+    expires after `ttl_seconds`, and once the table holds more than `max_entries`
+    rows the least recently used ones are evicted. The database file is shared by
+    every worker process on the host, so a filing analyzed once is served from
+    disk for later requests too.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 5000):
+        self.path = path
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_accessed ON llm_responses(accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, max_tokens: int, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{model}:{max_tokens}:{digest}"
+
+    def get(self, model: str, max_tokens: int, prompt: str) -> Optional[str]:
+        """Return the cached response, or None if missing, expired or the database fails."""
+        key = self.make_key(model, max_tokens, prompt)
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or now - row[1] > self.ttl_seconds:
+                    if row is not None:
+                        self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                        self._conn.commit()
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                # e.g. locked or corrupt database: answer from the API instead
+                logger.warning("LLM cache lookup failed, treating as a miss: %s", e)
+                self._rollback()
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, model: str, max_tokens: int, prompt: str, response: str) -> None:
+        """Store a response and evict expired / least recently used entries (skipped if the database fails)."""
+        key = self.make_key(model, max_tokens, prompt)
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, model, response, now, now),
+                )
+                self._evict(now)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning("LLM cache write skipped: %s", e)
+                self._rollback()
+
+    def _rollback(self) -> None:
+        # caller holds the lock
+        try:
+            self._conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, now: float) -> None:
+        # caller holds the lock
+        self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM llm_responses WHERE key IN ("
+                " SELECT key FROM llm_responses ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+            return {"entries": count, "hits": self.hits, "misses": self.misses}
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """
+    Return the process-wide LLM response cache, or None if disabled.
+
+    Configured through the environment:
+        LLM_CACHE_PATH (str): SQLite file (default '.cache/llm_responses.sqlite3').
+                              Set to an empty string to disable caching.
+        LLM_CACHE_TTL (float): seconds an entry stays valid (default 7 days).
+        LLM_CACHE_MAX_ENTRIES (int): rows kept before LRU eviction (default 5000).
+    """
+    global _default_cache
+    path = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_responses.sqlite3"))
+    if not path:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = LLMResponseCache(
+                    path,
+                    ttl_seconds=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+                    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000")),
+                )
+            except sqlite3.Error as e:
+                logger.warning("LLM response cache disabled, could not open %s: %s", path, e)
+                return None
+        return _default_cache
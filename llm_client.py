@@ -0,0 +1,146 @@
+## Importing libraries and files
+import os
+import asyncio
+import weakref
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+
+def _sdk() -> Tuple[Any, Any]:
+    """
+    (OpenAI, AsyncOpenAI) classes, or (None, None) if the package is missing.
+
+    Imported on first client creation rather than at module import: the SDK takes
+    around half a second to import and the API process should start without it.
+    """
+    try:
+        from openai import OpenAI, AsyncOpenAI
+    except Exception:
+        return None, None
+    return OpenAI, AsyncOpenAI
+
+
+##-------------------------- Shared OpenAI client registry --------------------------##
+
+# One client per configuration for the whole process. Each client owns an httpx
+# connection pool, so consecutive tool calls reuse warm keep-alive TLS connections
+# instead of building a new client (and handshake) per call.
+_sync_clients: Dict[Tuple[Any, ...], Any] = {}
+# async clients per event loop; entries go with their loop (weak keys) or once it is closed
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[Any, ...], Any]]" = \
+    weakref.WeakKeyDictionary()
+_registry_lock = threading.Lock()
+
+
+def _client_settings() -> Dict[str, Any]:
+    """
+    Connection settings read from the environment:
+        OPENAI_BASE_URL (str): alternative API endpoint (default: SDK default).
+        OPENAI_TIMEOUT (float): overall request timeout in seconds (default 60).
+        OPENAI_CONNECT_TIMEOUT (float): connect timeout in seconds (default 10).
+        OPENAI_MAX_CONNECTIONS (int): connection pool size (default 20).
+        OPENAI_MAX_RETRIES (int): SDK-level retries (default 2).
+    """
+    return {
+        "base_url": os.getenv("OPENAI_BASE_URL") or None,
+        "timeout": float(os.getenv("OPENAI_TIMEOUT", "60")),
+        "connect_timeout": float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10")),
+        "max_connections": int(os.getenv("OPENAI_MAX_CONNECTIONS", "20")),
+        "max_retries": int(os.getenv("OPENAI_MAX_RETRIES", "2")),
+    }
+
+
+def _http_options(settings: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "timeout": httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"]),
+        "limits": httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_connections"],
+            keepalive_expiry=60.0,
+        ),
+    }
+
+
+def _registry_key(api_key: str, settings: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (api_key, settings["base_url"], settings["timeout"], settings["connect_timeout"],
+            settings["max_connections"], settings["max_retries"])
+
+
+def get_openai_client(api_key: Optional[str] = None):
+    """
+    Return the shared synchronous OpenAI client for `api_key` (default: OPENAI_API_KEY).
+
+    Raises:
+        RuntimeError: if the openai package is missing or no API key is configured.
+    """
+    OpenAI, _ = _sdk()
+    if OpenAI is None:
+        raise RuntimeError("openai package (>=1.0.0) not installed.")
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY not set in environment.")
+
+    settings = _client_settings()
+    key = _registry_key(api_key, settings)
+    with _registry_lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                base_url=settings["base_url"],
+                max_retries=settings["max_retries"],
+                http_client=httpx.Client(**_http_options(settings)),
+            )
+            _sync_clients[key] = client
+        return client
+
+
+def get_async_openai_client(api_key: Optional[str] = None):
+    """
+    Return the shared AsyncOpenAI client for `api_key` and the running event loop.
+
+    httpx async connections are bound to the loop that opened them, so clients
+    are registered per loop object; clients of closed loops are dropped.
+
+    Raises:
+        RuntimeError: if the openai package is missing or no API key is configured.
+    """
+    _, AsyncOpenAI = _sdk()
+    if AsyncOpenAI is None:
+        raise RuntimeError("openai package (>=1.0.0) not installed.")
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY not set in environment.")
+
+    settings = _client_settings()
+    loop = asyncio.get_running_loop()
+    key = _registry_key(api_key, settings)
+    with _registry_lock:
+        for stale in [l for l in _async_clients.keys() if l.is_closed()]:
+            del _async_clients[stale]
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=settings["base_url"],
+                max_retries=settings["max_retries"],
+                http_client=httpx.AsyncClient(**_http_options(settings)),
+            )
+            clients[key] = client
+        return client
+
+
+def close_clients() -> None:
+    """Close every pooled synchronous client and forget the async ones (they belong to their loops)."""
+    with _registry_lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+        _async_clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
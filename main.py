@@ -1,90 +1,674 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import os
-import uuid
+import json
+import time
 import asyncio
-from datetime import datetime
+import logging
+import zipfile
+import threading
+from collections import OrderedDict
+from typing import List, Optional
 
-from crewai import Crew, Process
+# Import agents and tasks (declared as specs; the crewai objects are built on first use)
+from agents import AGENT_MODEL, AGENT_SPECS, get_agents
+from task import TASK_SPECS, get_tasks
 
-# Import agents
-from agents import verifier, financial_analyst, investment_advisor, risk_assessor
+from doc_cache import file_digest, get_document_cache
+from jobs import JobManager, JobQueueFull, current_job
+import llm_client
+from llm_cache import get_llm_cache
+from metrics import register_gauges, render_metrics, span, trace
+from doc_context import get_context_store
+from pipeline import attach_task_callbacks, run_parallel, template_crew
+from prefilter import FINANCIAL, NOT_FINANCIAL, classify_document
+from prompt_budget import get_token_cache
+from rate_limiter import get_rate_limiter
+from result_store import fingerprint, get_result_store
+from search_cache import get_search_cache
+from storage import (BATCH_MAX_DOCUMENTS, UploadTooLarge, extract_zip_pdfs, remove_upload, save_upload,
+                     sweep_stale_uploads)
 
-# Import tasks
-from task import verification, analyze_financial_document, investment_analysis, risk_assessment
 
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Financial Document Analyzer")
 
 
-def run_crew(query: str, file_path: str = "data\TSLA-Q2-2025-Update.pdf"):
-    """Run the full Crew pipeline with all agents and tasks."""
-    financial_crew = Crew(
-        agents=[verifier, financial_analyst, investment_advisor, risk_assessor],
-        tasks=[verification, analyze_financial_document, investment_analysis, risk_assessment],
-        process=Process.sequential,  # tasks run in order
+# "sequential": one task after another; "parallel": verification, then the three
+# analysis branches concurrently, then (if CREW_SYNTHESIS is on) a merged report
+CREW_EXECUTION_MODE = os.getenv("CREW_EXECUTION_MODE", "sequential").strip().lower()
+CREW_SYNTHESIS = os.getenv("CREW_SYNTHESIS", "1").strip().lower() not in ("0", "false", "no")
+
+# "on": classify uploads locally first; clear non-financial documents are rejected and
+# clear financial ones skip the verifier agent. "off": every document goes to the verifier.
+PREFILTER_MODE = os.getenv("PREFILTER_MODE", "on").strip().lower()
+
+# Seconds between SSE heartbeat events while a streamed job has nothing new to report
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+# "background": build agents, tasks, crews and clients in a thread right after startup;
+# "blocking": finish that before the server accepts requests; "off": build on first request
+PREWARM_MODE = os.getenv("PREWARM_MODE", "background").strip().lower()
+
+ANALYSIS_AGENTS = ["financial_analyst", "investment_advisor", "risk_assessor"]
+ANALYSIS_TASKS = ["analyze_financial_document", "investment_analysis", "risk_assessment"]
+PARALLEL_AGENTS = ["verifier", *ANALYSIS_AGENTS, "report_writer"]
+
+
+def _pipeline_identity():
+    """
+    (model, version) under which finished analyses are stored and replayed.
+
+    The version fingerprints every prompt and setting that shapes an answer (agent
+    roles/goals/backstories, task descriptions, crew layout, tool model and modes),
+    so editing any of them stops old results from being replayed. RESULT_STORE_VERSION
+    can be bumped to invalidate stored results by hand.
+    """
+    tool_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    version = fingerprint(
+        [(a["role"], a["goal"], a["backstory"]) for a in AGENT_SPECS.values()],
+        [(t["description"], t["expected_output"]) for t in TASK_SPECS.values()],
+        CREW_EXECUTION_MODE, CREW_SYNTHESIS, tool_model,
+        {k: os.getenv(k) for k in ("ANALYSIS_MODE", "EXCERPT_SELECTION", "KEY_FIGURES_MODE")},
+        os.getenv("RESULT_STORE_VERSION", ""),
     )
+    return f"{AGENT_MODEL}+{tool_model}", version
+
+
+RESULT_MODEL, RESULT_VERSION = _pipeline_identity()
+
+
+def planned_stages(skip_verification: bool = False):
+    """Names of the tasks run_crew will run, in completion order for sequential mode."""
+    names = ([] if skip_verification else ["verification"]) + ANALYSIS_TASKS
+    if CREW_EXECUTION_MODE == "parallel" and CREW_SYNTHESIS:
+        names.append("synthesis")
+    return [TASK_SPECS[n]["name"] for n in names]
+
+
+def run_crew(query: str, file_path: str = "data\TSLA-Q2-2025-Update.pdf", skip_verification: bool = False,
+             on_task_done=None):
+    """
+    Run the full Crew pipeline with all agents and tasks (minus the verifier when `skip_verification`).
+
+    The document is extracted once for the whole run; tasks receive its handle as
+    `{document_handle}` and the tools resolve it, so no agent re-reads the PDF or
+    copies its text through tool-call arguments.
+
+    `on_task_done(task name, TaskOutput)` is called as soon as each task finishes.
+    """
+    with span("run_crew", kind="crew"), get_context_store().scope(file_path) as document_handle:
+        inputs = {"query": query, "file_path": file_path, "document_handle": document_handle}
+        return _kickoff(inputs, skip_verification, on_task_done)
+
+
+def _sequential_crew(skip_verification: bool):
+    """Template crew for sequential mode (tasks run in order), built once per verification setting."""
+    agents = get_agents(ANALYSIS_AGENTS if skip_verification else ["verifier", *ANALYSIS_AGENTS])
+    tasks = get_tasks(ANALYSIS_TASKS if skip_verification else ["verification", *ANALYSIS_TASKS])
+    return template_crew(agents, tasks)
+
+
+def _kickoff(inputs, skip_verification: bool, on_task_done=None):
+    """Run the configured crew (sequential or parallel) with the given kickoff inputs."""
+    if CREW_EXECUTION_MODE == "parallel":
+        return run_parallel(
+            agents=get_agents(PARALLEL_AGENTS),
+            verification=None if skip_verification else get_tasks(["verification"])[0],
+            branches=get_tasks(ANALYSIS_TASKS),
+            synthesis=get_tasks(["synthesis"])[0] if CREW_SYNTHESIS else None,
+            inputs=inputs,
+            on_task_done=on_task_done,
+        )
+
+    # Private copy of agents/tasks: workers run crews concurrently and kickoff mutates tasks
+    financial_crew = _sequential_crew(skip_verification).copy()
+    attach_task_callbacks(financial_crew.tasks, on_task_done)
 
     # Run Crew with input variables
-    result = financial_crew.kickoff(inputs={"query": query, "file_path": file_path})
+    result = financial_crew.kickoff(inputs=inputs)
+    return result
+
+
+def _run_analysis_job(query: str, file_path: str, filename: str, prefilter=None, digest: Optional[str] = None):
+    """Worker-side body of an /analyze job: run the crew and persist the result."""
+    verified = prefilter is not None and prefilter["verdict"] == FINANCIAL
+    with trace() as timing:
+        response = run_crew(query=query, file_path=file_path, skip_verification=verified,
+                            on_task_done=_task_events(current_job(), planned_stages(verified)))
+
+    result = {
+        "status": "success",
+        "query": query,
+        "analysis": str(response),
+        "file_processed": filename,
+        "prefilter": prefilter,
+        "timing": timing.summary(),
+        "replayed": False,
+        "result_id": None,
+    }
+
+    # Index the result so the same document + question is answered from the store next time
+    store = get_result_store()
+    if store is not None and digest:
+        try:
+            result["result_id"] = store.put(digest, query, RESULT_MODEL, RESULT_VERSION, result, filename=filename)
+        except Exception as e:
+            logger.warning("Could not store result of %s: %s", filename, e)
+    return result
+
+
+def _replayed(entry, query: str, filename: str):
+    """Job result for an analysis served from the result store."""
+    result = dict(entry["result"])
+    result.update(query=query, file_processed=filename, replayed=True, result_id=entry["result_id"],
+                  stored_at=entry["created_at"])
     return result
 
 
+async def _lookup_result(digest: str, query: str):
+    """Stored analysis of this document + question under the current pipeline, or None."""
+    store = get_result_store()
+    if store is None:
+        return None
+    try:
+        return await asyncio.to_thread(store.lookup, digest, query, RESULT_MODEL, RESULT_VERSION)
+    except Exception as e:
+        logger.warning("Result store lookup failed: %s", e)
+        return None
+
+
+def _task_events(job, stages):
+    """Build the on_task_done callback that publishes each finished task as job events."""
+    if job is None:
+        return None
+    completed = []
+
+    def on_task_done(name, output):
+        completed.append(name)
+        job.emit("task", {
+            "task": name,
+            "agent": getattr(output, "agent", None),
+            "output": getattr(output, "raw", str(output)),
+        })
+        job.emit("progress", {"completed": len(completed), "total": len(stages), "task": name})
+
+    job.emit("progress", {"completed": 0, "total": len(stages), "stages": stages})
+    return on_task_done
+
+
+def _remove_upload(job) -> None:
+    """Cleanup uploaded file once its job has finished."""
+    remove_upload(job.params.get("file_path"))
+
+
+def _timed_prefilter(file_path: str):
+    with span("prefilter", kind="stage"):
+        return classify_document(file_path)
+
+
+jobs = JobManager(
+    runner=_run_analysis_job,
+    workers=int(os.getenv("CREW_WORKERS", "2")),
+    max_queue=int(os.getenv("JOB_QUEUE_MAX", "16")),
+    max_backlog=int(os.getenv("JOB_BACKLOG_MAX", "64")),
+)
+
+
+def _runtime_gauges():
+    """Queue, limiter and cache state sampled at scrape time."""
+    gauges = {f"fda_jobs_{k}": (f"Job manager {k.replace('_', ' ')}.", v) for k, v in jobs.stats().items()}
+    limiter = get_rate_limiter().saturation()
+    for key in ("request_saturation", "token_saturation", "rate_scale", "paused_for_seconds", "waiting"):
+        gauges[f"fda_llm_rate_limit_{key}"] = (f"LLM rate limiter {key.replace('_', ' ')}.", limiter[key])
+    for prefix, stats in (("fda_search_cache", get_search_cache().stats()),
+                          ("fda_llm_cache", get_llm_cache().stats() if get_llm_cache() is not None else {}),
+                          ("fda_result_store", get_result_store().stats() if get_result_store() is not None else {}),
+                          ("fda_token_count_cache", get_token_cache().stats())):
+        for key, value in stats.items():
+            gauges[f"{prefix}_{key}"] = (f"{prefix.replace('fda_', '').replace('_', ' ')} {key}.", value)
+    return gauges
+
+
+register_gauges(_runtime_gauges)
+
+
+_warm_state = {"state": "cold", "seconds": {}}
+
+
+def _warm_crews():
+    """Validate the template crews `_kickoff` copies, with and without the verification task."""
+    for skip_verification in (False, True):
+        if CREW_EXECUTION_MODE != "parallel":
+            _sequential_crew(skip_verification)
+            continue
+        names = ([] if skip_verification else ["verification"]) + ANALYSIS_TASKS
+        names += ["synthesis"] if CREW_SYNTHESIS else []
+        template_crew(get_agents(PARALLEL_AGENTS), get_tasks(names))
+
+
+def prewarm():
+    """
+    Build everything the first analysis would otherwise construct on demand.
+
+    Agents, tasks, template crews, the OpenAI SDK and the caches are all created
+    lazily so importing the app stays cheap; this pays that cost once, off the
+    request path. A failing step is logged and skipped: the same object is simply
+    built again on first use. Returns seconds spent per step.
+    """
+    steps = [
+        ("agents", lambda: get_agents(PARALLEL_AGENTS)),
+        ("tasks", lambda: get_tasks([*TASK_SPECS])),
+        ("crews", _warm_crews),
+        ("openai_sdk", llm_client._sdk),
+        ("caches", lambda: (get_document_cache(), get_llm_cache(), get_search_cache(), get_context_store())),
+    ]
+    seconds = {}
+    for name, build in steps:
+        start = time.perf_counter()
+        try:
+            build()
+        except Exception as e:
+            logger.warning("Prewarm step %s failed, it will be built on first use: %s", name, e)
+        seconds[name] = round(time.perf_counter() - start, 4)
+    return seconds
+
+
+def _prewarm_in_background():
+    _warm_state["state"] = "warming"
+    _warm_state["seconds"] = prewarm()
+    _warm_state["state"] = "warm"
+    logger.info("Prewarm finished: %s", _warm_state["seconds"])
+
+
+@app.on_event("startup")
+async def start_workers():
+    sweep_stale_uploads()
+    store = get_result_store()
+    if store is not None:
+        store.evict()
+    if PREWARM_MODE == "blocking":
+        await asyncio.to_thread(_prewarm_in_background)
+    elif PREWARM_MODE == "background":
+        threading.Thread(target=_prewarm_in_background, name="prewarm", daemon=True).start()
+    else:
+        _warm_state["state"] = "off"
+    jobs.start()
+
+
+@app.on_event("shutdown")
+async def stop_workers():
+    # fails queued jobs and removes their uploads; kept off the event loop all the same
+    await asyncio.to_thread(jobs.shutdown)
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
     return {"message": "Financial Document Analyzer API is running"}
 
 
-@app.post("/analyze")
-async def analyze_document(
-    file: UploadFile = File(...),
-    query: str = Form(default="Analyze this financial document for investment insights")
-):
-    """Analyze an uploaded financial document and return structured results."""
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the prewarm step has built agents, crews and clients."""
+    if _warm_state["state"] in ("cold", "warming"):
+        raise HTTPException(status_code=503, detail=dict(_warm_state))
+    return dict(_warm_state)
+
+
+async def _enqueue_analysis(file: UploadFile, query: str, refresh: bool = False):
+    """
+    Save the upload, run the local prefilter and queue the analysis job.
 
-    # Generate unique file path
-    # file_id = str(uuid.uuid4())
-    os.makedirs("data", exist_ok=True)
-    file_path = f"data\TSLA-Q2-2025-Update.pdf"
+    When the result store already holds an analysis of the same document (by content
+    hash) and question under the current pipeline version, that result is returned as
+    an already finished job instead, unless `refresh` is set.
+
+    Returns:
+        (job, query, prefilter verdict or None)
+
+    Raises:
+        HTTPException: 413 (too large), 422 (not a readable PDF or not financial), 429 (queue full) or 500.
+    """
+    file_path = None
 
     try:
-        # Save uploaded file
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
+        # Stream the upload to its own uniquely named file (bounded memory, size-capped)
+        file_path = await save_upload(file)
 
         # Default query if empty
         if not query or query.strip() == "":
             query = "Analyze this financial document for investment insights"
+        query = query.strip()
+
+        # Instant replay of an identical earlier analysis
+        digest = await asyncio.to_thread(file_digest, file_path)
+        stored = None if refresh else await _lookup_result(digest, query)
+        if stored is not None:
+            remove_upload(file_path)
+            job = jobs.add_completed(_replayed(stored, query, file.filename), query=query, filename=file.filename)
+            return job, query, stored["result"].get("prefilter")
+
+        # Local classification: decide the clear cases without an LLM round-trip
+        prefilter = None
+        if PREFILTER_MODE != "off":
+            try:
+                prefilter = await asyncio.to_thread(_timed_prefilter, file_path)
+            except Exception as e:
+                remove_upload(file_path)
+                raise HTTPException(status_code=422, detail=f"Uploaded file is not a readable PDF: {e}")
+            if prefilter["verdict"] == NOT_FINANCIAL:
+                remove_upload(file_path)
+                raise HTTPException(
+                    status_code=422,
+                    detail={"message": "Uploaded file does not look like a financial document.",
+                            "prefilter": prefilter},
+                )
 
-        # Run full Crew pipeline
-        response = run_crew(query=query.strip(), file_path=file_path)
+        # Queue the Crew pipeline; the worker removes the file when the job finishes
+        job = jobs.submit(
+            on_finish=_remove_upload,
+            query=query,
+            file_path=file_path,
+            filename=file.filename,
+            prefilter=prefilter,
+            digest=digest,
+        )
 
-        # Save result to output directory
-        os.makedirs("outputs", exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = f"outputs/analysis_{timestamp}.txt"
+    except HTTPException:
+        raise
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(str(response))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-        return {
-            "status": "success",
-            "query": query,
-            "analysis": str(response),
-            "file_processed": file.filename,
-            "output_file": output_path,
-        }
+    except JobQueueFull as e:
+        remove_upload(file_path)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
 
     except Exception as e:
+        remove_upload(file_path)
         raise HTTPException(status_code=500, detail=f"Error processing financial document: {str(e)}")
 
-    finally:
-        # Cleanup uploaded file
-        if os.path.exists(file_path):
+    return job, query, prefilter
+
+
+@app.post("/analyze", status_code=202)
+async def analyze_document(
+    response: Response,
+    file: UploadFile = File(...),
+    query: str = Form(default="Analyze this financial document for investment insights"),
+    refresh: bool = Form(default=False),
+):
+    """
+    Queue an uploaded financial document for analysis and return its job id.
+
+    A document + question analyzed before is answered at once (200, `replayed: true`,
+    result included); `refresh=true` forces a new run.
+    """
+    job, query, prefilter = await _enqueue_analysis(file, query, refresh)
+    replayed = job.finished
+    if replayed:
+        response.status_code = 200
+
+    body = {
+        "status": job.status,
+        "job_id": job.id,
+        "query": query,
+        "file_processed": file.filename,
+        "prefilter": prefilter,
+        "replayed": replayed,
+        "status_url": f"/jobs/{job.id}",
+        "stream_url": f"/jobs/{job.id}/stream",
+    }
+    if replayed:
+        body["result"] = job.result
+    return body
+
+
+@app.post("/analyze/batch", status_code=202)
+async def analyze_batch(
+    files: List[UploadFile] = File(...),
+    query: str = Form(default="Analyze this financial document for investment insights"),
+    refresh: bool = Form(default=False),
+):
+    """
+    Queue many documents (PDFs and/or zip archives of PDFs) in one request.
+
+    Identical files are de-duplicated by SHA-256 of their bytes and analyzed once;
+    every unique document becomes one job on the shared worker pool. Documents whose
+    analysis for this question is already stored are replayed instead (unless
+    `refresh`). Follow the batch at `status_url` for per-document results and
+    aggregate timing.
+    """
+    if not query or query.strip() == "":
+        query = "Analyze this financial document for investment insights"
+    query = query.strip()
+
+    stored = []  # (original name, stored path)
+    try:
+        for upload in files:
+            path = await save_upload(upload)
+            if await asyncio.to_thread(zipfile.is_zipfile, path):
+                try:
+                    stored.extend(await asyncio.to_thread(extract_zip_pdfs, path))
+                finally:
+                    remove_upload(path)
+            else:
+                stored.append((upload.filename, path))
+            if len(stored) > BATCH_MAX_DOCUMENTS:
+                raise ValueError(f"A batch may hold at most {BATCH_MAX_DOCUMENTS} documents.")
+        if not stored:
+            raise ValueError("No PDF documents in the batch.")
+
+        # Content-hash de-duplication: each unique document is analyzed once
+        digests = await asyncio.gather(*(asyncio.to_thread(file_digest, path) for _, path in stored))
+        groups = OrderedDict()
+        for (name, path), digest in zip(stored, digests):
+            group = groups.setdefault(digest, {"digest": digest, "documents": [], "path": path})
+            group["documents"].append(name)
+            if group["path"] != path:
+                remove_upload(path)
+
+        entries = []
+        for group in groups.values():
+            entry = {"digest": group["digest"], "documents": group["documents"], "prefilter": None}
+            stored_result = None if refresh else await _lookup_result(group["digest"], query)
+            if stored_result is not None:
+                remove_upload(group["path"])
+                entry["prefilter"] = stored_result["result"].get("prefilter")
+                entry["result"] = _replayed(stored_result, query, group["documents"][0])
+                entries.append(entry)
+                continue
+            if PREFILTER_MODE != "off":
+                try:
+                    entry["prefilter"] = await asyncio.to_thread(_timed_prefilter, group["path"])
+                except Exception as e:
+                    # one unreadable file fails its own entry, not the whole batch
+                    logger.warning("prefilter failed for %s: %s", group["documents"][0], e)
+                    remove_upload(group["path"])
+                    entry["status"] = "failed"
+                    entry["error"] = f"Not a readable PDF: {e}"
+                    entries.append(entry)
+                    continue
+            if entry["prefilter"] is not None and entry["prefilter"]["verdict"] == NOT_FINANCIAL:
+                remove_upload(group["path"])
+                entry["status"] = "rejected"
+                entry["error"] = "Uploaded file does not look like a financial document."
+            else:
+                entry["params"] = {"query": query, "file_path": group["path"], "filename": group["documents"][0],
+                                   "prefilter": entry["prefilter"], "digest": group["digest"]}
+            entries.append(entry)
+
+        batch = jobs.submit_batch(entries, on_finish=_remove_upload)
+
+    except UploadTooLarge as e:
+        _discard(stored)
+        raise HTTPException(status_code=413, detail=str(e))
+
+    except ValueError as e:
+        _discard(stored)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except JobQueueFull as e:
+        _discard(stored)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+    except Exception as e:
+        _discard(stored)
+        raise HTTPException(status_code=500, detail=f"Error processing batch: {str(e)}")
+
+    return {
+        "batch_id": batch.id,
+        "query": query,
+        "documents": len(stored),
+        "unique_documents": len(entries),
+        "jobs": [{"documents": e["documents"], "job_id": j.id if j else None, "status": j.status if j else e["status"]}
+                 for e, j in zip(batch.entries, batch.jobs)],
+        "status_url": f"/batches/{batch.id}",
+    }
+
+
+def _discard(stored) -> None:
+    """Remove the stored files of a batch that failed before its jobs were queued."""
+    for _, path in stored:
+        remove_upload(path)
+
+
+def _sse(event: str, data) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _job_event_stream(job, first=None):
+    """
+    Yield a job's events as SSE frames until it finishes.
+
+    Events already emitted are replayed first, so a client that connects late still
+    receives every task output. A heartbeat event is sent whenever nothing has
+    happened for SSE_HEARTBEAT_SECONDS, which keeps proxies from closing the stream.
+    """
+    loop = asyncio.get_running_loop()
+    pending: asyncio.Queue = asyncio.Queue()
+
+    def push(event, data):
+        # called from worker / branch threads
+        loop.call_soon_threadsafe(pending.put_nowait, (event, data))
+
+    backlog = job.subscribe(push)
+    try:
+        if first is not None:
+            yield _sse(*first)
+        for event, data in backlog:
+            yield _sse(event, data)
+            if event == "done":
+                return
+        while True:
             try:
-                os.remove(file_path)
-            except:
-                pass  # ignore cleanup errors
+                event, data = await asyncio.wait_for(pending.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield _sse("heartbeat", {"ts": time.time(), "status": job.status})
+                continue
+            yield _sse(event, data)
+            if event == "done":
+                return
+    finally:
+        job.unsubscribe(push)
+
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@app.post("/analyze/stream")
+async def analyze_document_stream(
+    file: UploadFile = File(...),
+    query: str = Form(default="Analyze this financial document for investment insights"),
+    refresh: bool = Form(default=False),
+):
+    """
+    Queue an uploaded document and stream its progress as server-sent events.
+
+    Events: `queued` (job id, prefilter verdict), `status`, `progress` (completed/total
+    tasks), `task` (one per finished task, with its output), `heartbeat` and finally
+    `done` (the same payload as GET /jobs/{job_id}). A replayed analysis sends `queued`
+    and `done` right away.
+    """
+    job, query, prefilter = await _enqueue_analysis(file, query, refresh)
+    first = ("queued", {"job_id": job.id, "query": query, "file_processed": file.filename,
+                        "prefilter": prefilter, "replayed": job.finished})
+    return StreamingResponse(_job_event_stream(job, first), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus metrics: stage/tool/task/LLM latency histograms, token and cost counters, runtime gauges."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/rate-limit")
+async def rate_limit_status():
+    """Saturation of the process-wide LLM rate limiter shared by agents and tools."""
+    return get_rate_limiter().saturation()
+
+
+def _require_result_store():
+    store = get_result_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="The result store is disabled (RESULT_STORE_PATH is empty).")
+    return store
+
+
+@app.get("/results")
+async def list_results(limit: int = 50, offset: int = 0, doc_digest: Optional[str] = None):
+    """Stored analyses, most recent first (metadata only); filter by document SHA-256 with `doc_digest`."""
+    store = _require_result_store()
+    results = await asyncio.to_thread(store.list, min(max(limit, 1), 500), offset, doc_digest)
+    return {"results": results, "limit": limit, "offset": offset, "stats": store.stats(),
+            "model": RESULT_MODEL, "version": RESULT_VERSION}
+
+
+@app.get("/results/{result_id}")
+async def get_result(result_id: str):
+    """One stored analysis with its full result."""
+    entry = await asyncio.to_thread(_require_result_store().get, result_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown result id: {result_id}")
+    return entry
+
+
+@app.delete("/results/{result_id}")
+async def delete_result(result_id: str):
+    """Remove a stored analysis so the next identical request runs the crew again."""
+    if not await asyncio.to_thread(_require_result_store().delete, result_id):
+        raise HTTPException(status_code=404, detail=f"Unknown result id: {result_id}")
+    return {"deleted": result_id}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Return the status (and, once finished, the result or error) of an analysis job."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job id: {job_id}")
+    return job.to_dict()
+
+
+@app.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    """Return per-document status/results and aggregate timing of a batch."""
+    batch = jobs.get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Unknown batch id: {batch_id}")
+    return batch.to_dict()
+
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str):
+    """Stream the events of an already queued job (replaying those emitted so far)."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job id: {job_id}")
+    return StreamingResponse(_job_event_stream(job), media_type="text/event-stream", headers=_SSE_HEADERS)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+## Importing libraries and files
+import re
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# read_data_tool joins pages as "--- PAGE n ---\n<text>"
+_PAGE_MARKER_RE = re.compile(r"^--- PAGE (\d+) ---$", re.MULTILINE)
+
+
+##-------------------------- Page-aligned chunking --------------------------##
+
+def split_pages(text: str) -> List[Tuple[str, str]]:
+    """
+    Split read_data_tool output back into (page label, page text) pairs.
+
+    Text without page markers is split on blank lines into pseudo-pages so
+    chunking still happens on natural boundaries.
+    """
+    markers = list(_PAGE_MARKER_RE.finditer(text))
+    if not markers:
+        paragraphs = [p for p in re.split(r"\n\s*\n", text) if p.strip()]
+        return [(str(i + 1), p) for i, p in enumerate(paragraphs)]
+
+    pages = []
+    for k, m in enumerate(markers):
+        end = markers[k + 1].start() if k + 1 < len(markers) else len(text)
+        pages.append((m.group(1), text[m.start():end].strip()))
+    return pages
+
+
+def chunk_pages(text: str, chunk_chars: int, overlap_pages: int = 1) -> List[Tuple[str, str]]:
+    """
+    Group pages into chunks of at most `chunk_chars` characters.
+
+    Chunks are page-aligned: a chunk never starts or ends mid-page unless a single
+    page is larger than `chunk_chars` on its own, in which case that page is cut
+    into pieces. Each chunk repeats the last `overlap_pages` pages of the previous
+    chunk, so figures and sentences that straddle a boundary are seen whole.
+
+    Returns:
+        List of (label, chunk text) where label is e.g. "pages 3-7".
+    """
+    chunk_chars = max(1, int(chunk_chars))
+    pieces: List[Tuple[str, str]] = []
+    for label, page in split_pages(text):
+        if len(page) <= chunk_chars:
+            pieces.append((label, page))
+        else:
+            for start in range(0, len(page), chunk_chars):
+                pieces.append((label, page[start:start + chunk_chars]))
+
+    chunks: List[Tuple[str, str]] = []
+    i = 0
+    while i < len(pieces):
+        j = i
+        size = 0
+        while j < len(pieces) and (j == i or size + len(pieces[j][1]) + 2 <= chunk_chars):
+            size += len(pieces[j][1]) + 2
+            j += 1
+        first, last = pieces[i][0], pieces[j - 1][0]
+        label = f"page {first}" if first == last else f"pages {first}-{last}"
+        chunks.append((label, "\n\n".join(p for _, p in pieces[i:j])))
+        if j >= len(pieces):
+            break
+        # step back for the overlap, unless the overlap would leave no room for a new page
+        next_i = max(i + 1, j - overlap_pages)
+        overlap_size = sum(len(p) + 2 for _, p in pieces[next_i:j])
+        i = next_i if overlap_size + len(pieces[j][1]) + 2 <= chunk_chars else j
+    return chunks
+
+
+##-------------------------- Map-reduce analysis --------------------------##
+
+def map_reduce(
+    text: str,
+    map_prompt: Callable[[str, str, int, int], str],
+    reduce_prompt: Callable[[str], str],
+    llm_call: Callable[[str], str],
+    chunk_chars: int,
+    max_concurrency: int = 4,
+    overlap_pages: int = 1,
+) -> str:
+    """
+    Analyze a long document chunk by chunk and merge the partial results.
+
+    Args:
+        text: full document text (read_data_tool output).
+        map_prompt: builds the prompt for one chunk: (chunk_text, label, index, total) -> prompt.
+        reduce_prompt: builds the merge prompt from the concatenated partial analyses.
+        llm_call: prompt -> response (returns "ERROR: ..." on failure).
+        chunk_chars: maximum characters per chunk (and per reduce input).
+        max_concurrency: maximum chunk analyses in flight at once.
+        overlap_pages: pages repeated between consecutive chunks.
+
+    Returns:
+        str: the merged analysis, or an "ERROR: ..." string if every chunk failed.
+    """
+    chunks = chunk_pages(text, chunk_chars, overlap_pages=overlap_pages)
+    total = len(chunks)
+    if total == 1:
+        return llm_call(map_prompt(chunks[0][1], chunks[0][0], 1, 1))
+
+    def _map(item: Tuple[int, Tuple[str, str]]) -> Tuple[str, str]:
+        index, (label, chunk) = item
+        return label, llm_call(map_prompt(chunk, label, index + 1, total))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, total)), thread_name_prefix="map-chunk") as pool:
+        # each chunk runs in a copy of the caller's context so request tracing follows it
+        futures = [pool.submit(contextvars.copy_context().run, _map, item) for item in enumerate(chunks)]
+        results = [f.result() for f in futures]
+
+    partials = [f"### PARTIAL ANALYSIS ({label})\n{out}" for label, out in results
+                if out and not out.startswith("ERROR:")]
+    failed = total - len(partials)
+    if not partials:
+        return results[0][1]
+    if failed:
+        logger.warning("map-reduce: %d of %d chunk analyses failed and were skipped", failed, total)
+
+    return _reduce(partials, reduce_prompt, llm_call, chunk_chars, max_concurrency)
+
+
+def _reduce(partials: List[str], reduce_prompt: Callable[[str], str], llm_call: Callable[[str], str],
+            budget: int, max_concurrency: int) -> str:
+    """Merge partial analyses, in several rounds if they do not fit one prompt."""
+    while True:
+        groups: List[List[str]] = [[]]
+        size = 0
+        for partial in partials:
+            if groups[-1] and size + len(partial) > budget:
+                groups.append([])
+                size = 0
+            groups[-1].append(partial)
+            size += len(partial) + 2
+
+        if len(groups) == 1:
+            return llm_call(reduce_prompt("\n\n".join(groups[0])))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(groups))), thread_name_prefix="reduce") as pool:
+            futures = [pool.submit(contextvars.copy_context().run, llm_call, reduce_prompt("\n\n".join(g)))
+                       for g in groups]
+            merged = [f.result() for f in futures]
+        if all(m.startswith("ERROR:") for m in merged):
+            return merged[0]
+        next_round = [f"### PARTIAL ANALYSIS (merged group {k + 1})\n{m}" for k, m in enumerate(merged)
+                      if not m.startswith("ERROR:")]
+        if len(next_round) >= len(partials):
+            # partials are individually too large to shrink further; merge what fits
+            return llm_call(reduce_prompt("\n\n".join(next_round)[:budget]))
+        partials = next_round
@@ -0,0 +1,265 @@
+## Importing libraries and files
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+# USD per 1M tokens (prompt, completion); LLM_PRICES='{"model": [in, out]}' adds or overrides entries
+_DEFAULT_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+
+##-------------------------- Prometheus primitives --------------------------##
+
+def _label_str(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = ['%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+             for k, v in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text exposition format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # counts per bucket + [+Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(k, "")) for k in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for key, series in sorted(items):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _label_str(self.labelnames, key, 'le="%g"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative:g}")
+            cumulative += series[len(self.buckets)]
+            labels = _label_str(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {series[-1]:.6g}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {cumulative:g}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter rendered in the Prometheus text exposition format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels.get(k, "")) for k in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_label_str(self.labelnames, k)} {v:.6g}" for k, v in items]
+        return lines
+
+
+SPAN_SECONDS = Histogram("fda_span_duration_seconds", "Duration of instrumented pipeline stages.",
+                         ("kind", "name"))
+LLM_TOKENS = Histogram("fda_llm_call_tokens", "Tokens per LLM call.", ("source", "model", "type"),
+                       buckets=TOKEN_BUCKETS)
+LLM_TOKENS_TOTAL = Counter("fda_llm_tokens_total", "LLM tokens consumed.", ("source", "model", "type"))
+LLM_COST_TOTAL = Counter("fda_llm_cost_usd_total", "Estimated LLM cost in USD.", ("source", "model"))
+_METRICS = [SPAN_SECONDS, LLM_TOKENS, LLM_TOKENS_TOTAL, LLM_COST_TOTAL]
+
+# callables returning {metric name: (help, value)} evaluated at scrape time (queue depth, cache stats, ...)
+_gauge_collectors: List[Callable[[], Dict[str, Tuple[str, float]]]] = []
+
+
+def register_gauges(collector: Callable[[], Dict[str, Tuple[str, float]]]) -> None:
+    _gauge_collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format (for GET /metrics)."""
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines += metric.render()
+    for collector in _gauge_collectors:
+        try:
+            gauges = collector()
+        except Exception as e:
+            logger.warning("gauge collector failed: %s", e)
+            continue
+        for name, (documentation, value) in gauges.items():
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {float(value):.6g}"]
+    return "\n".join(lines) + "\n"
+
+
+##-------------------------- Per-request traces --------------------------##
+
+class Trace:
+    """Timing and token totals of one request, returned as its `timing` breakdown."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, Dict[str, float]] = {}
+        self.llm = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+        self._lock = threading.Lock()
+
+    def add_span(self, key: str, seconds: float) -> None:
+        with self._lock:
+            span = self.spans.setdefault(key, {"count": 0, "seconds": 0.0})
+            span["count"] += 1
+            span["seconds"] += seconds
+
+    def add_llm(self, prompt_tokens: int, completion_tokens: int, cost: float) -> None:
+        with self._lock:
+            self.llm["calls"] += 1
+            self.llm["prompt_tokens"] += prompt_tokens
+            self.llm["completion_tokens"] += completion_tokens
+            self.llm["cost_usd"] += cost
+
+    def summary(self) -> Dict[str, Any]:
+        """Inclusive seconds per span (nested spans overlap) plus LLM token and cost totals."""
+        with self._lock:
+            return {
+                "total_seconds": round(time.perf_counter() - self.started, 3),
+                "spans": {k: {"count": int(v["count"]), "seconds": round(v["seconds"], 3)}
+                          for k, v in sorted(self.spans.items(), key=lambda kv: -kv[1]["seconds"])},
+                "llm": {**self.llm, "cost_usd": round(self.llm["cost_usd"], 6)},
+            }
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("fda_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """
+    Collect the spans and LLM usage of everything run inside the block.
+
+    The trace travels in a context variable; code that hands work to other threads
+    must run it in a copy of the caller's context (contextvars.copy_context().run).
+    """
+    t = Trace()
+    token = _current_trace.set(t)
+    try:
+        yield t
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, kind: str = "stage", tr: Optional[Trace] = None) -> Iterator[None]:
+    """Time the block into the fda_span_duration_seconds histogram and the current trace."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, kind, time.perf_counter() - started, tr)
+
+
+def record_span(name: str, kind: str, seconds: float, tr: Optional[Trace] = None) -> None:
+    SPAN_SECONDS.observe(seconds, kind=kind, name=name)
+    tr = tr or current_trace()
+    if tr is not None:
+        tr.add_span(f"{kind}:{name}", seconds)
+
+
+def timed(name: str, kind: str = "tool") -> Callable:
+    """Decorator form of `span`; keeps the wrapped signature and docstring for @tool."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+##-------------------------- LLM usage and cost --------------------------##
+
+def _prices() -> Dict[str, Tuple[float, float]]:
+    prices = dict(_DEFAULT_PRICES)
+    try:
+        prices.update({k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES", "") or "{}").items()})
+    except (ValueError, TypeError) as e:
+        logger.warning("Ignoring invalid LLM_PRICES: %s", e)
+    return prices
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of one call; unknown models cost 0."""
+    name = (model or "").split("/")[-1].lower()
+    prices = _prices()
+    # longest matching prefix, so dated snapshots (gpt-4o-mini-2024-07-18) resolve to their family
+    match = max((k for k in prices if name.startswith(k)), key=len, default=None)
+    if match is None:
+        return 0.0
+    price_in, price_out = prices[match]
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+def usage_tokens(response: Any) -> Tuple[int, int]:
+    """(prompt_tokens, completion_tokens) from an OpenAI / litellm response, 0 when absent."""
+    usage = getattr(response, "usage", None)
+    if usage is None and isinstance(response, dict):
+        usage = response.get("usage")
+    if usage is None:
+        return 0, 0
+    get = usage.get if isinstance(usage, dict) else (lambda k: getattr(usage, k, None))
+    return int(get("prompt_tokens") or 0), int(get("completion_tokens") or 0)
+
+
+def record_llm_call(model: str, prompt_tokens: int, completion_tokens: int, source: str,
+                    tr: Optional[Trace] = None) -> float:
+    """Record token counts and estimated cost of one LLM call; returns the cost."""
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    for kind, count in (("prompt", prompt_tokens), ("completion", completion_tokens)):
+        LLM_TOKENS.observe(count, source=source, model=model, type=kind)
+        LLM_TOKENS_TOTAL.inc(count, source=source, model=model, type=kind)
+    LLM_COST_TOTAL.inc(cost, source=source, model=model)
+    tr = tr or current_trace()
+    if tr is not None:
+        tr.add_llm(prompt_tokens, completion_tokens, cost)
+    return cost
@@ -0,0 +1,587 @@
+## Importing libraries and files
+import os
+import mmap
+import logging
+import collections.abc
+import tempfile
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import warnings
+warnings.filterwarnings("ignore", message="Cannot set gray non-stroke color*")
+
+from doc_cache import file_digest, get_document_cache
+from text_normalize import clean_whitespace
+
+# Try pdfplumber -> fallback to pypdf
+try:
+    import pdfplumber
+except Exception:
+    pdfplumber = None
+
+try:
+    from pypdf import PdfReader, __version__ as _pypdf_version
+except Exception:
+    PdfReader = None
+    _pypdf_version = None
+
+logger = logging.getLogger(__name__)
+
+# bump when extraction/cleaning output changes so cached pages are re-parsed
+_PIPELINE_VERSION = 2
+
+
+def parser_signature() -> str:
+    """Identify the parser chain (backend + version) so cached pages are invalidated on upgrades."""
+    parts = [f"pipeline-v{_PIPELINE_VERSION}"]
+    if pdfplumber is not None:
+        parts.append(f"pdfplumber-{getattr(pdfplumber, '__version__', 'unknown')}")
+    if PdfReader is not None:
+        parts.append(f"pypdf-{_pypdf_version}")
+    return "+".join(parts)
+
+
+def _page_record(page_number: int, raw: str) -> Dict[str, Any]:
+    text = clean_whitespace(raw)
+    return {"page_number": page_number, "text": text, "num_chars": len(text)}
+
+
+##-------------------------- Memory bounds --------------------------##
+
+_MB = 1024 * 1024
+
+# pdfplumber keeps a dict of ~20 attributes per char/line/rect while a page is open;
+# measured at ~2 KB per layout object on statement-style pages
+_LAYOUT_BYTES_PER_OBJECT = 2048
+
+
+class MemoryCeilingExceeded(RuntimeError):
+    """Raised when extracting one document would hold more memory than PDF_REQUEST_MEMORY_MB."""
+
+
+def low_memory_enabled() -> bool:
+    """PDF_LOW_MEMORY (default on): memory-mapped input, spilling page text and the per-request ceiling."""
+    return os.getenv("PDF_LOW_MEMORY", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+class MemoryBudget:
+    """
+    Memory accounting for one document extraction (one request).
+
+    Tracks the page text held in memory plus the layout of the page being parsed
+    and raises MemoryCeilingExceeded once their sum passes `ceiling_bytes`. Text
+    beyond `spill_bytes` is moved to a spill file (see SpilledPages), after which
+    it no longer counts. Zero disables the respective limit.
+    """
+
+    def __init__(self, ceiling_bytes: int = 0, spill_bytes: int = 0):
+        self.ceiling_bytes = max(0, int(ceiling_bytes))
+        self.spill_bytes = max(0, int(spill_bytes))
+        self.held_bytes = 0
+        self.peak_bytes = 0
+
+    @classmethod
+    def from_env(cls) -> "MemoryBudget":
+        """
+        Budget configured through the environment (no limits when PDF_LOW_MEMORY is off):
+            PDF_REQUEST_MEMORY_MB (float): ceiling per extraction (default 512, 0 = none).
+            PDF_SPILL_THRESHOLD_MB (float): page text kept in memory before spilling (default 16, 0 = never).
+        """
+        if not low_memory_enabled():
+            return cls()
+        return cls(ceiling_bytes=float(os.getenv("PDF_REQUEST_MEMORY_MB", "512")) * _MB,
+                   spill_bytes=float(os.getenv("PDF_SPILL_THRESHOLD_MB", "16")) * _MB)
+
+    def _check(self, transient: int, what: str) -> None:
+        used = self.held_bytes + transient
+        self.peak_bytes = max(self.peak_bytes, used)
+        if self.ceiling_bytes and used > self.ceiling_bytes:
+            raise MemoryCeilingExceeded(
+                f"{what} needs ~{used / _MB:.0f} MB, over the {self.ceiling_bytes / _MB:.0f} MB per-request "
+                "limit (PDF_REQUEST_MEMORY_MB)")
+
+    def charge_page(self, page_number: int, layout_objects: int) -> None:
+        """Account for the (transient) parsed layout of one page."""
+        self._check(layout_objects * _LAYOUT_BYTES_PER_OBJECT, f"page {page_number}")
+
+    def hold(self, num_bytes: int) -> None:
+        self.held_bytes += num_bytes
+        self._check(0, "extracted text")
+
+    def release(self, num_bytes: int) -> None:
+        self.held_bytes = max(0, self.held_bytes - num_bytes)
+
+
+class SpilledPages(collections.abc.Sequence):
+    """
+    Page records whose text lives in an anonymous temporary file.
+
+    Behaves like the usual list of {"page_number", "text", "num_chars"} dicts, but
+    only offsets stay in memory; each access reads that page back. The file is
+    removed on `close()` (or when the object is garbage collected).
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile(prefix="pdf-pages-")
+        self._index: List[Tuple[Any, int, int, int]] = []  # (page_number, offset, byte length, num_chars)
+        self._lock = threading.Lock()
+        self.spilled_bytes = 0
+
+    def append(self, record: Dict[str, Any]) -> None:
+        data = record["text"].encode("utf-8")
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(data)
+            self._index.append((record["page_number"], offset, len(data), record["num_chars"]))
+            self.spilled_bytes += len(data)
+
+    def _load(self, entry: Tuple[Any, int, int, int]) -> Dict[str, Any]:
+        page_number, offset, length, num_chars = entry
+        with self._lock:
+            self._file.seek(offset)
+            text = self._file.read(length).decode("utf-8")
+        return {"page_number": page_number, "text": text, "num_chars": num_chars}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self._load(e) for e in self._index[k]]
+        return self._load(self._index[k])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for entry in list(self._index):
+            yield self._load(entry)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _PageCollector:
+    """Accumulates extracted records in a list, switching to SpilledPages past the spill threshold."""
+
+    def __init__(self, budget: MemoryBudget):
+        self.budget = budget
+        self.pages: Union[List[Dict[str, Any]], SpilledPages] = []
+
+    def add(self, record: Dict[str, Any]) -> None:
+        if isinstance(self.pages, SpilledPages):
+            self.pages.append(record)
+            return
+        self.pages.append(record)
+        self.budget.hold(len(record["text"]))
+        if self.budget.spill_bytes and self.budget.held_bytes > self.budget.spill_bytes:
+            spilled = SpilledPages()
+            for rec in self.pages:
+                spilled.append(rec)
+            logger.info("Spilled %d pages (%.1f MB of text) to disk", len(spilled), spilled.spilled_bytes / _MB)
+            self.pages = spilled
+            self.budget.release(self.budget.held_bytes)
+
+
+@contextmanager
+def _mapped(path: str) -> Iterator[Union[str, mmap.mmap]]:
+    """
+    The PDF as a read-only memory map in low-memory mode, else the path.
+
+    Given a path, pypdf reads the whole file into a BytesIO copy; given the map it
+    reads straight from the page cache, and so does pdfplumber/pdfminer.
+    """
+    if not low_memory_enabled():
+        yield path
+        return
+    try:
+        f = open(path, "rb")
+    except OSError:
+        yield path
+        return
+    try:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):  # empty file or mapping unsupported
+            yield path
+            return
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+    finally:
+        f.close()
+
+
+##-------------------------- Page-range extraction (worker) --------------------------##
+
+def count_pages(path: str) -> int:
+    """Return the number of pages in the PDF (pypdf is cheaper for this, so try it first)."""
+    with _mapped(path) as source:
+        if PdfReader is not None:
+            try:
+                return len(PdfReader(source).pages)
+            except Exception as e:
+                logger.warning("pypdf could not count pages (%s), trying pdfplumber: %s", type(e), e)
+        if pdfplumber is not None:
+            with pdfplumber.open(source) as pdf:
+                return len(pdf.pages)
+    raise RuntimeError("No PDF parser available. Install pdfplumber or pypdf and retry.")
+
+
+def _iter_page_records(path: str, indices: Iterable[int],
+                       budget: Optional[MemoryBudget] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield cleaned records for the given 0-based page indices of the PDF at `path`.
+
+    pdfplumber is used for each page and pypdf is used as a per-page fallback when
+    pdfplumber is missing, cannot open the file, or fails on that page. Each page's
+    parsed layout is released as soon as its text is extracted (otherwise pdfplumber
+    keeps every page's objects until the file is closed), and its size is charged to
+    `budget`. The file is closed as soon as the generator is exhausted or closed.
+    """
+    budget = budget if budget is not None else MemoryBudget.from_env()
+    plumber_pdf = None
+    reader = None
+
+    with _mapped(path) as source:
+        if pdfplumber is not None:
+            try:
+                plumber_pdf = pdfplumber.open(source)
+            except Exception as e:
+                logger.warning("pdfplumber could not open %s (%s), will use pypdf fallback: %s", path, type(e), e)
+
+        try:
+            for i in indices:
+                raw: Optional[str] = None
+
+                # Primary: pdfplumber (better for layout + tables)
+                if plumber_pdf is not None:
+                    page = None
+                    try:
+                        page = plumber_pdf.pages[i]
+                        raw = page.extract_text() or ""
+                    except Exception as e:
+                        logger.warning("pdfplumber failed on page %d (%s), trying pypdf: %s", i + 1, type(e), e)
+                    finally:
+                        if page is not None:
+                            _release_page(page, i + 1, budget)
+
+                # Fallback: pypdf for this page only
+                if raw is None and PdfReader is not None:
+                    if reader is None:
+                        try:
+                            reader = PdfReader(source)
+                        except Exception as e:
+                            logger.error("pypdf parsing also failed: %s", e)
+                            raise RuntimeError(f"Failed to parse PDF with pdfplumber and pypdf: {e}")
+                    try:
+                        raw = reader.pages[i].extract_text() or ""
+                    except Exception:
+                        raw = ""
+
+                if raw is None:
+                    raise RuntimeError("No PDF parser available or PDF parsing produced no text. "
+                                        "Install pdfplumber or pypdf and retry.")
+                yield _page_record(i + 1, raw)
+        finally:
+            if plumber_pdf is not None:
+                plumber_pdf.close()
+
+
+def _release_page(page: Any, page_number: int, budget: MemoryBudget) -> None:
+    """Close a pdfplumber page and charge the layout it had parsed to `budget`."""
+    # objects parsed so far (not re-parsed here if extraction failed early)
+    parsed = getattr(page, "_objects", None) or {}
+    layout_objects = sum(len(objs) for objs in parsed.values())
+    page.close()
+    budget.charge_page(page_number, layout_objects)
+
+
+def iter_layout_pages(path: str, page_numbers: Optional[Iterable[int]] = None,
+                      budget: Optional[MemoryBudget] = None) -> Iterator[Tuple[int, Any]]:
+    """
+    Lazily yield (page number, pdfplumber page) for the 1-based `page_numbers` (default: all).
+
+    For callers that need more than the text, e.g. tables. Pages are opened from the
+    memory-mapped file one at a time and each is closed, and charged to `budget`,
+    as soon as the caller moves on; numbers outside the document are skipped.
+
+    Raises:
+        RuntimeError: if pdfplumber is not installed.
+    """
+    if pdfplumber is None:
+        raise RuntimeError("pdfplumber is required for page layouts. Install pdfplumber and retry.")
+    budget = budget if budget is not None else MemoryBudget.from_env()
+    with _mapped(path) as source:
+        with pdfplumber.open(source) as pdf:
+            numbers = page_numbers if page_numbers is not None else range(1, len(pdf.pages) + 1)
+            for page_number in numbers:
+                if not 1 <= page_number <= len(pdf.pages):
+                    continue
+                page = pdf.pages[page_number - 1]
+                try:
+                    yield page_number, page
+                finally:
+                    _release_page(page, page_number, budget)
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[Dict[str, Any]]:
+    """Extract pages [start, stop) (0-based). Runs inside process-pool workers, which open the file themselves."""
+    return list(_iter_page_records(path, range(start, stop)))
+
+
+##-------------------------- Parallel extraction --------------------------##
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _configured_workers() -> int:
+    """Worker processes for extraction (PDF_EXTRACT_WORKERS, default 1 = in-process)."""
+    value = os.getenv("PDF_EXTRACT_WORKERS", "1").strip().lower()
+    if value in ("auto", "0"):
+        return os.cpu_count() or 1
+    try:
+        return max(1, int(value))
+    except ValueError:
+        return 1
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: workers only import this module, and forking a threaded server is unsafe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+        _pool_workers = 0
+
+
+def _split_range(num_pages: int, slices: int) -> List[Tuple[int, int]]:
+    """Split [0, num_pages) into at most `slices` contiguous, near-equal ranges."""
+    slices = max(1, min(slices, num_pages))
+    step, extra = divmod(num_pages, slices)
+    ranges = []
+    start = 0
+    for k in range(slices):
+        stop = start + step + (1 if k < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def extract_pages(path: str, workers: Optional[int] = None) -> Sequence[Dict[str, Any]]:
+    """
+    Parse every page of the PDF at `path` into cleaned per-page records.
+
+    Args:
+        path (str): Local path to the PDF file.
+        workers (int, optional): Worker processes to use. Defaults to PDF_EXTRACT_WORKERS.
+                                 With more than one worker (and at least PDF_PARALLEL_MIN_PAGES
+                                 pages) the page range is split across a process pool and the
+                                 results are merged back in page order.
+
+    Returns:
+        Sequence[dict]: [{"page_number": 1, "text": "...", "num_chars": 1234}, ...]; a
+                        SpilledPages instead of a list once the text passes
+                        PDF_SPILL_THRESHOLD_MB (low-memory mode).
+
+    Raises:
+        RuntimeError: if no supported PDF backend is installed / parsing fails
+        MemoryCeilingExceeded: if the document needs more than PDF_REQUEST_MEMORY_MB
+    """
+    workers = _configured_workers() if workers is None else max(1, workers)
+    num_pages = count_pages(path)
+    min_pages = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+    budget = MemoryBudget.from_env()
+    collector = _PageCollector(budget)
+
+    if workers > 1 and num_pages >= min_pages:
+        # a few more slices than workers evens out pages of very different cost
+        ranges = _split_range(num_pages, workers * 2)
+        try:
+            pool = _get_pool(workers)
+            futures = [pool.submit(_extract_page_range, path, start, stop) for start, stop in ranges]
+            for future in futures:
+                for record in future.result():
+                    collector.add(record)
+        except BrokenProcessPool as e:
+            logger.warning("PDF extraction pool broke (%s), extracting in-process", e)
+            _reset_pool()
+            collector = _PageCollector(MemoryBudget.from_env())
+            for record in _iter_page_records(path, range(num_pages), collector.budget):
+                collector.add(record)
+    else:
+        for record in _iter_page_records(path, range(num_pages), budget):
+            collector.add(record)
+
+    if not collector.pages:
+        # No parser available / no pages extracted
+        raise RuntimeError("No PDF parser available or PDF parsing produced no text. "
+                            "Install pdfplumber or pypdf and retry.")
+
+    return collector.pages
+
+
+##-------------------------- Streaming / page selection --------------------------##
+
+PageSelection = Union[str, int, Sequence[int], None]
+
+
+def parse_page_selection(pages: PageSelection, num_pages: int) -> List[int]:
+    """
+    Turn a 1-based page selection into sorted, de-duplicated 0-based indices.
+
+    Accepts a spec string such as "1-5,8,10-" (open-ended ranges allowed),
+    a single page number, or a list of page numbers. Pages past the end of the
+    document are ignored.
+
+    Raises:
+        ValueError: if the spec is malformed or selects no existing page
+    """
+    if pages is None:
+        return list(range(num_pages))
+
+    selected = set()
+    if isinstance(pages, int):
+        selected.add(pages)
+    elif isinstance(pages, str):
+        for part in pages.replace(" ", "").split(","):
+            if not part:
+                continue
+            try:
+                if "-" in part:
+                    lo, hi = part.split("-", 1)
+                    first = int(lo) if lo else 1
+                    last = int(hi) if hi else num_pages
+                    selected.update(range(first, last + 1))
+                else:
+                    selected.add(int(part))
+            except ValueError:
+                raise ValueError(f"Invalid page selection: {pages!r}")
+    else:
+        selected.update(int(p) for p in pages)
+
+    indices = sorted(p - 1 for p in selected if 1 <= p <= num_pages)
+    if not indices:
+        raise ValueError(f"Page selection {pages!r} matches no pages (document has {num_pages}).")
+    return indices
+
+
+def _check_max_chars(max_chars: Optional[int]) -> Optional[int]:
+    if max_chars is None:
+        return None
+    if int(max_chars) < 1:
+        raise ValueError(f"max_chars must be at least 1 (got {max_chars}); omit it to read everything.")
+    return int(max_chars)
+
+
+def _apply_char_budget(records: Iterator[Dict[str, Any]], max_chars: Optional[int]) -> Iterator[Dict[str, Any]]:
+    """
+    Records until `max_chars` of page text have been produced, truncating the last page.
+
+    Raises:
+        ValueError: if `max_chars` is below 1.
+    """
+    max_chars = _check_max_chars(max_chars)
+    if max_chars is None:
+        return records
+    return _budgeted(records, max_chars)
+
+
+def _budgeted(records: Iterator[Dict[str, Any]], remaining: int) -> Iterator[Dict[str, Any]]:
+    try:
+        for rec in records:
+            if remaining <= 0:
+                break
+            if rec["num_chars"] > remaining:
+                text = rec["text"][:remaining]
+                rec = {"page_number": rec["page_number"], "text": text, "num_chars": len(text)}
+            remaining -= rec["num_chars"]
+            yield rec
+    finally:
+        # stop the underlying parser as soon as the budget is spent
+        close = getattr(records, "close", None)
+        if close is not None:
+            close()
+
+
+def iter_pages(path: str, pages: PageSelection = None, max_chars: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield cleaned page records from the PDF at `path`, one page at a time.
+
+    Args:
+        path (str): Local path to the PDF file.
+        pages: Optional 1-based page selection (see `parse_page_selection`).
+        max_chars (int, optional): Stop parsing once this many characters of page text
+                                   have been yielded (the last page is truncated to fit);
+                                   at least 1.
+
+    Raises:
+        ValueError: if `max_chars` is below 1.
+    """
+    _check_max_chars(max_chars)
+    indices = parse_page_selection(pages, count_pages(path))
+    yield from _apply_char_budget(_iter_page_records(path, indices), max_chars)
+
+
+def load_pages(path: str) -> Sequence[Dict[str, Any]]:
+    """
+    Every page of the PDF at `path`, served from the parsed-document cache when possible.
+
+    Documents that were spilled to disk (see `extract_pages`) are returned as their
+    SpilledPages and not cached, since caching would pull their text back into memory.
+    """
+    cache = get_document_cache()
+    cache_key = cache.make_key(file_digest(path), parser_signature())
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    pages_out = extract_pages(path)
+    if isinstance(pages_out, SpilledPages):
+        logger.info("Not caching %s: %d pages spilled to disk", path, len(pages_out))
+    else:
+        cache.put(cache_key, pages_out)
+    return pages_out
+
+
+def read_pages(path: str, pages: PageSelection = None, max_chars: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Cache-aware page reader used by read_data_tool.
+
+    A document already in the parsed-document cache is served from it. A full read
+    (no `pages`, no `max_chars`) is extracted with `extract_pages` and cached. Partial
+    reads are streamed with `iter_pages` so they never parse more than they return.
+
+    Raises:
+        ValueError: if `max_chars` is below 1.
+    """
+    _check_max_chars(max_chars)
+    if pages is None and max_chars is None:
+        return iter(load_pages(path))
+
+    cache = get_document_cache()
+    cached = cache.get(cache.make_key(file_digest(path), parser_signature()))
+    if cached is not None:
+        if pages is not None:
+            keep = set(parse_page_selection(pages, len(cached)))
+            cached = [p for p in cached if p["page_number"] - 1 in keep]
+        return _apply_char_budget(iter(cached), max_chars)
+
+    return iter_pages(path, pages=pages, max_chars=max_chars)
@@ -0,0 +1,174 @@
+## Importing libraries and files
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import current_trace, record_span
+
+if TYPE_CHECKING:
+    from crewai import Agent, Task
+
+logger = logging.getLogger(__name__)
+
+
+##-------------------------- Task timing --------------------------##
+
+# id(task) -> (start time, trace of the request running it); filled by the CrewAI event bus
+_task_starts: Dict[int, Any] = {}
+_task_starts_lock = threading.Lock()
+
+
+def _task_name(task: Any) -> str:
+    return getattr(task, "name", None) or getattr(getattr(task, "agent", None), "role", None) or "task"
+
+
+def _on_task_started(source, event):
+    # emitted on the thread that runs the task, so the request's trace is in context
+    with _task_starts_lock:
+        _task_starts[id(source)] = (time.perf_counter(), current_trace())
+
+
+def _on_task_finished(source, event):
+    with _task_starts_lock:
+        started = _task_starts.pop(id(source), None)
+    if started is not None:
+        record_span(_task_name(source), "task", time.perf_counter() - started[0], started[1])
+
+
+_task_timing_installed = False
+
+
+def install_task_timing() -> bool:
+    """
+    Subscribe the task timers to CrewAI's event bus (idempotent).
+
+    Called when the crew is first built rather than at import, so importing this
+    module does not import crewai. Returns False if the event bus is unavailable.
+    """
+    global _task_timing_installed
+    with _task_starts_lock:
+        if _task_timing_installed:
+            return True
+        try:
+            from crewai.utilities.events import (crewai_event_bus, TaskCompletedEvent, TaskFailedEvent,
+                                                 TaskStartedEvent)
+        except Exception:
+            return False
+        crewai_event_bus.on(TaskStartedEvent)(_on_task_started)
+        crewai_event_bus.on(TaskCompletedEvent)(_on_task_finished)
+        crewai_event_bus.on(TaskFailedEvent)(_on_task_finished)
+        _task_timing_installed = True
+        return True
+
+
+##-------------------------- Dependency-graph execution --------------------------##
+
+def attach_task_callbacks(tasks: List["Task"], on_task_done: Optional[Callable[[str, Any], None]]) -> None:
+    """Call `on_task_done(task name, TaskOutput)` as soon as each of `tasks` completes."""
+    if on_task_done is None:
+        return
+    for task in tasks:
+        task.callback = lambda output, name=task.name or task.agent.role: on_task_done(name, output)
+
+
+def _run_stage(task: "Task", inputs: Dict[str, Any]) -> Any:
+    """Run a single task as its own one-agent crew and return the crew output."""
+    from crewai import Crew, Process
+
+    stage = Crew(agents=[task.agent], tasks=[task], process=Process.sequential)
+    return stage.kickoff(inputs=inputs)
+
+
+# validated template crews by the identity of their (long-lived) agents and tasks; every run copies one
+_templates: Dict[Tuple[int, ...], Any] = {}
+_templates_lock = threading.Lock()
+
+
+def template_crew(agents: List["Agent"], tasks: List["Task"]) -> Any:
+    """
+    Sequential Crew over `agents` and `tasks`, built once per combination.
+
+    Callers must `.copy()` it before running: kickoff mutates the tasks.
+    """
+    from crewai import Crew, Process
+
+    key = tuple(id(a) for a in agents) + (0,) + tuple(id(t) for t in tasks)
+    with _templates_lock:
+        crew = _templates.get(key)
+        if crew is None:
+            install_task_timing()
+            crew = _templates[key] = Crew(agents=agents, tasks=tasks, process=Process.sequential)
+        return crew
+
+
+def run_parallel(
+    agents: List["Agent"],
+    verification: Optional["Task"],
+    branches: List["Task"],
+    inputs: Dict[str, Any],
+    synthesis: Optional["Task"] = None,
+    max_workers: Optional[int] = None,
+    on_task_done: Optional[Callable[[str, Any], None]] = None,
+) -> Any:
+    """
+    Run the analysis pipeline as a dependency graph instead of a straight line.
+
+        verification --> branch 1 --\\
+                     --> branch 2 ---+--> synthesis (optional)
+                     --> branch 3 --/
+
+    Verification runs first. Every branch only depends on the verified document, so the
+    branches run concurrently on a thread pool. The optional synthesis step then merges
+    them. End-to-end latency is roughly verification + the slowest branch (+ synthesis)
+    instead of the sum of all tasks.
+
+    Args:
+        agents: every agent referenced by the tasks.
+        verification: task that must finish before any branch starts, or None when the
+            document was already verified (e.g. by the local prefilter).
+        branches: independent tasks; each receives the verification output as context.
+        inputs: kickoff inputs (e.g. {"query": ..., "file_path": ...}).
+        synthesis: optional final task that receives every previous output as context.
+        max_workers: branch concurrency (default: one thread per branch).
+        on_task_done: optional `(task name, TaskOutput)` callback fired as each task finishes
+            (from the thread that ran it).
+
+    Returns:
+        The synthesis crew output, or the branch outputs joined under per-agent headers
+        when no synthesis task is given.
+    """
+    head = [verification] if verification is not None else []
+    tasks = head + list(branches) + ([synthesis] if synthesis is not None else [])
+
+    # Private copies: concurrent requests must not share (and mutate) the same Task objects
+    crew = template_crew(agents, tasks).copy()
+    verify_task = crew.tasks[0] if verification is not None else None
+    branch_tasks = crew.tasks[len(head):len(head) + len(branches)]
+    synth_task = crew.tasks[-1] if synthesis is not None else None
+    upstream = [verify_task] if verify_task is not None else []
+    attach_task_callbacks(crew.tasks, on_task_done)
+
+    # Stage 1: verification
+    if verify_task is not None:
+        _run_stage(verify_task, inputs)
+
+    # Stage 2: independent branches, each seeing only the verification output
+    for task in branch_tasks:
+        task.context = upstream
+    workers = max_workers or len(branch_tasks) or 1
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crew-branch") as pool:
+        # each branch runs in a copy of the caller's context so request tracing follows it
+        futures = [pool.submit(contextvars.copy_context().run, _run_stage, t, inputs) for t in branch_tasks]
+        outputs = [f.result() for f in futures]
+
+    # Stage 3: optional synthesis over everything produced so far
+    if synth_task is not None:
+        synth_task.context = [*upstream, *branch_tasks]
+        return _run_stage(synth_task, inputs)
+
+    sections = [f"## {t.agent.role}\n{t.output.raw if t.output else ''}" for t in upstream]
+    sections += [f"## {task.agent.role}\n{output}" for task, output in zip(branch_tasks, outputs)]
+    return "\n\n".join(sections)
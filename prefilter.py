@@ -0,0 +1,109 @@
+## Importing libraries and files
+import os
+import re
+import logging
+from typing import Any, Dict, List
+
+from figures import extract_key_figures
+from pdf_reader import read_pages
+from relevance import FINANCIAL_LEXICON, tokenize
+
+logger = logging.getLogger(__name__)
+
+FINANCIAL = "financial"
+NOT_FINANCIAL = "not_financial"
+AMBIGUOUS = "ambiguous"
+
+_NUMBER_RE = re.compile(r"(?<![\w.])\(?-?\d[\d,]*(?:\.\d+)?\)?%?")
+_CURRENCY_RE = re.compile(r"[$€£¥]|\b(?:usd|eur|gbp|jpy|cny)\b|\bin (?:thousands|millions|billions)\b", re.IGNORECASE)
+
+_FINANCIAL_TERMS = frozenset(term for term, weight in FINANCIAL_LEXICON.items() if weight > 0)
+
+# signal -> (value at which it counts fully, weight in the score)
+_SIGNALS = {
+    "keyword_density": (0.04, 0.30),
+    "numeric_ratio": (0.10, 0.20),
+    "currency_ratio": (0.01, 0.15),
+    "table_page_ratio": (0.50, 0.20),
+    "key_figures": (3, 0.15),
+}
+
+
+##-------------------------- Signals --------------------------##
+
+def _is_table_page(text: str) -> bool:
+    """A page looks tabular when at least three of its lines carry two or more numbers."""
+    rows = sum(1 for line in text.splitlines() if len(_NUMBER_RE.findall(line)) >= 2)
+    return rows >= 3
+
+
+def document_signals(pages: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Compute the raw classifier signals for a list of page records (read_pages output).
+
+    Returns:
+        dict with words, keyword_density (financial terms / words), numeric_ratio
+        (numbers / whitespace tokens), currency_ratio (currency markers / whitespace
+        tokens), table_page_ratio (tabular pages / pages) and key_figures (number of
+        key figures found by figures.extract_from_text).
+    """
+    text = "\n\n".join(f"--- PAGE {p['page_number']} ---\n{p['text']}" for p in pages)
+    words = tokenize(text)
+    raw_tokens = max(1, len(text.split()))
+    return {
+        "words": len(words),
+        "keyword_density": sum(1 for w in words if w in _FINANCIAL_TERMS) / max(1, len(words)),
+        "numeric_ratio": len(_NUMBER_RE.findall(text)) / raw_tokens,
+        "currency_ratio": len(_CURRENCY_RE.findall(text)) / raw_tokens,
+        "table_page_ratio": sum(1 for p in pages if _is_table_page(p["text"])) / max(1, len(pages)),
+        "key_figures": len(extract_key_figures(text=text)),
+    }
+
+
+def score_signals(signals: Dict[str, float]) -> float:
+    """Weighted sum of the signals, each capped at its saturation value; 0.0 - 1.0."""
+    return sum(weight * min(1.0, signals[name] / full) for name, (full, weight) in _SIGNALS.items())
+
+
+##-------------------------- Classifier --------------------------##
+
+def classify_document(path: str) -> Dict[str, Any]:
+    """
+    Decide locally whether the PDF at `path` is a financial document.
+
+    Only the first PREFILTER_MAX_PAGES pages (default 8) are read. Thresholds come from
+    the environment:
+        PREFILTER_ACCEPT (float): score at or above which the document is financial (default 0.6).
+        PREFILTER_REJECT (float): score at or below which it is not financial (default 0.15).
+        PREFILTER_MIN_WORDS (int): fewer words than this (e.g. scanned PDFs) is never
+            rejected, only ambiguous (default 150).
+
+    Returns:
+        dict with verdict ("financial" | "not_financial" | "ambiguous"), score,
+        pages_checked and the raw signals.
+    """
+    max_pages = int(os.getenv("PREFILTER_MAX_PAGES", "8"))
+    accept = float(os.getenv("PREFILTER_ACCEPT", "0.6"))
+    reject = float(os.getenv("PREFILTER_REJECT", "0.15"))
+    min_words = int(os.getenv("PREFILTER_MIN_WORDS", "150"))
+
+    pages = list(read_pages(path, pages=f"1-{max(1, max_pages)}"))
+    signals = document_signals(pages)
+    score = score_signals(signals)
+
+    if signals["words"] < min_words:
+        verdict = AMBIGUOUS
+    elif score >= accept:
+        verdict = FINANCIAL
+    elif score <= reject:
+        verdict = NOT_FINANCIAL
+    else:
+        verdict = AMBIGUOUS
+
+    logger.info("prefilter %s: verdict=%s score=%.3f", path, verdict, score)
+    return {
+        "verdict": verdict,
+        "score": round(score, 3),
+        "pages_checked": len(pages),
+        "signals": {k: round(v, 4) if isinstance(v, float) else v for k, v in signals.items()},
+    }
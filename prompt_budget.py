@@ -0,0 +1,324 @@
+## Importing libraries and files
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Optional: exact OpenAI token counts (falls back to the ~4 characters per token estimate)
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
+from mapreduce import split_pages
+from rate_limiter import estimate_tokens
+from relevance import select_pages
+
+logger = logging.getLogger(__name__)
+
+# Context window (prompt + completion tokens); names match by longest prefix, so dated
+# snapshots such as "gpt-4o-mini-2024-07-18" resolve to their family
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1-nano": 1047576,
+    "gpt-4.1-mini": 1047576,
+    "gpt-4.1": 1047576,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+_UNKNOWN_CONTEXT_TOKENS = 8192
+
+# Per-message framing the chat API adds on top of the content tokens
+CHAT_OVERHEAD_TOKENS = 8
+
+FALLBACK_TOKENIZER = "chars/4"
+
+
+##-------------------------- Token counting --------------------------##
+
+_encoders: Dict[str, Any] = {}
+_encoders_lock = threading.Lock()
+
+
+def _encoder(model: str) -> Any:
+    """tiktoken encoding for `model` (o200k_base for unknown models), or None without tiktoken."""
+    if tiktoken is None:
+        return None
+    with _encoders_lock:
+        if model not in _encoders:
+            try:
+                try:
+                    _encoders[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encoders[model] = tiktoken.get_encoding("o200k_base")
+            except Exception as e:  # e.g. the BPE file cannot be downloaded
+                logger.warning("tiktoken unavailable for %s, estimating tokens from length: %s", model, e)
+                _encoders[model] = None
+        return _encoders[model]
+
+
+def tokenizer_name(model: str) -> str:
+    encoder = _encoder(model)
+    return encoder.name if encoder is not None else FALLBACK_TOKENIZER
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Tokens `text` costs for `model` (uncached; see TokenCountCache for repeated text)."""
+    encoder = _encoder(model)
+    if encoder is None:
+        return estimate_tokens(text)
+    return len(encoder.encode(text or "", disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str) -> str:
+    """The longest prefix of `text` that costs at most `max_tokens` tokens."""
+    max_tokens = max(0, int(max_tokens))
+    encoder = _encoder(model)
+    if encoder is None:
+        return text[:max(0, max_tokens - 1) * 4]
+    tokens = encoder.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoder.decode(tokens[:max_tokens])
+
+
+def context_tokens(model: str) -> int:
+    for name in sorted(MODEL_CONTEXT_TOKENS, key=len, reverse=True):
+        if model.startswith(name):
+            return MODEL_CONTEXT_TOKENS[name]
+    return _UNKNOWN_CONTEXT_TOKENS
+
+
+class TokenCountCache:
+    """
+    Thread-safe LRU of token counts keyed by (tokenizer, content hash).
+
+    Both analysis tools, every map-reduce chunk and repeated requests on the same
+    report measure the same pages again; hashing a page is far cheaper than
+    compacting and encoding it. `page` also keeps the compacted page text.
+    """
+
+    def __init__(self, max_entries: int = 8192):
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str, bytes], Tuple[Optional[str], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, kind: str, text: str, model: str, compute) -> Tuple[Optional[str], int]:
+        key = (kind, tokenizer_name(model), hashlib.blake2b(text.encode("utf-8", "surrogatepass"),
+                                                              digest_size=16).digest())
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def count(self, text: str, model: str) -> int:
+        """Tokens of `text` as is."""
+        return self._lookup("text", text, model, lambda: (None, count_tokens(text, model)))[1]
+
+    def page(self, text: str, model: str) -> Tuple[str, int]:
+        """(compact_text(text), its token count) for one document page."""
+        def compute():
+            compacted = compact_text(text)
+            return compacted, count_tokens(compacted, model)
+        return self._lookup("page", text, model, compute)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_default_cache: Optional[TokenCountCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_token_cache() -> TokenCountCache:
+    """
+    Return the process-wide token count cache.
+
+    Configured through the environment:
+        TOKEN_COUNT_CACHE_SIZE (int): counted texts kept before LRU eviction (default 8192).
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TokenCountCache(int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "8192")))
+        return _default_cache
+
+
+##-------------------------- Text compaction --------------------------##
+
+# 12,345 -> 12345 (not inside identifiers, decimals or longer comma lists)
+# (the lookbehind sits after the first digit: checking it only at digits is much faster)
+_THOUSANDS_RE = re.compile(r"(\d(?<![\w.,]\d)\d{0,2}),(\d{3})(?!,?\d)")
+_MULTI_THOUSANDS_RE = re.compile(r"\d(?<![\w.,]\d)\d{0,2}(?:,\d{3}){2,}(?!,?\d)")
+# what makes "12,345,678" an amount rather than a list such as "pages 100,200,300"
+_CURRENCY_BEFORE_RE = re.compile(r"(?:[$€£¥]|\b(?:USD|EUR|GBP|JPY))[ (]{0,2}$")
+_UNIT_AFTER_RE = re.compile(r"%|[kmb]n?\b| ?(?:million|billion|thousand)\b", re.IGNORECASE)
+_CURRENCY_SPACE_RE = re.compile(r"([$€£¥]) +(?=[\d(])")
+# dot leaders and rules in tables of contents / statements: "........", "-------", "______"
+_RULE_RE = re.compile(r"([.\-_=·])\1{3,}")
+_RULE_MARKERS = ("....", "----", "____", "====", "····")
+
+
+def _join_thousands(m: "re.Match[str]") -> str:
+    # several groups: only an adjacent currency symbol or unit makes it one number
+    before = m.string[max(0, m.start() - 6):m.start()]
+    if _CURRENCY_BEFORE_RE.search(before) or _UNIT_AFTER_RE.match(m.string, m.end()):
+        return m.group(0).replace(",", "")
+    return m.group(0)
+
+
+def compact_text(text: str) -> str:
+    """
+    Cheaper-to-tokenize form of extracted document text that states the same facts.
+
+    Drops thousands separators (the prompts ask for numbers without commas anyway;
+    numbers with several groups only next to a currency symbol or unit, so lists
+    such as "pages 100,200,300" stay as they are), the spaces after currency symbols and inside parentheses and before percent signs,
+    and shortens dot leaders and rule lines to three characters. Words, digits, signs,
+    units and line structure are untouched.
+    """
+    # every rule is guarded by a substring test: most pages only need a few of them
+    if "," in text:
+        text = _THOUSANDS_RE.sub(r"\1\2", text)
+        text = _MULTI_THOUSANDS_RE.sub(_join_thousands, text)
+    if any(symbol + " " in text for symbol in "$€£¥"):
+        text = _CURRENCY_SPACE_RE.sub(r"\1", text)
+    text = text.replace("( ", "(").replace(" )", ")").replace(" %", "%")
+    if any(marker in text for marker in _RULE_MARKERS):
+        text = _RULE_RE.sub(r"\1\1\1", text)
+    return text
+
+
+##-------------------------- Prompt assembly --------------------------##
+
+def _configured_budgets() -> Dict[str, int]:
+    raw = os.getenv("PROMPT_TOKEN_BUDGETS", "").strip()
+    if not raw:
+        return {}
+    try:
+        return {str(k): int(v) for k, v in json.loads(raw).items()}
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.warning("Ignoring invalid PROMPT_TOKEN_BUDGETS: %s", e)
+        return {}
+
+
+def excerpt_budget(model: str, default: int) -> int:
+    """
+    Document tokens a tool may send to `model`.
+
+    PROMPT_TOKEN_BUDGETS='{"gpt-4o-mini": 6000}' overrides the tool's own `default` per
+    model (longest matching prefix wins).
+    """
+    budgets = _configured_budgets()
+    for name in sorted(budgets, key=len, reverse=True):
+        if model.startswith(name):
+            return budgets[name]
+    return default
+
+
+class PromptBuilder:
+    """
+    Assembles `instructions + excerpt` so the whole prompt fits a token budget.
+
+    The document is split into its pages and each page is compacted (`compact_text`)
+    and counted once through the shared TokenCountCache. Pages are then chosen by
+    relevance to the query (or from the start of the document) until the excerpt
+    budget is used up, and the completion allowance is clamped to what the model's
+    context window has left, so the rate limiter and the request both see the
+    tokens the call really costs.
+
+    Args:
+        model: chat model the prompt is sent to.
+        budget_tokens: document tokens the caller wants to spend (see `excerpt_budget`).
+        max_tokens: completion tokens requested.
+    """
+
+    def __init__(self, model: str, budget_tokens: int, max_tokens: int):
+        self.model = model
+        self.max_tokens = int(max_tokens)
+        self.budget_tokens = excerpt_budget(model, int(budget_tokens))
+        self.cache = get_token_cache()
+
+    def count(self, text: str) -> int:
+        return self.cache.count(text, self.model)
+
+    def available(self, instructions: str) -> int:
+        """Document tokens left after the instructions, the completion and the chat framing."""
+        room = context_tokens(self.model) - self.count(instructions) - self.max_tokens - CHAT_OVERHEAD_TOKENS
+        return max(0, min(self.budget_tokens, room))
+
+    def pages(self, text: str) -> List[Dict[str, Any]]:
+        """Compacted page records of `text` with their token counts (`num_tokens`)."""
+        records = []
+        for label, page in split_pages(text):
+            compacted, tokens = self.cache.page(page, self.model)
+            records.append({"page_number": label, "text": compacted, "num_chars": len(compacted),
+                            "num_tokens": tokens})
+        return records
+
+    def fit(self, records: List[Dict[str, Any]], query: str = "", budget: Optional[int] = None,
+            selection: str = "relevance") -> str:
+        """The excerpt of the page `records` that fits `budget` tokens (default: the builder's budget)."""
+        budget = self.budget_tokens if budget is None else budget
+        if sum(p["num_tokens"] + 1 for p in records) <= budget:
+            parts = [p["text"] for p in records]
+        elif selection == "relevance":
+            parts = [p["text"] for p in select_pages(records, query, budget, size_key="num_tokens", separator=1,
+                                                     truncate=lambda page, n: truncate_tokens(page, n, self.model))]
+        else:
+            parts, remaining = [], budget
+            for page in records:
+                if page["num_tokens"] + 1 > remaining:
+                    parts.append(truncate_tokens(page["text"], remaining - 1, self.model))
+                    break
+                parts.append(page["text"])
+                remaining -= page["num_tokens"] + 1
+        excerpt = "\n\n".join(p for p in parts if p)
+        # page counts are summed, so re-check the joined excerpt once
+        if self.count(excerpt) > budget:
+            excerpt = truncate_tokens(excerpt, budget, self.model)
+        return excerpt
+
+    def build(self, instructions: str, text: str, query: str = "",
+              selection: str = "relevance") -> Tuple[str, Dict[str, Any]]:
+        """
+        Returns:
+            (prompt, info) where info holds prompt_tokens, excerpt_tokens, document_tokens,
+            budget_tokens, max_tokens (clamped to the context window) and the tokenizer used.
+        """
+        records = self.pages(text)
+        excerpt = self.fit(records, query, self.available(instructions), selection)
+        prompt = instructions + excerpt
+        prompt_tokens = self.count(prompt)
+        room = context_tokens(self.model) - prompt_tokens - CHAT_OVERHEAD_TOKENS
+        return prompt, {
+            "prompt_tokens": prompt_tokens,
+            "excerpt_tokens": self.count(excerpt),
+            "document_tokens": sum(p["num_tokens"] for p in records),
+            "budget_tokens": self.budget_tokens,
+            "max_tokens": max(1, min(self.max_tokens, room)),
+            "tokenizer": tokenizer_name(self.model),
+        }
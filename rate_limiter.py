@@ -0,0 +1,383 @@
+## Importing libraries and files
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from metrics import current_trace, record_llm_call, record_span, usage_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller waited longer than the limiter's max_wait for capacity."""
+
+
+##-------------------------- Helpers --------------------------##
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size in tokens (~4 characters per token for English text)."""
+    return len(text or "") // 4 + 1
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """True for HTTP 429 errors from the openai SDK, litellm or httpx."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Server-requested delay from the Retry-After / retry-after-ms headers of a 429, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or getattr(exc, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _usage_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    if usage is None and isinstance(response, dict):
+        usage = response.get("usage")
+    if usage is None:
+        return None
+    total = usage.get("total_tokens") if isinstance(usage, dict) else getattr(usage, "total_tokens", None)
+    return int(total) if total is not None else None
+
+
+##-------------------------- Token-bucket limiter --------------------------##
+
+class RateLimiter:
+    """
+    Process-wide token-bucket limiter for LLM traffic, counting requests and tokens.
+
+    Two buckets refill continuously at `rpm`/60 requests and `tpm`/60 tokens per
+    second; a call takes one request plus its estimated tokens, and the estimate is
+    corrected with the real usage once the response arrives. Both rates are scaled
+    adaptively (AIMD): a 429 halves the scale and pauses every caller until the
+    server's Retry-After (or an exponential backoff) has passed, and each success
+    grows it back. Retries use full jitter so waiters do not stampede together.
+    A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, rpm: float = 500, tpm: float = 200_000, max_retries: int = 5,
+                 max_wait: float = 300.0, base_backoff: float = 1.0, max_backoff: float = 60.0,
+                 min_scale: float = 0.1):
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.max_retries = max(0, int(max_retries))
+        self.max_wait = float(max_wait)
+        self.base_backoff = float(base_backoff)
+        self.max_backoff = float(max_backoff)
+        self.min_scale = float(min_scale)
+
+        self._lock = threading.Lock()
+        self._requests = self.rpm
+        self._tokens = self.tpm
+        self._refilled_at = time.monotonic()
+        self._scale = 1.0
+        self._blocked_until = 0.0
+        self._waiting = 0
+        self.stats_counters = {"acquired": 0, "rate_limited": 0, "retries": 0, "wait_seconds": 0.0,
+                               "tokens_estimated": 0, "tokens_used": 0}
+
+    # -- buckets ---------------------------------------------------------------
+
+    def _refill(self, now: float) -> None:
+        # caller holds the lock
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm * self._scale / 60.0)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm * self._scale / 60.0)
+
+    def _wait_time(self, cost: int, now: float) -> float:
+        # caller holds the lock; 0.0 when the call may proceed right away
+        wait = max(0.0, self._blocked_until - now)
+        if self.rpm and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60.0 / (self.rpm * self._scale))
+        if self.tpm:
+            need = min(cost, self.tpm)  # a single oversized call must still be able to run
+            if self._tokens < need:
+                wait = max(wait, (need - self._tokens) * 60.0 / (self.tpm * self._scale))
+        return wait
+
+    def _try_take(self, cost: int) -> float:
+        """Take capacity for one call if available; otherwise return how long to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._wait_time(cost, now)
+            if wait <= 0:
+                if self.rpm:
+                    self._requests -= 1
+                if self.tpm:
+                    self._tokens -= cost
+                self.stats_counters["acquired"] += 1
+                self.stats_counters["tokens_estimated"] += cost
+            return wait
+
+    def acquire(self, cost: int = 1) -> float:
+        """
+        Block until one request of `cost` estimated tokens may be sent.
+
+        Returns:
+            float: seconds spent waiting.
+
+        Raises:
+            RateLimitTimeout: if capacity did not free up within max_wait seconds.
+        """
+        started = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                wait = self._try_take(cost)
+                if wait <= 0:
+                    break
+                if time.monotonic() - started + wait > self.max_wait:
+                    raise RateLimitTimeout(f"LLM rate limiter: no capacity within {self.max_wait:.0f}s.")
+                time.sleep(min(wait, 1.0) + random.uniform(0, 0.05))
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        waited = time.monotonic() - started
+        with self._lock:
+            self.stats_counters["wait_seconds"] += waited
+        return waited
+
+    async def aacquire(self, cost: int = 1) -> float:
+        """Asynchronous `acquire`: waits with asyncio.sleep so the event loop keeps running."""
+        started = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                wait = self._try_take(cost)
+                if wait <= 0:
+                    break
+                if time.monotonic() - started + wait > self.max_wait:
+                    raise RateLimitTimeout(f"LLM rate limiter: no capacity within {self.max_wait:.0f}s.")
+                await asyncio.sleep(min(wait, 1.0) + random.uniform(0, 0.05))
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        waited = time.monotonic() - started
+        with self._lock:
+            self.stats_counters["wait_seconds"] += waited
+        return waited
+
+    # -- feedback --------------------------------------------------------------
+
+    def record_usage(self, estimated: int, actual: Optional[int]) -> None:
+        """Correct the token bucket once the real usage of a call is known."""
+        with self._lock:
+            if actual is not None:
+                if self.tpm:
+                    self._tokens -= actual - estimated
+                self.stats_counters["tokens_used"] += actual
+            # additive increase back towards the configured limits
+            self._scale = min(1.0, self._scale + 0.02)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None, attempt: int = 0) -> float:
+        """
+        React to a 429: shrink the rates and pause every caller.
+
+        Returns:
+            float: the pause applied, in seconds.
+        """
+        backoff = random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+        delay = max(retry_after or 0.0, backoff)
+        with self._lock:
+            self._scale = max(self.min_scale, self._scale * 0.5)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            # the server said we are over quota: drain what we thought was left
+            self._requests = min(self._requests, 0.0)
+            self.stats_counters["rate_limited"] += 1
+        logger.warning("LLM rate limited (429); pausing %.1fs, rate scale now %.2f", delay, self._scale)
+        return delay
+
+    # -- call wrappers ---------------------------------------------------------
+
+    def call(self, fn: Callable[[], Any], estimated_tokens: int) -> Any:
+        """
+        Run `fn()` (one LLM request) under the limiter, retrying 429s with jittered backoff.
+
+        Non-429 exceptions propagate unchanged, as does the last 429 once
+        max_retries is exhausted.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(estimated_tokens)
+            try:
+                response = fn()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                self.on_rate_limited(retry_after_seconds(e), attempt)
+                with self._lock:
+                    self.stats_counters["retries"] += 1
+                continue
+            self.record_usage(estimated_tokens, _usage_tokens(response))
+            return response
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], estimated_tokens: int) -> Any:
+        """Asynchronous `call` for coroutine-returning `fn`."""
+        for attempt in range(self.max_retries + 1):
+            await self.aacquire(estimated_tokens)
+            try:
+                response = await fn()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                self.on_rate_limited(retry_after_seconds(e), attempt)
+                with self._lock:
+                    self.stats_counters["retries"] += 1
+                continue
+            self.record_usage(estimated_tokens, _usage_tokens(response))
+            return response
+
+    def saturation(self) -> Dict[str, Any]:
+        """Current load: bucket utilisation (0 = idle, 1 = exhausted), rate scale, pause and counters."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "rate_scale": round(self._scale, 3),
+                "request_saturation": round(1 - max(0.0, self._requests) / self.rpm, 3) if self.rpm else 0.0,
+                "token_saturation": round(1 - max(0.0, self._tokens) / self.tpm, 3) if self.tpm else 0.0,
+                "paused_for_seconds": round(max(0.0, self._blocked_until - now), 2),
+                "waiting": self._waiting,
+                **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in self.stats_counters.items()},
+            }
+
+
+##-------------------------- CrewAI (litellm) hook --------------------------##
+
+class _LiteLLMRateLimitHook:
+    """
+    litellm callback that puts CrewAI's own LLM calls under the shared limiter.
+
+    Combined with litellm's CustomLogger base in `install_litellm_hooks`, so litellm
+    is only imported when the crew is first set up, not when this module is.
+
+    The pre-call hook blocks until capacity is available, success events correct
+    the token estimate, and 429 failures trigger the adaptive backoff; litellm's
+    own retries (num_retries) then wait in the pre-call hook for the pause to end.
+    Success events also record token usage, cost and latency in the metrics, against
+    the request trace captured at pre-call time (litellm may log from another thread).
+    """
+
+    def __init__(self, limiter: RateLimiter):
+        super().__init__()
+        self.limiter = limiter
+        self._estimates: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def log_pre_api_call(self, model, messages, kwargs):
+        prompt_chars = sum(len(str(m.get("content") or "")) for m in (messages or []) if isinstance(m, dict))
+        completion = (kwargs.get("optional_params") or {}).get("max_tokens") or 500
+        cost = prompt_chars // 4 + 1 + int(completion)
+        self.limiter.acquire(cost)
+        call_id = kwargs.get("litellm_call_id")
+        if call_id:
+            with self._lock:
+                self._estimates[call_id] = (cost, current_trace())
+
+    def _pop_estimate(self, kwargs):
+        with self._lock:
+            return self._estimates.pop(kwargs.get("litellm_call_id"), (0, None))
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        cost, tr = self._pop_estimate(kwargs)
+        self.limiter.record_usage(cost, _usage_tokens(response_obj))
+        try:
+            record_span("agent", "llm", (end_time - start_time).total_seconds(), tr)
+        except Exception:
+            pass
+        record_llm_call(str(kwargs.get("model") or "unknown"), *usage_tokens(response_obj), source="agent", tr=tr)
+
+    def log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        self._pop_estimate(kwargs)
+        exc = kwargs.get("exception")
+        if exc is not None and is_rate_limit_error(exc):
+            self.limiter.on_rate_limited(retry_after_seconds(exc))
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.log_success_event(kwargs, response_obj, start_time, end_time)
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        self.log_failure_event(kwargs, response_obj, start_time, end_time)
+
+
+_litellm_hook: Optional[_LiteLLMRateLimitHook] = None
+
+
+def install_litellm_hooks() -> bool:
+    """
+    Register the limiter with litellm, which CrewAI uses for every agent LLM call.
+
+    Uses the input/success/failure callback lists (CrewAI replaces `litellm.callbacks`
+    on each call) and sets litellm.num_retries so 429s are retried through the limiter.
+    Idempotent. Returns False when litellm is not installed.
+    """
+    global _litellm_hook
+    try:
+        import litellm
+        from litellm.integrations.custom_logger import CustomLogger
+    except Exception:
+        return False
+    limiter = get_rate_limiter()
+    with _default_lock:
+        if _litellm_hook is None:
+            hook_class = type("LiteLLMRateLimitHook", (_LiteLLMRateLimitHook, CustomLogger), {})
+            _litellm_hook = hook_class(limiter)
+            litellm.input_callback.append(_litellm_hook)
+            litellm.success_callback.append(_litellm_hook)
+            litellm.failure_callback.append(_litellm_hook)
+            litellm.num_retries = limiter.max_retries
+    return True
+
+
+_default_limiter: Optional[RateLimiter] = None
+_default_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Return the process-wide LLM rate limiter.
+
+    Configured through the environment:
+        LLM_RATE_LIMIT_RPM (float): requests per minute (default 500; 0 disables).
+        LLM_RATE_LIMIT_TPM (float): tokens per minute (default 200000; 0 disables).
+        LLM_RATE_LIMIT_MAX_RETRIES (int): retries after a 429 (default 5).
+        LLM_RATE_LIMIT_MAX_WAIT (float): longest wait for capacity, in seconds (default 300).
+    """
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter(
+                rpm=float(os.getenv("LLM_RATE_LIMIT_RPM", "500")),
+                tpm=float(os.getenv("LLM_RATE_LIMIT_TPM", "200000")),
+                max_retries=int(os.getenv("LLM_RATE_LIMIT_MAX_RETRIES", "5")),
+                max_wait=float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", "300")),
+            )
+        return _default_limiter
@@ -0,0 +1,150 @@
+## Importing libraries and files
+import re
+import math
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from mapreduce import split_pages
+
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9&\-]*[a-z0-9]|[a-z]")
+
+# Terms that mark the pages worth sending to a financial analysis prompt (weight per term).
+# Negative weights push boilerplate (disclaimers, tables of contents) down the ranking.
+FINANCIAL_LEXICON: Dict[str, float] = {
+    "revenue": 1.0, "revenues": 1.0, "sales": 0.6, "income": 0.8, "net": 0.3, "earnings": 0.8,
+    "ebitda": 0.8, "eps": 0.8, "margin": 0.8, "margins": 0.8, "gross": 0.5, "operating": 0.5,
+    "profit": 0.7, "loss": 0.5, "cash": 0.7, "flow": 0.4, "assets": 0.8, "liabilities": 0.8,
+    "equity": 0.7, "debt": 0.7, "balance": 0.5, "sheet": 0.3, "liquidity": 0.6, "capex": 0.6,
+    "guidance": 0.6, "outlook": 0.5, "growth": 0.4, "yoy": 0.4, "quarter": 0.3, "segment": 0.4,
+    "risk": 0.5, "risks": 0.5, "impairment": 0.5, "dividend": 0.4, "shares": 0.3,
+    "forward-looking": -1.0, "safe": -0.3, "harbor": -0.6, "contents": -0.8, "disclaimer": -1.0,
+    "trademarks": -0.6, "webcast": -0.6,
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+##-------------------------- BM25 page index --------------------------##
+
+class PageIndex:
+    """
+    In-process BM25 index over per-page records (read_data_tool `as_pages=True` output).
+
+    Postings are stored per term as (page positions, term frequencies) so scoring a
+    query is a handful of vectorized NumPy operations per query term. Falls back to
+    plain Python when NumPy is not installed.
+    """
+
+    def __init__(self, pages: List[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        self.pages = pages
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(pages)
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = []
+        for pos, page in enumerate(pages):
+            counts = Counter(tokenize(page.get("text", "")))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                docs, tfs = postings.setdefault(term, ([], []))
+                docs.append(pos)
+                tfs.append(tf)
+
+        avgdl = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self._norm = [k1 * (1 - b + b * (dl / avgdl if avgdl else 0.0)) for dl in lengths]
+        self._idf = {term: math.log(1 + (self.num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                     for term, (docs, _) in postings.items()}
+        if np is not None:
+            self._norm_arr = np.asarray(self._norm, dtype=np.float64)
+            self._postings = {term: (np.asarray(docs, dtype=np.int64), np.asarray(tfs, dtype=np.float64))
+                              for term, (docs, tfs) in postings.items()}
+        else:
+            self._postings = postings
+
+    def score(self, weighted_terms: Dict[str, float]) -> List[float]:
+        """BM25 score of every page for a {term: weight} query."""
+        if np is not None:
+            scores = np.zeros(self.num_docs, dtype=np.float64)
+            for term, weight in weighted_terms.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    continue
+                docs, tfs = posting
+                scores[docs] += weight * self._idf[term] * tfs * (self.k1 + 1) / (tfs + self._norm_arr[docs])
+            return scores.tolist()
+
+        scores = [0.0] * self.num_docs
+        for term, weight in weighted_terms.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            idf = self._idf[term]
+            for doc, tf in zip(*posting):
+                scores[doc] += weight * idf * tf * (self.k1 + 1) / (tf + self._norm[doc])
+        return scores
+
+
+def query_terms(query: str, lexicon: Optional[Dict[str, float]] = None, lexicon_weight: float = 0.5) -> Dict[str, float]:
+    """Combine the user's query terms (weight 1.0 each) with the scaled financial lexicon."""
+    terms: Dict[str, float] = {}
+    for term, weight in (FINANCIAL_LEXICON if lexicon is None else lexicon).items():
+        terms[term] = weight * lexicon_weight
+    for term in tokenize(query or ""):
+        if len(term) > 2:
+            terms[term] = terms.get(term, 0.0) + 1.0
+    return terms
+
+
+##-------------------------- Excerpt selection --------------------------##
+
+def select_pages(pages: List[Dict[str, Any]], query: str, budget: int, size_key: str = "num_chars",
+                 separator: int = 2, truncate: Optional[Callable[[str, int], str]] = None) -> List[Dict[str, Any]]:
+    """
+    Pick the highest-scoring pages that fit in `budget`, returned in page order.
+
+    Page sizes are read from `size_key` (characters by default; e.g. "num_tokens" for a
+    token budget) and every page costs `separator` more for the join. If not even the
+    best page fits, its text is cut to the budget with `truncate(text, budget)`
+    (default: the first `budget` characters).
+    """
+    if not pages:
+        return []
+    index = PageIndex(pages)
+    scores = index.score(query_terms(query))
+    ranked = sorted(range(len(pages)), key=lambda k: (-scores[k], k))
+
+    chosen: List[int] = []
+    remaining = budget
+    for k in ranked:
+        size = pages[k][size_key] + separator
+        if size <= remaining:
+            chosen.append(k)
+            remaining -= size
+    if not chosen:
+        best = dict(pages[ranked[0]])
+        best["text"] = truncate(best["text"], budget) if truncate is not None else best["text"][:budget]
+        best["num_chars"] = len(best["text"])
+        return [best]
+    return [pages[k] for k in sorted(chosen)]
+
+
+def select_excerpt(text: str, query: str, budget: int) -> str:
+    """
+    Return up to `budget` characters of read_data_tool output, chosen by relevance.
+
+    Text that already fits is returned unchanged. Otherwise each page is scored
+    against the query plus the financial lexicon, and the best pages are joined
+    back in document order (with their PAGE markers).
+    """
+    if len(text) <= budget:
+        return text
+    records = [{"page_number": label, "text": page, "num_chars": len(page)} for label, page in split_pages(text)]
+    return "\n\n".join(p["text"] for p in select_pages(records, query, budget))
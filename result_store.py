@@ -0,0 +1,224 @@
+## Importing libraries and files
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of an analysis question used in the result key.
+
+    Only case, Unicode form, runs of whitespace and trailing punctuation are
+    ignored; every word is kept, because unlike in a search lookup even filler
+    words can change what the analysis should answer.
+    """
+    text = unicodedata.normalize("NFKC", query or "").casefold()
+    return _SPACE_RE.sub(" ", text).strip().rstrip("?.!").strip()
+
+
+def fingerprint(*parts: Any) -> str:
+    """Short stable hash of the model names and prompts a result depends on."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+##-------------------------- Analysis Result Store --------------------------##
+
+class ResultStore:
+    """
+    SQLite index of finished analyses with zlib-compressed result blobs.
+
+    A result is keyed by (document content SHA-256, normalized query, model,
+    pipeline version), so the same filing asked the same question under the same
+    prompts is answered from disk instead of re-running the crew. Any change of
+    model or prompts changes the version and therefore misses. Entries expire
+    after `ttl_seconds`; beyond `max_entries` rows the least recently used are
+    evicted. The file is shared by every worker process on the host.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 30 * 24 * 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_results ("
+            " key TEXT PRIMARY KEY,"
+            " doc_digest TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " query_norm TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " filename TEXT,"
+            " result BLOB NOT NULL,"
+            " stored_bytes INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_results_doc ON analysis_results(doc_digest)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_results_accessed ON analysis_results(accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_results_created ON analysis_results(created_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(doc_digest: str, query: str, model: str, version: str) -> str:
+        raw = "\0".join((doc_digest, normalize_query(query), model, version))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def lookup(self, doc_digest: str, query: str, model: str, version: str) -> Optional[Dict[str, Any]]:
+        """Return the stored entry (see `get`) for this document and question, or None."""
+        entry = self.get(self.make_key(doc_digest, query, model, version))
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return metadata plus the decompressed `result` of one entry, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, doc_digest, query, model, version, filename, stored_bytes, created_at, accessed_at,"
+                " hits, result FROM analysis_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[7] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM analysis_results WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE analysis_results SET accessed_at = ?, hits = hits + 1 WHERE key = ?",
+                               (now, key))
+            self._conn.commit()
+        entry = self._metadata(row[:10])
+        try:
+            entry["result"] = json.loads(zlib.decompress(row[10]).decode("utf-8"))
+        except (zlib.error, ValueError) as e:
+            logger.warning("Dropping unreadable stored result %s: %s", key, e)
+            self.delete(key)
+            return None
+        return entry
+
+    def put(self, doc_digest: str, query: str, model: str, version: str, result: Dict[str, Any],
+            filename: Optional[str] = None) -> str:
+        """Store `result` (any JSON-serializable dict), evict expired / least recently used rows; returns the key."""
+        key = self.make_key(doc_digest, query, model, version)
+        blob = zlib.compress(json.dumps(result, ensure_ascii=False, default=str).encode("utf-8"), 6)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_results (key, doc_digest, query, query_norm, model, version,"
+                " filename, result, stored_bytes, created_at, accessed_at, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, doc_digest, query, normalize_query(query), model, version, filename, blob, len(blob), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+        return key
+
+    def list(self, limit: int = 50, offset: int = 0, doc_digest: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Metadata of stored results, most recent first (result bodies are not loaded)."""
+        sql = ("SELECT key, doc_digest, query, model, version, filename, stored_bytes, created_at, accessed_at, hits"
+               " FROM analysis_results WHERE created_at >= ?")
+        args: List[Any] = [time.time() - self.ttl_seconds]
+        if doc_digest:
+            sql += " AND doc_digest = ?"
+            args.append(doc_digest)
+        sql += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        args += [max(0, int(limit)), max(0, int(offset))]
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [self._metadata(row) for row in rows]
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM analysis_results WHERE key = ?", (key,))
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    def evict(self) -> None:
+        """Apply the retention policy now (also done on every put)."""
+        with self._lock:
+            self._evict(time.time())
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        # caller holds the lock
+        self._conn.execute("DELETE FROM analysis_results WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM analysis_results").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM analysis_results WHERE key IN ("
+                " SELECT key FROM analysis_results ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    @staticmethod
+    def _metadata(row) -> Dict[str, Any]:
+        keys = ("result_id", "doc_digest", "query", "model", "version", "filename", "stored_bytes",
+                "created_at", "accessed_at", "hits")
+        return dict(zip(keys, row))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(stored_bytes), 0) FROM analysis_results").fetchone()
+            return {"entries": count, "stored_bytes": size, "hits": self.hits, "misses": self.misses}
+
+
+_default_store: Optional[ResultStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_result_store() -> Optional[ResultStore]:
+    """
+    Return the process-wide result store, or None if disabled.
+
+    Configured through the environment:
+        RESULT_STORE_PATH (str): SQLite file (default '.cache/results.sqlite3').
+                                 Set to an empty string to disable storing and replay.
+        RESULT_STORE_TTL (float): seconds a result stays valid (default 30 days).
+        RESULT_STORE_MAX_ENTRIES (int): results kept before LRU eviction (default 10000).
+    """
+    global _default_store
+    path = os.getenv("RESULT_STORE_PATH", os.path.join(".cache", "results.sqlite3"))
+    if not path:
+        return None
+    with _default_store_lock:
+        if _default_store is None:
+            try:
+                _default_store = ResultStore(
+                    path,
+                    ttl_seconds=float(os.getenv("RESULT_STORE_TTL", str(30 * 24 * 3600))),
+                    max_entries=int(os.getenv("RESULT_STORE_MAX_ENTRIES", "10000")),
+                )
+            except sqlite3.Error as e:
+                logger.warning("Result store disabled, could not open %s: %s", path, e)
+                return None
+        return _default_store
@@ -0,0 +1,231 @@
+## Importing libraries and files
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_QUERY_TOKEN_RE = re.compile(r"[a-z0-9$&][a-z0-9$&.\-]*")
+
+# words that do not change what a market-context lookup returns
+_FILLER_WORDS = frozenset({
+    "a", "an", "the", "of", "for", "on", "in", "and", "about", "to", "with", "what", "is", "are",
+    "latest", "recent", "current", "please", "find", "search", "show", "me",
+})
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a search query used as the cache key.
+
+    Case, Unicode form, punctuation and filler words are ignored, so "Latest Tesla
+    Q2 2025 news?" and "tesla q2 2025 news" share one entry. Word order and
+    repeated words are kept: they can change what the search returns.
+    """
+    text = unicodedata.normalize("NFKC", query or "").lower()
+    tokens = (t.strip(".-") for t in _QUERY_TOKEN_RE.findall(text))
+    return " ".join(t for t in tokens if t and t not in _FILLER_WORDS)
+
+
+##-------------------------- Search backends --------------------------##
+
+def serper_backend(base_url: Optional[str] = None) -> Callable[[str], str]:
+    """
+    Backend calling the Serper API through crewai_tools' SerperDevTool (created on first use).
+
+    With `base_url` the Serper-compatible endpoint at `{base_url}/search` is called
+    directly instead (used by the offline benchmark's Serper stub).
+    """
+    if base_url:
+        return _serper_http_backend(base_url)
+    state: Dict[str, Any] = {}
+    lock = threading.Lock()
+
+    def search(query: str) -> str:
+        with lock:
+            if "tool" not in state:
+                from crewai_tools import SerperDevTool
+                state["tool"] = SerperDevTool()
+        result = state["tool"].run(search_query=query)
+        return result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str)
+
+    return search
+
+
+def _serper_http_backend(base_url: str, timeout: float = 30.0) -> Callable[[str], str]:
+    client = httpx.Client(base_url=base_url.rstrip("/"), timeout=timeout)
+
+    def search(query: str) -> str:
+        resp = client.post("/search", json={"q": query},
+                           headers={"X-API-KEY": os.getenv("SERPER_API_KEY", "")})
+        resp.raise_for_status()
+        return resp.text
+
+    return search
+
+
+def stub_backend(latency: float = 0.0) -> Callable[[str], str]:
+    """
+    Offline backend returning deterministic, Serper-shaped results for any query.
+
+    Used for tests and benchmarks (SEARCH_BACKEND=stub); `latency` simulates the
+    round-trip of the real API.
+    """
+    def search(query: str) -> str:
+        if latency:
+            time.sleep(latency)
+        seed = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()[:8]
+        organic = [
+            {
+                "title": f"{query} - market update {k + 1}",
+                "link": f"https://example.com/{seed}/{k + 1}",
+                "snippet": f"Offline stub result {k + 1} for '{query}'.",
+                "position": k + 1,
+            }
+            for k in range(3)
+        ]
+        return json.dumps({"searchParameters": {"q": query, "engine": "stub"}, "organic": organic})
+
+    return search
+
+
+##-------------------------- Cached, single-flight search --------------------------##
+
+class _Flight:
+    """One in-progress backend call that concurrent identical queries wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class SearchCache:
+    """
+    TTL + LRU cache in front of a search backend, with single-flight de-duplication.
+
+    Queries are keyed by `normalize_query`. A hit costs nothing; on a miss the first
+    caller runs the backend while concurrent callers with the same normalized query
+    wait for that one result instead of issuing their own request. Failures are
+    shared with the waiters but never cached.
+    """
+
+    def __init__(self, backend: Callable[[str], str], ttl_seconds: float = 3600, max_entries: int = 1024,
+                 wait_timeout: float = 60.0):
+        self.backend = backend
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self.wait_timeout = float(wait_timeout)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _lookup(self, key: str) -> Optional[str]:
+        # caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.time() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def search(self, query: str) -> str:
+        """
+        Return search results for `query`, from the cache when possible.
+
+        Raises:
+            Whatever the backend raised (also re-raised in callers that waited on it),
+            or TimeoutError if a coalesced call took longer than wait_timeout.
+        """
+        key = normalize_query(query) or query.strip().lower()
+        with self._lock:
+            cached = self._lookup(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                raise TimeoutError(f"Search for {query!r} did not finish within {self.wait_timeout:.0f}s.")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self.backend(query)
+            with self._lock:
+                self._entries[key] = (time.time(), flight.result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "coalesced": self.coalesced, "in_flight": len(self._inflight)}
+
+
+_default_cache: Optional[SearchCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """
+    Return the process-wide search cache.
+
+    Configured through the environment:
+        SEARCH_BACKEND (str): 'serper' (default) or 'stub' for offline runs.
+        SEARCH_STUB_LATENCY (float): simulated latency of the stub backend in seconds (default 0).
+        SERPER_BASE_URL (str): Serper-compatible endpoint to call instead of the public API.
+        SEARCH_CACHE_TTL (float): seconds a result stays valid (default 3600).
+        SEARCH_CACHE_MAX_ENTRIES (int): results kept before LRU eviction (default 1024).
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            kind = os.getenv("SEARCH_BACKEND", "serper").strip().lower()
+            if kind == "stub":
+                backend = stub_backend(float(os.getenv("SEARCH_STUB_LATENCY", "0")))
+            else:
+                backend = serper_backend(os.getenv("SERPER_BASE_URL") or None)
+            _default_cache = SearchCache(
+                backend,
+                ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+                max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024")),
+            )
+        return _default_cache
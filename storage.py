@@ -0,0 +1,166 @@
+## Importing libraries and files
+import os
+import time
+import uuid
+import asyncio
+import logging
+import zipfile
+from typing import List, Optional, Tuple
+
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join("data", "uploads"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "50"))
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size cap."""
+
+
+##-------------------------- Per-request upload storage --------------------------##
+
+async def save_upload(
+    upload: UploadFile,
+    dest_dir: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> str:
+    """
+    Stream an uploaded file to a uniquely named file on disk.
+
+    The upload is copied in `chunk_size` pieces, so memory stays bounded by the
+    chunk size rather than the file size, and every request gets its own file.
+    A partially written file is removed if anything goes wrong.
+
+    Args:
+        upload (UploadFile): the incoming FastAPI upload.
+        dest_dir (str, optional): target directory (default: UPLOAD_DIR).
+        max_bytes (int, optional): size cap (default: UPLOAD_MAX_BYTES).
+        chunk_size (int, optional): bytes per read/write (default: UPLOAD_CHUNK_SIZE).
+
+    Returns:
+        str: path of the stored file.
+
+    Raises:
+        UploadTooLarge: if the upload is bigger than `max_bytes`.
+    """
+    dest_dir = dest_dir or UPLOAD_DIR
+    max_bytes = UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+
+    os.makedirs(dest_dir, exist_ok=True)
+    file_path = os.path.join(dest_dir, f"financial_document_{uuid.uuid4().hex}.pdf")
+
+    written = 0
+    try:
+        # "xb": never silently reuse an existing file
+        with open(file_path, "xb") as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit.")
+                # disk writes happen off the event loop
+                await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        remove_upload(file_path)
+        raise
+
+    return file_path
+
+
+def extract_zip_pdfs(
+    zip_path: str,
+    dest_dir: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    max_files: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Unpack the PDF members of a zip archive into individually stored uploads.
+
+    Members are streamed to disk in `chunk_size` pieces and the size cap is enforced
+    on the bytes actually written (not the sizes claimed by the archive), so a
+    zip bomb cannot exhaust disk or memory. Non-PDF members are skipped.
+
+    Returns:
+        List of (member name, stored path).
+
+    Raises:
+        ValueError: if the archive is invalid or holds more than `max_files` PDFs.
+        UploadTooLarge: if a member is bigger than `max_bytes`.
+    """
+    dest_dir = dest_dir or UPLOAD_DIR
+    max_bytes = UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    max_files = BATCH_MAX_DOCUMENTS if max_files is None else max_files
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+
+    os.makedirs(dest_dir, exist_ok=True)
+    stored: List[Tuple[str, str]] = []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            members = [m for m in archive.infolist()
+                       if not m.is_dir() and m.filename.lower().endswith(".pdf")
+                       and not os.path.basename(m.filename).startswith(("._", "."))]
+            if len(members) > max_files:
+                raise ValueError(f"Archive holds {len(members)} PDFs; the limit is {max_files}.")
+            for member in members:
+                file_path = os.path.join(dest_dir, f"financial_document_{uuid.uuid4().hex}.pdf")
+                stored.append((os.path.basename(member.filename), file_path))
+                written = 0
+                with archive.open(member) as src, open(file_path, "xb") as f:
+                    for chunk in iter(lambda: src.read(chunk_size), b""):
+                        written += len(chunk)
+                        if written > max_bytes:
+                            raise UploadTooLarge(f"{member.filename} exceeds the {max_bytes} byte limit.")
+                        f.write(chunk)
+    except zipfile.BadZipFile as e:
+        for _, path in stored:
+            remove_upload(path)
+        raise ValueError(f"Invalid zip archive: {e}")
+    except BaseException:
+        for _, path in stored:
+            remove_upload(path)
+        raise
+    return stored
+
+
+def remove_upload(file_path: Optional[str]) -> None:
+    """Delete a stored upload, ignoring files that are already gone."""
+    if not file_path:
+        return
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Could not remove upload %s: %s", file_path, e)
+
+
+def sweep_stale_uploads(max_age_seconds: int = 24 * 3600, dest_dir: Optional[str] = None) -> int:
+    """
+    Remove uploads older than `max_age_seconds` (left behind by a crashed worker).
+
+    Returns:
+        int: number of files removed.
+    """
+    dest_dir = dest_dir or UPLOAD_DIR
+    if not os.path.isdir(dest_dir):
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for name in os.listdir(dest_dir):
+        path = os.path.join(dest_dir, name)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
@@ -1,22 +1,24 @@
 ## Importing libraries and files
-from crewai import Task
+import threading
+from typing import Any, Dict, List
 
-from agents import financial_analyst, verifier, investment_advisor, risk_assessor
-from tools import search_tool, risk_assessment_tool, read_data_tool, analyze_investment_tool
+from agents import get_agent
+from tools import get_tool
 
-# prepare normalized tools
-tool_read = read_data_tool
-tool_invest = analyze_investment_tool
-tool_risk = risk_assessment_tool
-tool_search = search_tool
+# Tasks are declared as plain data (agent and tools by name) and only turned into
+# crewai Task objects by get_task; keys are the module-level names used elsewhere.
+TASK_SPECS: Dict[str, Dict[str, Any]] = {}
 
 # Creating a task to analyze a financial document
-analyze_financial_document = Task(
+TASK_SPECS["analyze_financial_document"] = dict(
+    name="financial_analysis",
     description=(
         "Analyze the provided financial document and respond to the user's query: {query}. "
         "Use the financial report as the primary source, supported by additional context if needed. "
         "Identify key financial metrics, summarize overall performance, and highlight significant "
-        "trends or anomalies. Provide investment-relevant insights that directly address the user's request."
+        "trends or anomalies. Provide investment-relevant insights that directly address the user's request. "
+        "The document has already been extracted for this request: pass the document handle {document_handle} "
+        "as financial_document_data (and as path for the Key Figures Tool) instead of the document text."
     ),
     expected_output=(
         "A clear, structured analysis of the financial document that includes:\n"
@@ -26,18 +28,21 @@ analyze_financial_document = Task(
         "- Investment implications (if applicable)\n"
         "Output should be concise, professional, and fact-based."
     ),
-    agent=financial_analyst,
-    tools=[tool_read, tool_invest, tool_risk, tool_search],
+    agent="financial_analyst",
+    tools=["analyze_investment_tool", "risk_assessment_tool", "search_tool", "key_figures_tool"],
     async_execution=False,
 )
 
 # Creating an investment analysis task
-investment_analysis = Task(
+TASK_SPECS["investment_analysis"] = dict(
+    name="investment_analysis",
     description=(
         "Using the financial document data, provide an investment analysis in response to the user's query: {query}. "
         "Focus on key performance indicators such as revenue, profit margins, cash flow, and growth outlook. "
         "Combine insights from the document with relevant market or industry trends to make a recommendation. "
-        "Highlight both opportunities and risks, and ensure that the analysis is evidence-based."
+        "Highlight both opportunities and risks, and ensure that the analysis is evidence-based. "
+        "The document has already been extracted for this request: pass the document handle {document_handle} "
+        "as financial_document_data (and as path for the Key Figures Tool) instead of the document text."
     ),
     expected_output=(
         "A professional investment analysis that includes:\n"
@@ -47,23 +52,26 @@ investment_analysis = Task(
         "- A clear investment recommendation (Buy / Hold / Sell) with rationale\n"
         "- A confidence score (0.0 - 1.0) indicating certainty of the recommendation"
     ),
-    agent=investment_advisor,
+    agent="investment_advisor",
     tools=[
-        tool_read,
-        tool_invest,
-        tool_risk,
-        tool_search
+        "analyze_investment_tool",
+        "risk_assessment_tool",
+        "search_tool",
+        "key_figures_tool"
     ],
     async_execution=False,
 )
 
 # Creating a risk assessment task
-risk_assessment = Task(
+TASK_SPECS["risk_assessment"] = dict(
+    name="risk_assessment",
     description=(
         "Perform a comprehensive risk assessment based on the financial document in response to the user's query: {query}. "
         "Identify financial, operational, regulatory, and market risks. "
         "Estimate likelihood and potential impact, explain key risk drivers, and suggest practical mitigations. "
-        "Incorporate external context if relevant (e.g., regulatory changes, supply chain news)."
+        "Incorporate external context if relevant (e.g., regulatory changes, supply chain news). "
+        "The document has already been extracted for this request: pass the document handle {document_handle} "
+        "as financial_document_data instead of the document text."
     ),
     expected_output=(
         "A structured risk assessment that includes:\n"
@@ -75,22 +83,24 @@ risk_assessment = Task(
         "- Monitoring indicators or KPIs to track risks\n"
         "- Confidence score (0.0–1.0) representing certainty of the analysis"
     ),
-    agent=risk_assessor,
+    agent="risk_assessor",
     tools=[
-        tool_read,
-        tool_risk,
-        tool_invest
+        "risk_assessment_tool",
+        "analyze_investment_tool"
     ],
     async_execution=False,
 )
 
 # Creating a verification task
-verification = Task(
+TASK_SPECS["verification"] = dict(
+    name="verification",
     description=(
         "Verify whether the uploaded document is a valid financial document relevant to analysis. "
         "Check if it contains financial information such as revenue, net income, balance sheets, "
         "or other corporate financial data. If the document is unrelated (e.g., personal notes, grocery list), "
-        "clearly state that it is not a financial report."
+        "clearly state that it is not a financial report. "
+        "Read the document with the Read Financial Document tool using path {document_handle}; "
+        "the first pages (max_chars around 6000) are usually enough to decide."
     ),
     expected_output=(
         "A professional verification result that includes:\n"
@@ -99,7 +109,64 @@ verification = Task(
         "- If No: a short explanation of why it is not suitable for financial analysis\n"
         "- Optional: confidence score (0.0–1.0)"
     ),
-    agent=verifier,
-    tools=[tool_read],
+    agent="verifier",
+    tools=["read_data_tool"],
     async_execution=False
 )
+
+# Creating a synthesis task (final step of the parallel pipeline; context is wired by pipeline.py)
+TASK_SPECS["synthesis"] = dict(
+    name="synthesis",
+    description=(
+        "Combine the verification result, financial analysis, investment analysis and risk assessment "
+        "provided as context into one final report answering the user's query: {query}. "
+        "Resolve contradictions between the sections, remove repetition, and keep every figure "
+        "exactly as reported by the analysts."
+    ),
+    expected_output=(
+        "A single cohesive plain-text report that includes:\n"
+        "- Document verification outcome\n"
+        "- Summary of key financial metrics and performance\n"
+        "- Investment analysis with a clear Buy / Hold / Sell recommendation and rationale\n"
+        "- Top risks with likelihood & impact and recommended mitigations\n"
+        "- Overall confidence score (0.0 - 1.0)"
+    ),
+    agent="report_writer",
+    async_execution=False,
+)
+
+
+##-------------------------- Lazy factories --------------------------##
+
+_tasks: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def get_task(name: str) -> Any:
+    """
+    Return the crewai Task for `name` (a TASK_SPECS key), building it and its agent on first use.
+
+    Raises:
+        KeyError: for an unknown task name
+    """
+    spec = TASK_SPECS[name]
+    with _lock:
+        task = _tasks.get(name)
+        if task is None:
+            from crewai import Task
+            kwargs = {**spec, "agent": get_agent(spec["agent"])}
+            if "tools" in spec:
+                kwargs["tools"] = [get_tool(t) for t in spec["tools"]]
+            task = _tasks[name] = Task(**kwargs)
+        return task
+
+
+def get_tasks(names: List[str]) -> List[Any]:
+    return [get_task(n) for n in names]
+
+
+def __getattr__(name: str) -> Any:
+    # `from task import verification` keeps working, built on first access
+    if name in TASK_SPECS:
+        return get_task(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,52 +3,55 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
-import warnings
-warnings.filterwarnings("ignore", message="Cannot set gray non-stroke color*")
-
 import httpx
-# from crewai_tools import tools as crewai_tools
-from crewai.tools import tool
-from crewai_tools import SerperDevTool
 
 import re
 import logging
-from openai import OpenAI
 import asyncio
 import json
-from typing import Optional, Any, List, Dict
+import threading
+from typing import Optional, Any, List, Dict, Tuple
 
-## Creating search tool
-search_tool = SerperDevTool()
 
 ##-------------------------- Creating Financial Document Tool --------------------------##
 
-# Try pdfplumber -> fallback to pypdf
-try:
-    import pdfplumber
-except Exception:
-    pdfplumber = None
-
-try:
-    from pypdf import PdfReader
-except Exception:
-    PdfReader = None
+from pdf_reader import read_pages
+from text_normalize import clean_whitespace, normalize_excerpt
+from llm_cache import get_llm_cache
+from llm_client import get_async_openai_client, get_openai_client
+from rate_limiter import get_rate_limiter
+from search_cache import get_search_cache
+from metrics import record_llm_call, span, timed, usage_tokens
+from mapreduce import map_reduce
+from prompt_budget import PromptBuilder, get_token_cache
+from figures import extract_key_figures, format_key_figures
+from doc_context import get_context_store, is_handle, join_pages, resolve_document
 
 logger = logging.getLogger(__name__)
 
 
-def _clean_whitespace(text: str) -> str:
-    """Normalize whitespace and remove repeated blank lines."""
-    if text is None:
-        return ""
-    # normalize different newlines + remove extra spaces
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    # collapse multiple newlines to at most two
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    # collapse multiple spaces
-    text = re.sub(r"[ \t]{2,}", " ", text)
-    # strip leading/trailing whitespace
-    return text.strip()
+##-------------------------- Creating search tool --------------------------##
+
+@timed("search_tool")
+def search_web(search_query: str) -> str:
+    """
+    Search the web (Serper) for recent news and market context about a company, ticker or topic.
+
+    Results are cached: repeated or near-identical queries (same words in the same order,
+    any case or punctuation) are answered instantly, and identical queries running at the same time share one request.
+
+    Args:
+        search_query (str): what to search for, e.g. "Tesla Q2 2025 deliveries".
+
+    Returns:
+        str: search results (JSON), or an error string beginning with "ERROR:".
+    """
+    if not isinstance(search_query, str) or not search_query.strip():
+        return "ERROR: search_query must be a non-empty string."
+    try:
+        return get_search_cache().search(search_query)
+    except Exception as e:
+        return f"ERROR: search failed: {e}"
 
 
 # class FinancialDocumentTool:
@@ -59,15 +62,21 @@ By default this returns a single string made by concatenating page texts.
 Optionally you can request a list of per-page objects by setting `as_pages=True`.
 """
 
-@tool("Read Financial Document")
-def read_data_tool(path: str = "data\TSLA-Q2-2025-Update.pdf", as_pages: bool = False) -> Any:
+@timed("read_data_tool")
+def read_data(path: str = "data\TSLA-Q2-2025-Update.pdf", as_pages: bool = False,
+                   pages: Optional[str] = None, max_chars: Optional[int] = None) -> Any:
     """
     Read plain text from a PDF at `path`.
 
     Args:
-        path (str): Local path to the PDF file (default: 'data\TSLA-Q2-2025-Update.pdf').
+        path (str): Local path to the PDF file (default: 'data\TSLA-Q2-2025-Update.pdf'),
+                            or a document handle ('doc-...') of a document already
+                            extracted for this request.
         as_pages (bool): If True, return a list of per-page dictionaries.
                             If False (default), return a single concatenated string.
+        pages (str, optional): 1-based pages to read, e.g. "1-5,8". Default: all pages.
+        max_chars (int, optional): Stop reading once this many characters of page text
+                            have been collected (at least 1). Default: no limit.
 
     Returns:
         str or List[dict]: If as_pages is False -> a single string containing the whole document
@@ -79,58 +88,29 @@ def read_data_tool(path: str = "data\TSLA-Q2-2025-Update.pdf", as_pages: bool =
                                 ]
     Raises:
         FileNotFoundError: if path does not exist
+        ValueError: if max_chars is below 1
         RuntimeError: if no supported PDF backend is installed / parsing fails
     """
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"PDF not found at path: {path}")
-
-    pages_out: List[Dict[str, Any]] = []
-
-    # Primary: pdfplumber (better for layout + tables)
-    if pdfplumber is not None:
-        try:
-            with pdfplumber.open(path) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    raw = page.extract_text() or ""
-                    text = _clean_whitespace(raw)
-                    pages_out.append(
-                        {"page_number": i + 1, "text": text, "num_chars": len(text)}
-                    )
-        except Exception as e:
-            logger.warning("pdfplumber parsing failed (%s), will try pypdf fallback: %s", type(e), e)
-            pages_out = []
-
-    # Fallback: pypdf (useful when pdfplumber not installed or fails)
-    if not pages_out and PdfReader is not None:
-        try:
-            reader = PdfReader(path)
-            for i, page in enumerate(reader.pages):
-                try:
-                    raw = page.extract_text() or ""
-                except Exception:
-                    raw = ""
-                text = _clean_whitespace(raw)
-                pages_out.append(
-                    {"page_number": i + 1, "text": text, "num_chars": len(text)}
-                )
-        except Exception as e:
-            logger.error("pypdf parsing also failed: %s", e)
-            raise RuntimeError(f"Failed to parse PDF with pdfplumber and pypdf: {e}")
+    if is_handle(path):
+        ctx = get_context_store().get(path)
+        if ctx is None:
+            raise FileNotFoundError(f"Unknown or expired document handle: {path}")
+        pages_out = ctx.select(pages=pages, max_chars=max_chars)
+    else:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"PDF not found at path: {path}")
+
+        # Served from the parsed-document cache when possible; partial reads stop parsing early
+        pages_out = list(read_pages(path, pages=pages, max_chars=max_chars))
 
     if not pages_out:
-        # No parser available / no pages extracted
-        raise RuntimeError("No PDF parser available or PDF parsing produced no text. "
-                            "Install pdfplumber or pypdf and retry.")
+        raise RuntimeError("PDF parsing produced no pages.")
 
     if as_pages:
         return pages_out
 
     # Default: return a single concatenated string with page separators
-    parts: List[str] = []
-    for p in pages_out:
-        parts.append(f"--- PAGE {p['page_number']} ---\n{p['text']}")
-    full_report = "\n\n".join(parts)
-    return full_report
+    return join_pages(pages_out)
     
 
 ##-------------------------- Creating Investment Analysis Tool --------------------------##
@@ -198,57 +178,207 @@ def _extract_assistant_content_from_response(resp) -> str:
 def _call_openai_chat_plain(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 1000) -> str:
     """
     Synchronous OpenAI call returning assistant content as a plain string.
-    This version assumes the response shape where the first choice exposes:
-      resp.choices[0].message.content
-    or (fallback) resp.choices[0].text / resp.choices[0].content.
+
+    Calls run at temperature=0.0, so an identical (model, max_tokens, prompt)
+    is served from the persistent LLM response cache instead of the API.
+    Error strings are never cached.
     Returns "ERROR: ..." on failure.
     """
-    if OpenAI is None:
-        return "ERROR: openai package (>=1.0.0) not installed."
+    cache, cached = _cached_reply(prompt, model, max_tokens)
+    if cached is not None:
+        return cached
+    text = _request_openai_chat_plain(prompt, model=model, max_tokens=max_tokens)
+    _store_reply(cache, prompt, model, max_tokens, text)
+    return text
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return "ERROR: OPENAI_API_KEY not set in environment."
 
+def _request_openai_chat_plain(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 1000) -> str:
+    """
+    Uncached synchronous OpenAI call returning assistant content as a plain string.
+    Uses the process-wide pooled client, so connections are kept alive between calls,
+    and goes through the shared LLM rate limiter, which also retries 429s.
+    Returns "ERROR: ..." on failure.
+    """
     try:
-        client = OpenAI(api_key=api_key)
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens,
-            temperature=0.0,
-        )
-
-        # For this client/version the choice message is an object with .content
-        # Try the common attribute access patterns for this version:
-        try:
-            first_choice = resp.choices[0]
-        except Exception:
-            return "ERROR: OpenAI response missing choices."
-
-        # Preferred: choice.message.content
-        message = getattr(first_choice, "message", None)
-        if message is not None:
-            content = getattr(message, "content", None)
-            if content is not None:
-                return str(content).strip()
-
-        # Fallbacks: choice.content or choice.text
-        content = getattr(first_choice, "content", None)
-        if content is not None:
-            return str(content).strip()
-        text = getattr(first_choice, "text", None)
-        if text is not None:
-            return str(text).strip()
+        # the limiter owns 429 retries, so the SDK's own retry loop is turned off
+        client = get_openai_client().with_options(max_retries=0)
+    except RuntimeError as e:
+        return f"ERROR: {e}"
 
-        # As a last resort, stringify the first choice
-        return str(first_choice).strip() or "ERROR: Empty LLM response."
+    try:
+        with span("tool", kind="llm"):
+            resp = get_rate_limiter().call(
+                lambda: client.chat.completions.create(**_chat_params(prompt, model, max_tokens)),
+                estimated_tokens=_estimated_tokens(prompt, model, max_tokens),
+            )
+        return _reply_text(resp, model)
+    except Exception as e:
+        return f"ERROR: OpenAI call failed: {e}"
 
+
+async def _acall_openai_chat_plain(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 1000) -> str:
+    """
+    Asynchronous sibling of `_call_openai_chat_plain` for asyncio callers.
+
+    Same cache, limiter and accounting as the synchronous path, but uses the pooled
+    AsyncOpenAI client of the running event loop, so concurrent calls overlap their
+    network waits. Returns "ERROR: ..." on failure.
+    """
+    cache, cached = _cached_reply(prompt, model, max_tokens)
+    if cached is not None:
+        return cached
+    text = await _arequest_openai_chat_plain(prompt, model=model, max_tokens=max_tokens)
+    _store_reply(cache, prompt, model, max_tokens, text)
+    return text
+
+
+async def _arequest_openai_chat_plain(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 1000) -> str:
+    """Uncached asynchronous counterpart of `_request_openai_chat_plain`."""
+    try:
+        client = get_async_openai_client().with_options(max_retries=0)
+    except RuntimeError as e:
+        return f"ERROR: {e}"
+
+    try:
+        with span("tool", kind="llm"):
+            resp = await get_rate_limiter().acall(
+                lambda: client.chat.completions.create(**_chat_params(prompt, model, max_tokens)),
+                estimated_tokens=_estimated_tokens(prompt, model, max_tokens),
+            )
+        return _reply_text(resp, model)
     except Exception as e:
         return f"ERROR: OpenAI call failed: {e}"
+
+
+# Shared by the synchronous and asynchronous paths so they cannot drift apart
+
+def _cached_reply(prompt: str, model: str, max_tokens: int) -> Tuple[Any, Optional[str]]:
+    """(LLM response cache or None, cached answer or None)."""
+    cache = get_llm_cache()
+    return cache, (cache.get(model, max_tokens, prompt) if cache is not None else None)
+
+
+def _store_reply(cache: Any, prompt: str, model: str, max_tokens: int, text: str) -> None:
+    # error strings are never cached
+    if cache is not None and text and not text.startswith("ERROR:"):
+        cache.put(model, max_tokens, prompt, text)
+
+
+def _chat_params(prompt: str, model: str, max_tokens: int) -> Dict[str, Any]:
+    return {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+        "temperature": 0.0,
+    }
+
+
+def _estimated_tokens(prompt: str, model: str, max_tokens: int) -> int:
+    """What the rate limiter is charged for one call: prompt tokens plus the completion allowance."""
+    return get_token_cache().count(prompt, model) + max_tokens
+
+
+def _reply_text(resp: Any, model: str) -> str:
+    record_llm_call(model, *usage_tokens(resp), source="tool")
+    return _first_choice_text(resp)
+
+
+def _first_choice_text(resp) -> str:
+    """
+    Return the assistant content of the first choice as a plain string.
+    This version assumes the response shape where the first choice exposes:
+      resp.choices[0].message.content
+    or (fallback) resp.choices[0].text / resp.choices[0].content.
+    """
+    # For this client/version the choice message is an object with .content
+    # Try the common attribute access patterns for this version:
+    try:
+        first_choice = resp.choices[0]
+    except Exception:
+        return "ERROR: OpenAI response missing choices."
+
+    # Preferred: choice.message.content
+    message = getattr(first_choice, "message", None)
+    if message is not None:
+        content = getattr(message, "content", None)
+        if content is not None:
+            return str(content).strip()
+
+    # Fallbacks: choice.content or choice.text
+    content = getattr(first_choice, "content", None)
+    if content is not None:
+        return str(content).strip()
+    text = getattr(first_choice, "text", None)
+    if text is not None:
+        return str(text).strip()
+
+    # As a last resort, stringify the first choice
+    return str(first_choice).strip() or "ERROR: Empty LLM response."
     
-@tool("Investment Analysis Tool")
-def analyze_investment_tool(financial_document_data: str) -> str:
+def _analyze_excerpt(processed_data: str, instructions: str, budget_tokens: int, max_tokens: int,
+                     query: str = "") -> str:
+    """
+    Run `instructions` over the document text and return the LLM answer.
+
+    The prompt is assembled by prompt_budget.PromptBuilder: the text is compacted
+    and measured in tokens of the target model, and the document part of
+    the prompt is capped at `budget_tokens` (overridable per model through
+    PROMPT_TOKEN_BUDGETS) and at what the context window leaves next to the
+    instructions and `max_tokens`.
+
+    ANALYSIS_MODE controls documents longer than that budget:
+        truncate (default): only the budget is sent. With EXCERPT_SELECTION=relevance
+                  (default) these are the pages that score best against `query` and the
+                  financial lexicon; with EXCERPT_SELECTION=head, the start of the document.
+        mapreduce: the text is split into overlapping page-aligned chunks of about the
+                   budget, each chunk is analyzed in parallel (at most
+                   MAPREDUCE_CONCURRENCY at once) and the partial analyses are merged
+                   into the same section format.
+        auto: map-reduce only when the text does not fit in the budget.
+    Returns "ERROR: ..." on failure.
+    """
+    model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    mode = os.getenv("ANALYSIS_MODE", "truncate").strip().lower()
+    builder = PromptBuilder(model_name, budget_tokens, max_tokens)
+
+    def llm_call(prompt: str) -> str:
+        return _call_openai_chat_plain(prompt, model=model_name, max_tokens=max_tokens)
+
+    if mode in ("mapreduce", "auto"):
+        pages = builder.pages(processed_data)
+        available = builder.available(instructions)
+        if mode == "mapreduce" or sum(p["num_tokens"] + 1 for p in pages) > available:
+            text = "\n\n".join(p["text"] for p in pages)
+            # chunking is page-aligned by characters: convert the token budget at this document's ratio
+            chars_per_token = len(text) / max(1, sum(p["num_tokens"] for p in pages))
+            return map_reduce(
+                text,
+                map_prompt=lambda chunk, label, i, n: (
+                    f"NOTE: the EXCERPT below is part {i} of {n} ({label}) of a longer document. "
+                    "Report only what this part supports and write 'N/A' for anything it does not cover.\n\n"
+                    + instructions + chunk
+                ),
+                reduce_prompt=lambda partials: (
+                    "NOTE: the EXCERPT below is a set of partial analyses, each produced from one part of the same "
+                    "document (in page order; neighbouring parts overlap by a page). Merge them into ONE final answer: "
+                    "keep the most complete value for each figure, do not double-count overlapping pages, and "
+                    "recompute ratios from the merged figures.\n\n"
+                    + instructions + partials
+                ),
+                llm_call=llm_call,
+                chunk_chars=int(available * chars_per_token),
+                max_concurrency=int(os.getenv("MAPREDUCE_CONCURRENCY", "4")),
+                overlap_pages=int(os.getenv("MAPREDUCE_OVERLAP_PAGES", "1")),
+            )
+
+    selection = os.getenv("EXCERPT_SELECTION", "relevance").strip().lower()
+    prompt, info = builder.build(instructions, processed_data, query=query, selection=selection)
+    logger.debug("Prompt for %s: %s", model_name, info)
+    return _call_openai_chat_plain(prompt, model=model_name, max_tokens=info["max_tokens"])
+
+
+@timed("analyze_investment_tool")
+def analyze_investment(financial_document_data: str, query: str = "") -> str:
     """
     LLM-driven investment analysis that RETURNS A SINGLE PLAIN TEXT STRING.
 
@@ -262,27 +392,30 @@ def analyze_investment_tool(financial_document_data: str) -> str:
         - CONFIDENCE (0.0-1.0)
     **It will be returned as plain text only (no JSON, no extra commentary).**
 
+    Args:
+        financial_document_data (str): the document handle given in the task (e.g. 'doc-3f2b0c9e6d1a4b0f');
+                               document text from the Read Financial Document tool is also accepted.
+        query (str, optional): the user's question; used to pick the most relevant pages
+                               when the document is longer than the prompt budget.
+
     Returns:
         str: plain-text analysis or an error string beginning with "ERROR:".
     """
-    processed_data = financial_document_data
-
-    if not isinstance(processed_data, str) or not processed_data:
+    if not isinstance(financial_document_data, str) or not financial_document_data:
         return "ERROR: financial_document_data must be a non-empty string."
 
-    # keep your original double-space removal loop (unchanged)
-    i = 0
-    while i < len(processed_data):
-        if processed_data[i:i+2] == "  ":
-            processed_data = processed_data[:i] + processed_data[i+1:]
-        else:
-            i += 1
+    try:
+        processed_data, _ = resolve_document(financial_document_data)
+    except KeyError as e:
+        return f"ERROR: {e.args[0]}"
+    except Exception as e:  # missing, unreadable or too large PDF
+        return f"ERROR: could not read document: {e}"
 
-    # basic normalization
-    processed_data = processed_data.replace("\r\n", "\n").strip()
+    # collapse runs of spaces + basic normalization (precompiled regex, see text_normalize)
+    processed_data = normalize_excerpt(processed_data)
 
     # Build a prompt that asks for a single plain-text string only:
-    prompt = (
+    instructions = (
         "You are an expert financial analyst. Analyze the EXCERPT below and RETURN A SINGLE PLAIN-TEXT STRING ONLY.\n\n"
         "Requirements for the OUTPUT STRING (must follow exactly):\n"
         "  - Do NOT return JSON or code blocks. Do NOT add any meta commentary about format.\n"
@@ -300,11 +433,19 @@ def analyze_investment_tool(financial_document_data: str) -> str:
         "  - Keep the whole output concise (aim for ~8-16 lines) but include all required sections.\n"
         "  - If you cannot determine a value, write 'N/A' for that field.\n\n"
         "Now analyze this EXCERPT and produce the single plain-text string only (no extra text):\n\n"
-        + processed_data[:16000]
     )
 
-    model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    llm_text = _call_openai_chat_plain(prompt, model=model_name, max_tokens=1000)
+    # Figures parsed locally (no model cost) are handed to the LLM so it does not have to find them
+    if os.getenv("KEY_FIGURES_MODE", "off").strip().lower() == "inject":
+        figures = extract_key_figures(text=processed_data)
+        if figures:
+            instructions = (
+                "PRE-EXTRACTED FIGURES (parsed locally from the document; use these values in KEY FIGURES "
+                "and RATIOS unless the excerpt clearly contradicts them):\n"
+                + format_key_figures(figures) + "\n\n" + instructions
+            )
+
+    llm_text = _analyze_excerpt(processed_data, instructions, budget_tokens=4000, max_tokens=1000, query=query)
 
     # If an error string was returned, propagate it
     if isinstance(llm_text, str) and llm_text.startswith("ERROR:"):
@@ -314,18 +455,43 @@ def analyze_investment_tool(financial_document_data: str) -> str:
     return llm_text.strip()
 
 
-## Creating Risk Assessment Tool
-def _normalize_whitespace(s: str) -> str:
-    """Minimal normalization so output is tidy."""
-    s = s.replace("\r\n", "\n").replace("\r", "\n")
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    s = re.sub(r"[ \t]{2,}", " ", s)
-    return s.strip()
+##-------------------------- Creating Key Figures Tool --------------------------##
+
+@timed("key_figures_tool")
+def key_figures(path: str) -> str:
+    """
+    Extract revenue, net_income, assets, liabilities and equity straight from the document
+    (tables first, then text) and compute net_income_margin, debt_ratio and equity_to_assets.
+    Runs locally in milliseconds with no LLM call.
+
+    Args:
+        path (str): the document handle given in the task, or a local path to the PDF.
 
+    Returns:
+        str: 'KEY FIGURES:' and 'RATIOS:' sections (missing values are 'N/A'),
+             or an error string beginning with "ERROR:". Figures are in USD, scaled by the
+             document's unit statement (e.g. 'in millions'); a figure whose unit is not
+             stated is marked so and the ratios that need it are 'N/A'.
+    """
+    if not is_handle(path) and not os.path.exists(path):
+        return f"ERROR: PDF not found at path: {path}"
+    try:
+        text, pdf_path = resolve_document(path)
+    except KeyError as e:
+        return f"ERROR: {e.args[0]}"
+    except Exception as e:  # missing, unreadable or too large PDF
+        return f"ERROR: could not read document: {e}"
+    try:
+        return format_key_figures(extract_key_figures(path=pdf_path, text=text))
+    except Exception as e:
+        return f"ERROR: key figure extraction failed: {e}"
+
+
+## Creating Risk Assessment Tool
 # class RiskTool:
     
-@tool("Risk Assessment Tool")
-def risk_assessment_tool(financial_document_data: str) -> str:
+@timed("risk_assessment_tool")
+def assess_risk(financial_document_data: str, query: str = "") -> str:
     """
     Create a risk assessment string from the provided financial document text.
 
@@ -338,26 +504,27 @@ def risk_assessment_tool(financial_document_data: str) -> str:
         - MONITORING / KPIs: 3 bullets of measurable signals to watch
         - CONFIDENCE: number between 0.0 and 1.0
 
+    `financial_document_data` is the document handle given in the task (document text is
+    also accepted). Pass the user's question as `query` so the most relevant pages are
+    used when the document is longer than the prompt budget.
+
     If the OpenAI helper returns an error string beginning with "ERROR:", that string is returned unchanged.
     """
-    # Keep original cleaning loop you provided
-    processed_data = financial_document_data
-
-    if not isinstance(processed_data, str) or not processed_data:
+    if not isinstance(financial_document_data, str) or not financial_document_data:
         return "ERROR: financial_document_data must be a non-empty string."
 
-    i = 0
-    while i < len(processed_data):
-        if processed_data[i:i+2] == "  ":
-            processed_data = processed_data[:i] + processed_data[i+1:]
-        else:
-            i += 1
+    try:
+        processed_data, _ = resolve_document(financial_document_data)
+    except KeyError as e:
+        return f"ERROR: {e.args[0]}"
+    except Exception as e:  # missing, unreadable or too large PDF
+        return f"ERROR: could not read document: {e}"
 
-    # Minimal normalization
-    processed_data = processed_data.replace("\r\n", "\n").strip()
+    # collapse runs of spaces + minimal normalization (precompiled regex, see text_normalize)
+    processed_data = normalize_excerpt(processed_data)
 
     # Prompt: ask for a single plain-text string with exact headers
-    prompt = (
+    instructions = (
         "You are an experienced risk analyst focused on corporate financial risk.\n\n"
         "Analyze the EXCERPT below and RETURN A SINGLE PLAIN-TEXT STRING ONLY (no JSON, no code blocks, no meta commentary).\n\n"
         "The output MUST contain the following sections, using the EXACT UPPERCASE HEADERS shown (each header followed by its content):\n\n"
@@ -380,21 +547,54 @@ def risk_assessment_tool(financial_document_data: str) -> str:
         "  - If a value cannot be determined, write 'N/A' (for example in LIKELIHOOD & IMPACT use 'N/A').\n"
         "  - Keep the output concise and focused; prefer clarity over verbosity.\n\n"
         "Now analyze this EXCERPT and produce the single plain-text string only:\n\n"
-        + processed_data[:14000]  # truncate to keep tokens bounded
     )
 
-    model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    llm_text = _call_openai_chat_plain(prompt, model=model_name, max_tokens=900)
+    llm_text = _analyze_excerpt(processed_data, instructions, budget_tokens=3500, max_tokens=900, query=query)
 
     # pass through errors from helper
     if isinstance(llm_text, str) and llm_text.startswith("ERROR:"):
         return llm_text
 
-    # Normalize whitespace before returning (use existing helper if present)
-    try:
-        normalized = _normalize_whitespace(str(llm_text))
-    except Exception:
-        # fallback minimal normalization
-        normalized = str(llm_text).replace("\r\n", "\n").strip()
+    # Normalize whitespace before returning
+    return clean_whitespace(str(llm_text))
+
+
+##-------------------------- CrewAI tool objects (created lazily) --------------------------##
+
+# public tool name -> (name shown to the agents, implementation)
+TOOL_SPECS = {
+    "search_tool": ("Search the internet", search_web),
+    "read_data_tool": ("Read Financial Document", read_data),
+    "analyze_investment_tool": ("Investment Analysis Tool", analyze_investment),
+    "key_figures_tool": ("Key Figures Tool", key_figures),
+    "risk_assessment_tool": ("Risk Assessment Tool", assess_risk),
+}
+
+_crew_tools: Dict[str, Any] = {}
+_crew_tools_lock = threading.Lock()
 
-    return normalized
\ No newline at end of file
+
+def get_tool(name: str) -> Any:
+    """
+    Return the CrewAI tool object for `name` (a TOOL_SPECS key), creating it on first use.
+
+    crewai is only imported here, so importing this module stays cheap; the plain
+    functions above can be called without crewai installed.
+
+    Raises:
+        KeyError: for an unknown tool name
+    """
+    label, fn = TOOL_SPECS[name]
+    with _crew_tools_lock:
+        crew_tool = _crew_tools.get(name)
+        if crew_tool is None:
+            from crewai.tools import tool
+            crew_tool = _crew_tools[name] = tool(label)(fn)
+        return crew_tool
+
+
+def __getattr__(name: str) -> Any:
+    # `from tools import read_data_tool` keeps returning the CrewAI tool object
+    if name in TOOL_SPECS:
+        return get_tool(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")